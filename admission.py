@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+# ---------------------------------------------------------------------------------------------------------
+# ProjectName:  cronjob-1717
+# FileName:     admission.py
+# Description:  任务准入控制
+# Author:       ASUS
+# CreateDate:   2026/10/18
+# Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
+# ---------------------------------------------------------------------------------------------------------
+"""
+import asyncio
+from time import monotonic
+from collections import deque
+from logging import Logger, getLogger
+from typing import Dict, Any, Deque, Optional, Set, Tuple
+
+"""
+准入逻辑
+1. 每个 handler 有并发上限（limits），所有 handler 共享一个加权预算（global_budget），
+   例如浏览器任务权重 10、HTTP 任务权重 1，同时运行的任务权重之和不超过预算
+2. 额度不够时在该 handler 的等待队列里排队；队列长度有上限，/run 时队列已满直接拒绝
+3. 有任务释放额度时，按入队先后扫描各 handler 的队首，能放行的就放行，轻任务不会被排在前面的重任务堵住
+4. 最早的等待者超过 starvation_seconds 仍未放行时，暂停放行其他任务，直到它拿到额度，避免重任务被饿死
+5. 记录每个 handler 的运行数、排队数、累计/最近/最大排队时长，供 /admission 查询
+"""
+
+DEFAULT_GLOBAL_BUDGET = 20
+DEFAULT_WEIGHT = 1
+DEFAULT_QUEUE_LENGTH = 30
+DEFAULT_STARVATION_SECONDS = 60
+
+
+class AdmissionRejected(Exception):
+    pass
+
+
+class _HandlerState:
+    __slots__ = ("running", "waiters", "reserved", "admitted", "rejected", "wait_total", "wait_last", "wait_max")
+
+    def __init__(self):
+        self.running = 0
+        self.waiters: Deque[Tuple[float, asyncio.Future]] = deque()
+        self.reserved: Set[int] = set()
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_last = 0.0
+        self.wait_max = 0.0
+
+
+class AdmissionController:
+
+    def __init__(
+            self, *, global_budget: int = DEFAULT_GLOBAL_BUDGET, weights: Optional[Dict[str, int]] = None,
+            limits: Optional[Dict[str, int]] = None, default_weight: int = DEFAULT_WEIGHT,
+            queue_length: int = DEFAULT_QUEUE_LENGTH, starvation_seconds: float = DEFAULT_STARVATION_SECONDS,
+            logger: Optional[Logger] = None
+    ):
+        self.global_budget = global_budget
+        self.weights = weights or dict()
+        self.limits = limits or dict()
+        self.default_weight = default_weight
+        self.queue_length = queue_length
+        self.starvation_seconds = starvation_seconds
+        self.logger = logger or getLogger(__name__)
+        self.used = 0
+        self._handlers: Dict[str, _HandlerState] = dict()
+
+    def _state(self, handler: str) -> _HandlerState:
+        state = self._handlers.get(handler)
+        if state is None:
+            state = self._handlers[handler] = _HandlerState()
+        return state
+
+    def weight(self, handler: str) -> int:
+        # 权重超过总预算的任务也要能单独运行
+        return min(self.weights.get(handler, self.default_weight), self.global_budget)
+
+    def _fits(self, handler: str, state: _HandlerState) -> bool:
+        limit = self.limits.get(handler)
+        if limit is not None and state.running >= limit:
+            return False
+        return self.used + self.weight(handler) <= self.global_budget
+
+    def reserve(self, handler: str, log_id: int) -> None:
+        """/run 收到调度、创建任务之前调用：等待队列（含已受理未开始的任务）已满时抛 AdmissionRejected"""
+        state = self._state(handler)
+        if not self._fits(handler, state) and len(state.waiters) + len(state.reserved) >= self.queue_length:
+            state.rejected += 1
+            waiting = len(state.waiters) + len(state.reserved)
+            msg = (
+                f"handler {handler} admission queue is full [running={state.running} waiting={waiting} "
+                f"max={self.queue_length}], logId {log_id} rejected."
+            )
+            self.logger.warning(msg)
+            raise AdmissionRejected(msg)
+        state.reserved.add(log_id)
+
+    def unreserve(self, handler: str, log_id: int) -> None:
+        """已受理的调度在开始执行前被丢弃（例如排队中被 kill）时归还名额"""
+        self._state(handler).reserved.discard(log_id)
+
+    async def acquire(self, handler: str, log_id: int) -> float:
+        """任务开始执行前调用，拿到额度后返回排队秒数；排队期间被取消时不占用额度"""
+        state = self._state(handler)
+        state.reserved.discard(log_id)
+        start = monotonic()
+        if not self._has_starving() and not state.waiters and self._fits(handler, state):
+            self._admit(handler, state, 0.0)
+            return 0.0
+        future = asyncio.get_running_loop().create_future()
+        item = (start, future)
+        state.waiters.append(item)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 已经被放行但调用方被取消：把额度还回去
+                self.release(handler)
+            else:
+                # 同一轮事件循环里 _dispatch 可能已把已取消的等待者跳过并移出队列
+                if item in state.waiters:
+                    state.waiters.remove(item)
+                self._dispatch()
+            raise
+
+    def release(self, handler: str) -> None:
+        state = self._state(handler)
+        state.running -= 1
+        self.used -= self.weight(handler)
+        self._dispatch()
+
+    def _admit(self, handler: str, state: _HandlerState, wait: float) -> None:
+        state.running += 1
+        state.admitted += 1
+        state.wait_last = wait
+        state.wait_total += wait
+        state.wait_max = max(state.wait_max, wait)
+        self.used += self.weight(handler)
+
+    def _has_starving(self) -> bool:
+        now = monotonic()
+        return any(s.waiters and now - s.waiters[0][0] > self.starvation_seconds for s in self._handlers.values())
+
+    def _dispatch(self) -> None:
+        """按入队先后放行各 handler 队首能放得下的任务"""
+        now = monotonic()
+        while True:
+            for state in self._handlers.values():
+                # 已取消（等待者在本轮被取消、还没来得及移出队列）的不放行，也不占额度
+                while state.waiters and state.waiters[0][1].done():
+                    state.waiters.popleft()
+            heads = sorted(
+                (s.waiters[0][0], name, s) for name, s in self._handlers.items() if s.waiters
+            )
+            if not heads:
+                return
+            admitted = False
+            for enqueued, name, state in heads:
+                if self._fits(name, state):
+                    _, future = state.waiters.popleft()
+                    self._admit(name, state, now - enqueued)
+                    future.set_result(now - enqueued)
+                    admitted = True
+                    break
+                if now - enqueued > self.starvation_seconds:
+                    # 最早的等待者已饥饿，为它保留额度
+                    return
+            if not admitted:
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        now = monotonic()
+        handlers = dict()
+        for name, state in self._handlers.items():
+            handlers[name] = {
+                "weight": self.weight(name),
+                "limit": self.limits.get(name),
+                "running": state.running,
+                "waiting": len(state.waiters),
+                "reserved": len(state.reserved),
+                "admitted": state.admitted,
+                "rejected": state.rejected,
+                "waitSecondsTotal": round(state.wait_total, 3),
+                "waitSecondsLast": round(state.wait_last, 3),
+                "waitSecondsMax": round(state.wait_max, 3),
+                "oldestWaitSeconds": round(now - state.waiters[0][0], 3) if state.waiters else 0,
+            }
+        return {"budget": self.global_budget, "used": self.used, "handlers": handlers}
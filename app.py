@@ -2,28 +2,40 @@
 import os
 import sys
 import json
-import aiofiles
+import asyncio
 import importlib
+import importlib.util
 import threading
 from pyxxl import error
 from aiohttp import web
-from time import sleep, time
-from datetime import datetime
+from time import sleep, time, perf_counter
 from pyxxl.logger import LogBase
 from pyxxl.schema import RunData
 from threading import Lock, Timer
-from urllib.parse import parse_qs
 from pyxxl.types import LogRequest
-from pyxxl.executor import Executor
+from pyxxl.ctx import g
+from pyxxl.executor import Executor, HandlerInfo, _spawn_task
+from pyxxl.enum import executorBlockStrategy
 from pyxxl.logger.disk import DiskLog
-from typing import Optional, TypedDict
+from pyxxl.xxl_client import XXL
+from collections import OrderedDict
+from http_helper.client.async_proxy import HttpClientFactory
+from typing import Dict, Any, List, Optional, Set, Tuple, TypedDict
 from watchdog.observers import Observer
-from log_utils import logger, get_log_file
+from log_archive import LogArchive
+from discard_journal import DiscardJournal
+from callback_outbox import CallbackOutbox
+from admission import AdmissionController, AdmissionRejected
+from job_module_graph import JobModuleGraph
+from process_pool import JobProcessPool, PROCESS_MODE, get_handler_execution_mode
+from health import LoopLagMonitor, browser_pool_stats
+from metrics import MetricsRegistry, Gauge, LATENCY_BUCKETS, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from log_utils import logger, get_log_file, task_log_line_index, flush_task_log
+from jobs.params import get_mode, get_execution_mode
 from pyxxl.server import routes, app_logger
 from pyxxl import ExecutorConfig, PyxxlRunner
 from watchdog.events import FileSystemEventHandler
 
-_original_run_job = Executor.run_job
 
 jobs_path = "jobs"
 
@@ -55,11 +67,297 @@ async def log(request: web.Request) -> web.Response:
     })
 
 
+# 流式日志：轮询间隔、无新日志时的心跳间隔、最长空闲时间（秒）
+LOG_TAIL_POLL_INTERVAL = 0.5
+LOG_TAIL_HEARTBEAT_INTERVAL = 15
+LOG_TAIL_IDLE_TIMEOUT = 30 * 60
+
+
+def _is_log_active(executor: Executor, log_id: int) -> bool:
+    """logId 对应的调度是否还在运行或排队"""
+    if any(task.data.logId == log_id for task in executor.tasks.values()):
+        return True
+    return any(data.logId == log_id for queue in executor.queue.values() for data in queue._queue)
+
+
+def _read_appended_lines(f, max_lines: int, *, flush_partial: bool = False) -> List[bytes]:
+    """读取文件当前位置之后已写完的行；尾行没有换行符时回退，等待下次再读"""
+    lines: List[bytes] = []
+    while len(lines) < max_lines:
+        pos = f.tell()
+        line = f.readline()
+        if not line:
+            break
+        if not line.endswith(b"\n") and not flush_partial:
+            f.seek(pos)
+            break
+        lines.append(line)
+    return lines
+
+
+# 流式跟踪任务日志（Server-Sent Events），避免 Admin 页面每秒轮询 /log 重复读取
+@routes.get("/log/tail")
+@routes.post("/log/tail")
+async def log_tail(request: web.Request) -> web.StreamResponse:
+    """
+        {
+        "logId":0,          // 本次调度日志ID
+        "fromLineNum":1,    // 日志开始行号
+        "toLineNum":0       // 可选，推送到该行后结束，不传或为0则跟踪到任务结束
+    }
+    GET 请求通过 querystring 传参，浏览器可直接用 EventSource 订阅；
+    每个事件的 data 与 /log 返回的 data 结构相同，最后一个事件 isEnd=true；
+    参数缺失或不是整数时返回 400，toLineNum 小于 fromLineNum 时直接推送一个 isEnd 的空事件
+    """
+    try:
+        data = dict(request.query) if request.method == "GET" else await request.json()
+        log_id = int(data["logId"])
+        from_line = max(int(data.get("fromLineNum") or 1), 1)
+        to_line = int(data.get("toLineNum") or 0)
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        return web.json_response({"code": 400, "msg": f"参数错误: {e!r}", "data": None}, status=400)
+    app_logger(request).debug("tail log request %s" % data)
+    state = request.app["pyxxl_state"]
+    key = state.task_log.key(log_id)
+
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream; charset=utf-8",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+    await response.prepare(request)
+
+    async def send(content: str, first_line: int, last_line: int, is_end: bool) -> None:
+        event = LogResponse(fromLineNum=first_line, toLineNum=last_line, logContent=content, isEnd=is_end)
+        await response.write(b"data: " + json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\n\n")
+
+    if to_line and to_line < from_line:
+        await send("", from_line, from_line - 1, True)
+        return response
+
+    f = None
+    idle = 0.0
+    since_heartbeat = 0.0
+    try:
+        # 等待日志文件出现（调度可能还在排队）
+        while f is None:
+            try:
+                f, line_no = await asyncio.to_thread(task_log_line_index.open_at, key, from_line)
+            except FileNotFoundError:
+                if not _is_log_active(state.executor, log_id) or idle >= LOG_TAIL_IDLE_TIMEOUT:
+                    break
+                await asyncio.sleep(LOG_TAIL_POLL_INTERVAL)
+                idle += LOG_TAIL_POLL_INTERVAL
+        if f is None:
+            # 日志已被归档或调度已被丢弃：按页推送后结束
+            while True:
+                limit = state.task_log.log_tail_lines
+                if to_line:
+                    limit = min(limit, to_line - from_line + 1)
+                try:
+                    content, last_line, is_end = await asyncio.to_thread(
+                        _read_detached_log_lines, log_id, key, from_line, limit
+                    )
+                except FileNotFoundError:
+                    await send("No such logid logs.", from_line, from_line - 1, True)
+                    return response
+                is_end = is_end or bool(to_line and last_line >= to_line)
+                await send(content, from_line, last_line, is_end)
+                if is_end:
+                    return response
+                from_line = last_line + 1
+
+        # 起始行超出当前文件行数时，先等待日志写到 fromLineNum
+        while line_no < from_line:
+            finished = not _is_log_active(state.executor, log_id)
+            lines = await asyncio.to_thread(_read_appended_lines, f, from_line - line_no, flush_partial=finished)
+            line_no += len(lines)
+            if line_no < from_line and finished:
+                await send("", from_line, from_line - 1, True)
+                return response
+            if not lines:
+                await asyncio.sleep(LOG_TAIL_POLL_INTERVAL)
+
+        idle = 0.0
+        while True:
+            # 先判断任务是否结束，再读取，保证结束前写入的日志都能被推送
+            finished = not _is_log_active(state.executor, log_id)
+            limit = state.task_log.log_tail_lines
+            if to_line:
+                limit = min(limit, to_line - line_no + 1)
+            lines = await asyncio.to_thread(_read_appended_lines, f, limit, flush_partial=finished)
+            if lines:
+                last_line = line_no + len(lines) - 1
+                is_end = bool(to_line and last_line >= to_line)
+                await send(
+                    b"".join(lines).decode("utf-8", errors="replace"), line_no, last_line,
+                    is_end or (finished and len(lines) < limit)
+                )
+                line_no = last_line + 1
+                idle = since_heartbeat = 0.0
+                if is_end or (finished and len(lines) < limit):
+                    return response
+                continue
+            if finished:
+                await send("", line_no, line_no - 1, True)
+                return response
+            if idle >= LOG_TAIL_IDLE_TIMEOUT:
+                await send("", line_no, line_no - 1, False)
+                return response
+            if since_heartbeat >= LOG_TAIL_HEARTBEAT_INTERVAL:
+                # SSE 注释行，保持连接并及时发现客户端断开
+                await response.write(b": ping\n\n")
+                since_heartbeat = 0.0
+            await asyncio.sleep(LOG_TAIL_POLL_INTERVAL)
+            idle += LOG_TAIL_POLL_INTERVAL
+            since_heartbeat += LOG_TAIL_POLL_INTERVAL
+    except ConnectionResetError:
+        app_logger(request).debug("tail log client disconnected, logId=%s" % log_id)
+        return response
+    finally:
+        if f is not None:
+            f.close()
+
+
 @routes.get("/healthCheck")
 async def health_check(request: web.Request) -> web.Response:
     return web.json_response({"code": 200, "msg": "当前系统状态良好", "data": None})
 
 
+async def _check_redis() -> Dict[str, Any]:
+    """通过 redis_client_0 测一次 PING 往返时间"""
+    try:
+        redis_utils = importlib.import_module(f"{jobs_path}.redis_utils")
+        start = perf_counter()
+        async with asyncio.timeout(HEALTH_REDIS_TIMEOUT):
+            await redis_utils.redis_client_0.redis.ping()
+        return {"healthy": True, "rttMs": round((perf_counter() - start) * 1000, 2)}
+    except Exception as e:
+        return {"healthy": False, "error": f"{type(e).__name__}: {e}"}
+
+
+def _check_event_loop() -> Dict[str, Any]:
+    stats = loop_lag_monitor.stats()
+    age = stats["lastTickAgeSeconds"]
+    healthy = (
+            age is not None
+            and age <= loop_lag_monitor.interval + loop_lag_monitor.threshold
+            and stats["p99"] <= HEALTH_LOOP_LAG_P99_LIMIT
+    )
+    return {"healthy": healthy, **stats}
+
+
+def _check_watchdog() -> Dict[str, Any]:
+    # watchdog_thread 在 __main__ 中创建
+    thread = globals().get("watchdog_thread")
+    return {"healthy": thread is not None and thread.is_alive(), "started": thread is not None}
+
+
+def _check_browser() -> Dict[str, Any]:
+    process_pool = job_process_pool.stats()
+    # 浏览器任务在进程池里执行时，子进程全部退出就无法执行
+    healthy = not (process_pool["started"] and process_pool["aliveWorkers"] == 0)
+    return {"healthy": healthy, "pools": browser_pool_stats(), "processPool": process_pool}
+
+
+@routes.get("/healthCheck/live")
+async def live_health_check(request: web.Request) -> web.Response:
+    """存活检查：只看事件循环延迟，供容器 HEALTHCHECK 使用；Redis 等外部依赖故障不应让容器被判为不健康而重启"""
+    data = {"eventLoop": _check_event_loop()}
+    if not data["eventLoop"]["healthy"]:
+        return web.json_response({"code": 500, "msg": "事件循环延迟过高", "data": data}, status=503)
+    return web.json_response({"code": 200, "msg": "当前系统状态良好", "data": data})
+
+
+@routes.get("/healthCheck/deep")
+async def deep_health_check(request: web.Request) -> web.Response:
+    """深度健康检查：事件循环延迟、Redis 往返、watchdog 线程、浏览器池，任何一项不健康返回 503，供监控面板和告警使用"""
+    data = {
+        "eventLoop": _check_event_loop(),
+        "redis": await _check_redis(),
+        "watchdog": _check_watchdog(),
+        "browser": _check_browser(),
+    }
+    unhealthy = [name for name, check in data.items() if not check["healthy"]]
+    if unhealthy:
+        return web.json_response({"code": 500, "msg": f"不健康的检查项: {unhealthy}", "data": data}, status=503)
+    return web.json_response({"code": 200, "msg": "当前系统状态良好", "data": data})
+
+
+@routes.get("/admission")
+async def admission(request: web.Request) -> web.Response:
+    """各 handler 的准入状态：运行数、排队数、排队时长"""
+    return web.json_response({"code": 200, "msg": "", "data": job_admission.stats()})
+
+
+METRICS_REDIS_TIMEOUT = 1
+
+
+def _in_flight_gauges(app: web.Application) -> List[Gauge]:
+    """抓取时现算：各 handler 运行中 / 准入排队中的任务数、串行队列积压、回调发件箱积压"""
+    running = Gauge("pyxxl_job_in_flight", "正在执行（含准入排队）的任务数", ("handler",))
+    executor_state = app.get("pyxxl_state")
+    if executor_state is not None:
+        counts: Dict[str, int] = dict()
+        for task in executor_state.executor.tasks.values():
+            counts[task.data.executorHandler] = counts.get(task.data.executorHandler, 0) + 1
+        for handler, count in counts.items():
+            running.set(handler, value=count)
+    serial = Gauge("pyxxl_job_serial_queue_size", "SERIAL_EXECUTION 策略下排队等待的调度数")
+    if executor_state is not None:
+        serial.set(value=sum(q.qsize() for q in executor_state.executor.queue.values()))
+    admission_waiting = Gauge("pyxxl_job_admission_waiting", "准入控制队列中等待额度的任务数", ("handler",))
+    for handler, stats in job_admission.stats()["handlers"].items():
+        admission_waiting.set(handler, value=stats["waiting"])
+    outbox = Gauge("pyxxl_callback_outbox_pending", "回调发件箱中待发送给 admin 的回调数")
+    outbox.set(value=callback_outbox.pending_count)
+    return [running, serial, admission_waiting, outbox]
+
+
+def _loop_lag_gauges() -> List[Gauge]:
+    lag = Gauge("pyxxl_event_loop_lag_seconds", "事件循环调度延迟（最近采样窗口）", ("quantile",))
+    for name, value in loop_lag_monitor.percentiles().items():
+        lag.set({"p50": "0.5", "p90": "0.9", "p99": "0.99", "max": "1"}[name], value=value)
+    stalls = Gauge("pyxxl_event_loop_stalls", "事件循环阻塞超过阈值并抓取了调用栈的次数")
+    stalls.set(value=loop_lag_monitor.stall_count)
+    return [lag, stalls]
+
+
+async def _redis_queue_gauges() -> List[Gauge]:
+    """抓取时查询 Redis 订单队列各状态的数量（OrderQueue.stats），Redis 不可用时不影响其他指标"""
+    size = Gauge("pyxxl_redis_queue_size", "Redis 可靠队列中的任务数", ("queue", "state"))
+    consumer_pending = Gauge(
+        "pyxxl_redis_queue_consumer_pending", "Streams 队列中各消费者已取出未 ack 的消息数", ("queue", "consumer")
+    )
+    up = Gauge("pyxxl_redis_queue_scrape_success", "本次抓取 Redis 队列大小是否成功")
+    try:
+        redis_utils = importlib.import_module(f"{jobs_path}.redis_utils")
+        queues = {
+            "activity_order_queue": redis_utils.activity_order_queue,
+            "order_state_queue": redis_utils.order_state_queue,
+        }
+        async with asyncio.timeout(METRICS_REDIS_TIMEOUT):
+            stats = await asyncio.gather(*(queue.stats() for queue in queues.values()))
+            consumer_stats = await asyncio.gather(*(queue.consumer_stats() for queue in queues.values()))
+        for name, values, consumers in zip(queues, stats, consumer_stats):
+            for state, value in values.items():
+                size.set(name, state, value=value)
+            for consumer, value in consumers.items():
+                consumer_pending.set(name, consumer, value=value)
+        up.set(value=1)
+    except Exception as e:
+        logger.warning(f"采集 Redis 队列大小失败：{e}")
+        up.set(value=0)
+    return [size, consumer_pending, up]
+
+
+@routes.get("/metrics")
+async def metrics(request: web.Request) -> web.Response:
+    """Prometheus 文本格式的指标"""
+    extra = _in_flight_gauges(request.app) + _loop_lag_gauges() + await _redis_queue_gauges()
+    return web.Response(body=job_metrics.render(extra).encode("utf-8"), headers={"Content-Type": METRICS_CONTENT_TYPE})
+
+
 class LogResponse(TypedDict):
     fromLineNum: int
     toLineNum: int
@@ -67,28 +365,45 @@ class LogResponse(TypedDict):
     isEnd: bool
 
 
+def _read_detached_log_lines(log_id: int, key: str, from_line: int, count: int) -> Tuple[str, int, bool]:
+    """
+    日志文件已不在磁盘上时的读取：
+    1. 已被归档的日志，只解压覆盖这一页的压缩块
+    2. 被 mode=discard 丢弃的调度，从丢弃 journal 渲染
+    都没有时抛 FileNotFoundError
+    """
+    try:
+        return task_log_archive.read_lines(os.path.basename(key), from_line, count)
+    except FileNotFoundError:
+        return discard_journal.read_lines(int(log_id), from_line, count)
+
+
 async def hacked_get_logs(self, request: LogRequest, *, key: Optional[str] = None) -> LogResponse:
-    # todo: 优化获取中间行的逻辑，缓存之前每行日志的大小然后直接seek
     key = key or self.key(request["logId"])
-    logs = ""
     from_line = request["fromLineNum"]
-    to_line_num = from_line - 1  # 👈 初始化为上一行
-    is_end = False
+    # 读取第 from_line 行到第 (from_line + tail - 1) 行，借助行偏移索引直接 seek 到起始行
+    count = from_line + self.log_tail_lines - max(from_line, 1)
 
     try:
-        async with aiofiles.open(key, mode="r") as f:
-            # 读取从第 1 行到 (from_line + tail - 1) 行
-            for i in range(1, from_line + self.log_tail_lines):
-                line = await f.readline()
-                if line == "":
-                    is_end = True
-                    break
-                if i >= from_line:
-                    to_line_num = i
-                    logs += line
+        logs, to_line_num, is_end = await asyncio.to_thread(
+            task_log_line_index.read_lines, key, from_line, count
+        )
     except FileNotFoundError as e:
+        try:
+            logs, to_line_num, is_end = await asyncio.to_thread(
+                _read_detached_log_lines, request["logId"], key, from_line, count
+            )
+            return LogResponse(
+                fromLineNum=request["fromLineNum"],
+                toLineNum=to_line_num,
+                logContent=logs,
+                isEnd=is_end,
+            )
+        except FileNotFoundError:
+            pass
         self.executor_logger.warning(str(e), exc_info=True)
         logs = "No such logid logs."
+        to_line_num = from_line - 1
         is_end = True  # 文件不存在，也算“结束”
     return LogResponse(
         fromLineNum=request["fromLineNum"],
@@ -98,7 +413,29 @@ async def hacked_get_logs(self, request: LogRequest, *, key: Optional[str] = Non
     )
 
 
+_original_expired_once = DiskLog.expired_once
+
+
+async def hacked_expired_once(self, batch: int = 1000) -> None:
+    await _original_expired_once(self, batch)
+    # 压缩归档长时间未修改的日志，再按保留天数和字节预算清理归档目录
+    try:
+        await asyncio.to_thread(task_log_archive.archive_once)
+        await asyncio.to_thread(task_log_archive.enforce_retention)
+        await asyncio.to_thread(discard_journal.expire, self.expired_seconds)
+    except Exception as e:
+        self.executor_logger.error(f"任务日志归档失败: {e}")
+
+
 DiskLog.get_logs = hacked_get_logs
+DiskLog.expired_once = hacked_expired_once
+
+
+def _mark_dispatched(log_id: int) -> None:
+    """记录 /run 受理时间，开始执行时算出排队时长；从未开始执行的调度（被覆盖、被取消）按先后淘汰"""
+    _job_dispatched_at[log_id] = perf_counter()
+    if len(_job_dispatched_at) > JOB_DISPATCHED_AT_SIZE:
+        _job_dispatched_at.popitem(last=False)
 
 
 def _get_mode(data: RunData):
@@ -108,95 +445,269 @@ def _get_mode(data: RunData):
       mode=discard
       mode=serial
       {"mode":"discard"}   # 如果你用的是 JSON
+    同一个参数字符串只解析一次，和 jobs 中的参数类共用缓存
     """
-    params = data.executorParams or ""
+    return get_mode(data.executorParams)
 
-    # JSON 风格
-    if params.startswith("{") and params.endswith("}"):
-        try:
-            return json.loads(params).get("mode")
-        except (Exception,):
-            return None
 
-    # querystring 风格
-    qs = parse_qs(params)
-    return qs.get("mode", [None])[0]
+def _reserve_admission(data: RunData) -> None:
+    """占准入名额，准入等待队列已满时按重复调度拒绝"""
+    try:
+        job_admission.reserve(data.executorHandler, data.logId)
+    except AdmissionRejected as e:
+        raise error.JobDuplicateError(str(e))
+
+
+def _enqueue_by_strategy(self: Executor, data: RunData, queue: asyncio.Queue) -> str:
+    """
+    XXL 原始 SERIAL / COVER / DISCARD 判定，在 run_job 的同一把锁内执行（原方法会自己加锁，不能在锁内调用）
+    进入排队的调度之后都会开始执行，入队前同样占准入名额
+    """
+    strategy = data.executorBlockStrategy
+    if strategy == executorBlockStrategy.DISCARD_LATER.value:
+        raise error.JobDuplicateError("The same job [%s] is already executing and this has been discarded." % data)
+    if strategy not in (executorBlockStrategy.COVER_EARLY.value, executorBlockStrategy.SERIAL_EXECUTION.value):
+        raise error.JobParamsError(
+            "unknown executorBlockStrategy [%s]." % strategy, executorBlockStrategy=strategy
+        )
+    if queue.full():
+        msg = "Job {job_id} is  SERIAL, queue length more than {maxsize}.Job {job}  discard!".format(
+            job_id=data.jobId, job=data, maxsize=queue.maxsize
+        )
+        self.executor_logger.error(msg)
+        raise error.JobDuplicateError(msg)
+    _reserve_admission(data)
+    _mark_dispatched(data.logId)
+    ranked = queue.qsize() + 1
+    queue.put_nowait(data)
+    if strategy == executorBlockStrategy.COVER_EARLY.value:
+        _spawn_task(self.loop.create_task(self.cancel_job(data.jobId, include_queue=False)))
+        return "Job {} BlockStrategy is COVER_EARLY, logId {} replaced.".format(data.jobId, data.logId)
+    return "job {job_id} is in queen, logId {log_id} ranked {ranked}th [max={maxsize}]...".format(
+        job_id=data.jobId, log_id=data.logId, ranked=ranked, maxsize=queue.maxsize
+    )
 
 
 async def hacked_run_job(self, data: RunData):
     handler_obj = self.handler.get(data.executorHandler)
     if not handler_obj:
         self.executor_logger.warning("handler %s not found." % data.executorHandler)
+        JOB_DISPATCH_TOTAL.inc(data.executorHandler, "not_found")
         raise error.JobNotFoundError("handler %s not found." % data.executorHandler)
 
     mode = _get_mode(data)
     force_discard = (mode == "discard")
 
+    # 锁内只做判定，不做任何 I/O，避免并发触发时串行等待
     async with self.lock:
         current_task = self.tasks.get(data.jobId)
         queue = self.get_queue(data.jobId)
 
-        # 没有在跑 → 直接执行
-        if not current_task and queue.empty():
-            self.tasks[data.jobId] = self._create_task(data)
-            return "Running"
-
-        self.executor_logger.warning(
-            "jobId=%s handler=%s mode=%s running, strategy=%s",
-            data.jobId,
-            data.executorHandler,
-            mode,
-            data.executorBlockStrategy,
-        )
+        try:
+            # 没有在跑 → 直接执行（准入等待队列已满时拒绝）
+            if not current_task and queue.empty():
+                _reserve_admission(data)
+                _mark_dispatched(data.logId)
+                self.tasks[data.jobId] = self._create_task(data)
+                JOB_DISPATCH_TOTAL.inc(data.executorHandler, "running")
+                return "Running"
+
+            # 否则：走 XXL 原始 SERIAL / COVER / DISCARD 逻辑，和上面的判定在同一把锁内，排队的调度同样占准入名额
+            if not force_discard:
+                result = _enqueue_by_strategy(self, data, queue)
+        except error.JobDuplicateError:
+            JOB_DISPATCH_TOTAL.inc(data.executorHandler, "rejected")
+            raise
+
+    self.executor_logger.warning(
+        "jobId=%s handler=%s mode=%s running, strategy=%s",
+        data.jobId,
+        data.executorHandler,
+        mode,
+        data.executorBlockStrategy,
+    )
 
-        # 💣 Executor 级丢弃（Admin 以为是 SERIAL）
-        if force_discard:
-            self.executor_logger.warning(
-                f"[DISCARD_BY_PARAM] jobId={data.jobId} "
-                f"handler={data.executorHandler} "
-                f"logId={data.logId} params={data.executorParams}"
-            )
+    if not force_discard:
+        JOB_DISPATCH_TOTAL.inc(data.executorHandler, "queued")
+        return result
+
+    # 💣 Executor 级丢弃（Admin 以为是 SERIAL）
+    self.executor_logger.warning(
+        "[DISCARD_BY_PARAM] jobId=%s handler=%s logId=%s params=%s",
+        data.jobId,
+        data.executorHandler,
+        data.logId,
+        data.executorParams,
+    )
 
-            # 💡 关键：创建空日志文件
-            log_file_path = os.path.join(
-                self.config.log_local_dir,
-                f"pyxxl-{data.logId}.log"
-            )
-            # 确保目录存在
-            os.makedirs(os.path.dirname(log_file_path), exist_ok=True)
-
-            # 生成日志内容
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            log_content = (
-                f"[{timestamp}] INFO - Task discarded by executor.\n"
-                f"[{timestamp}] INFO - Reason: Execution mode is 'discard'.\n"
-                f"[{timestamp}] INFO - Job ID: {data.jobId}, Log ID: {data.logId}\n"
-                f"[{timestamp}] INFO - Handler: {data.executorHandler}\n"
-                f"[{timestamp}] INFO - Parameters: {data.executorParams}\n"
-            )
+    # 💡 关键：丢弃记录追加到共享的 journal，/log 查询该 logId 时从 journal 渲染
+    discard_journal.append(data.jobId, data.logId, data.executorHandler, data.executorParams)
+
+    start_time = int(time() * 1000)
+    # 返回 200 给 admin（写入回调发件箱后立即返回，不阻塞本次 /run 响应）
+    await self.xxl_client.callback(
+        data.logId,
+        start_time,
+        code=200,  # 200 = Admin 显示“执行成功”
+        # msg=msg,  # 👈 这个会显示在「执行备注」
+        msg=""  # 执行备注将什么都不显示。不要传 None，一定要是 ""（空字符串），否则 XXL-Job Java 端可能会写成 "null"。
+    )
 
-            # 创建空文件（异步）
-            async with aiofiles.open(log_file_path, "w") as f:
-                await f.write(log_content)
-
-            start_time = int(time() * 1000)
-            # 返回 200 给 admin
-            await self.xxl_client.callback(
-                data.logId,
-                start_time,
-                code=200,  # 200 = Admin 显示“执行成功”
-                # msg=msg,  # 👈 这个会显示在「执行备注」
-                msg=""  # 执行备注将什么都不显示。不要传 None，一定要是 ""（空字符串），否则 XXL-Job Java 端可能会写成 "null"。
-            )
+    JOB_DISPATCH_TOTAL.inc(data.executorHandler, "discarded")
+    return "DISCARDED"
 
-            return "DISCARDED"
 
-        # 否则：走 XXL 原始 SERIAL / COVER / DISCARD 逻辑
-        return await _original_run_job(self, data)
+async def hacked_cancel_job(self, job_id: int, include_queue: bool = True) -> None:
+    """与原方法相同，清空排队时一并归还这些调度在 /run 时占的准入名额"""
+    await asyncio.sleep(0.01)
+    self.executor_logger.warning("start kill job: job_id={}".format(job_id))
+    async with self.lock:
+        if include_queue:
+            queue = self.get_queue(job_id)
+            while not queue.empty():
+                data = queue.get_nowait()
+                job_admission.unreserve(data.executorHandler, data.logId)
+                _job_dispatched_at.pop(data.logId, None)
+                self.executor_logger.warning("Discard jobId {} from queue,data: {}".format(job_id, data))
+
+        task = self.tasks.get(job_id, None)
+        if task:
+            task.cancel()
+            try:
+                await task.task
+            except asyncio.CancelledError:
+                self.executor_logger.warning("Job %s cancelled." % job_id)
 
 
 # 🔥 打补丁
 Executor.run_job = hacked_run_job
+Executor.cancel_job = hacked_cancel_job
+
+
+_original_handler_start = HandlerInfo.start
+
+
+def _execution_mode(handler, data: RunData) -> Optional[str]:
+    """调度参数 execution_mode 优先，其次是 register() 时 @process_mode 的声明"""
+    if not job_process_pool.enabled:
+        return None
+    return get_execution_mode(data.executorParams) or get_handler_execution_mode(handler)
+
+
+async def _run_in_process(handler, data: RunData):
+    # 懒加载的占位 handler 记录了真正的任务模块，子进程自己导入，主进程不必导入
+    module_name = getattr(handler, "job_module", handler.__module__)
+    start = perf_counter()
+    try:
+        return await job_process_pool.run(module_name, data.executorHandler, data)
+    finally:
+        g.logger.info("Process pool run %s cost %.1fms" % (data.executorHandler, (perf_counter() - start) * 1000))
+
+
+async def hacked_handler_start(self, timeout: int):
+    # 在 handler 超时计时之外排队拿准入额度，排队期间被取消时 Executor._run 照常回调和收尾
+    data = g.xxl_run_data
+    dispatched_at = _job_dispatched_at.pop(data.logId, None)
+    wait = await job_admission.acquire(data.executorHandler, data.logId)
+    if wait:
+        g.logger.info("Admission wait %.3fs before start, handler=%s" % (wait, data.executorHandler))
+    start = perf_counter()
+    if dispatched_at is not None:
+        JOB_QUEUE_WAIT_SECONDS.observe(data.executorHandler, value=start - dispatched_at)
+    status = "failed"
+    try:
+        if _execution_mode(self.handler, data) == PROCESS_MODE:
+            # 超时或被 kill 时 wait_for 取消等待，JobProcessPool 再通知子进程取消
+            result = await asyncio.wait_for(_run_in_process(self.handler, data), timeout=timeout)
+        else:
+            result = await _original_handler_start(self, timeout)
+        status = "success"
+        return result
+    except asyncio.TimeoutError:
+        status = "timeout"
+        raise
+    except asyncio.CancelledError:
+        status = "cancelled"
+        raise
+    finally:
+        job_admission.release(data.executorHandler)
+        JOB_RUN_TOTAL.inc(data.executorHandler, status)
+        JOB_RUN_SECONDS.observe(data.executorHandler, value=perf_counter() - start)
+
+
+HandlerInfo.start = hacked_handler_start
+
+
+async def hacked_callback(self, log_id: int, timestamp: int, code: int = 200, msg: Optional[str] = None) -> None:
+    # 只写入本地发件箱，由后台 flusher 批量发送给 admin，admin 慢或不可用时不再拖住任务协程；
+    # 入箱前等写线程把该任务此前的日志刷盘，admin 收到回调后拉取 /log 能读到最后几行
+    await flush_task_log(g._LOGGER.get(None))
+    callback_outbox.put(log_id, timestamp, code=code, msg=msg)
+
+
+XXL.callback = hacked_callback
+
+_original_http_request = HttpClientFactory.request
+
+
+async def hacked_http_request(self, method: str, url: str, **kwargs):
+    # 按上游域名记录请求耗时（含 http_helper 内部重试），status 只区分成功与异常
+    start = perf_counter()
+    status = "error"
+    try:
+        result = await _original_http_request(self, method, url, **kwargs)
+        status = "ok"
+        return result
+    finally:
+        UPSTREAM_REQUEST_SECONDS.observe(self.domain, str(method).lower(), status, value=perf_counter() - start)
+
+
+HttpClientFactory.request = hacked_http_request
+
+_original_create_server_app = PyxxlRunner.create_server_app
+
+
+async def callback_outbox_ctx(app: web.Application):
+    xxl_client = app["pyxxl_state"].xxl_client
+    callback_outbox.open()
+    flush_task = asyncio.create_task(callback_outbox.run(xxl_client), name="callback_outbox_task")
+
+    yield
+
+    flush_task.cancel()
+    await callback_outbox.close(xxl_client)
+
+
+async def job_process_pool_ctx(app: web.Application):
+    try:
+        await job_process_pool.start()
+    except Exception as e:
+        # 预热失败不影响执行器启动，首次调度时再拉起子进程
+        logger.warning(f"任务进程池预热失败：{e}")
+
+    yield
+
+    job_process_pool.shutdown()
+
+
+async def loop_lag_monitor_ctx(app: web.Application):
+    monitor_task = asyncio.create_task(loop_lag_monitor.run(), name="loop_lag_monitor_task")
+
+    yield
+
+    monitor_task.cancel()
+
+
+def hacked_create_server_app(self) -> web.Application:
+    app = _original_create_server_app(self)
+    # 追加在 pyxxl 的 cleanup_ctx 之后：启动时 xxl_client 已创建，退出时先于 xxl_client 关闭执行
+    app.cleanup_ctx.append(callback_outbox_ctx)
+    app.cleanup_ctx.append(job_process_pool_ctx)
+    app.cleanup_ctx.append(loop_lag_monitor_ctx)
+    return app
+
+
+PyxxlRunner.create_server_app = hacked_create_server_app
 
 # ---------------------------------------------------
 # 1. 配置 Pyxxl 执行器（官方规范）
@@ -221,12 +732,163 @@ config = ExecutorConfig(
     debug=True,
 )
 
+# 任务日志归档：超过 N 小时未修改的日志压缩进段文件，归档目录按保留天数和字节预算清理
+task_log_archive = LogArchive(
+    config.log_local_dir,
+    archive_after_hours=float(os.getenv("LOG_ARCHIVE_AFTER_HOURS", 6)),
+    retention_days=float(os.getenv("LOG_ARCHIVE_RETENTION_DAYS", 30)),
+    max_bytes=int(os.getenv("LOG_ARCHIVE_MAX_BYTES", 2 * 1024 * 1024 * 1024)),
+    logger=logger,
+)
+
+# mode=discard 丢弃的调度记录
+discard_journal = DiscardJournal(config.log_local_dir)
+
+# 回调 admin 的本地发件箱：批量发送、失败退避重试、重启后重放
+callback_outbox = CallbackOutbox(
+    config.log_local_dir,
+    batch_size=int(os.getenv("CALLBACK_OUTBOX_BATCH_SIZE", 100)),
+    flush_interval=float(os.getenv("CALLBACK_OUTBOX_FLUSH_INTERVAL", 0.2)),
+    max_backoff=float(os.getenv("CALLBACK_OUTBOX_MAX_BACKOFF", 60)),
+    max_attempts=int(os.getenv("CALLBACK_OUTBOX_MAX_ATTEMPTS", 5)),
+    logger=logger,
+)
+
+# 任务准入控制：浏览器任务权重高且同时只跑一个，HTTP 任务权重 1；可用 JSON 环境变量覆盖
+JOB_ADMISSION_WEIGHTS = {"update_qlv_login_state": 10, "fetch_flight_activity_order": 2}
+JOB_ADMISSION_LIMITS = {"update_qlv_login_state": 1}
+job_admission = AdmissionController(
+    global_budget=int(os.getenv("JOB_ADMISSION_BUDGET", 20)),
+    weights={**JOB_ADMISSION_WEIGHTS, **json.loads(os.getenv("JOB_ADMISSION_WEIGHTS") or "{}")},
+    limits={**JOB_ADMISSION_LIMITS, **json.loads(os.getenv("JOB_ADMISSION_LIMITS") or "{}")},
+    queue_length=int(os.getenv("JOB_ADMISSION_QUEUE_LENGTH", config.task_queue_length)),
+    logger=logger,
+)
+
+# jobs 目录的内容哈希与模块依赖图，热重载时只重新加载真正受影响的模块
+job_module_graph = JobModuleGraph(jobs_path, logger=logger)
+
+# 懒加载任务模块：启动时只按静态解析出的 handler 名称注册，首次调度时才导入模块
+JOB_LAZY_IMPORT = os.getenv("JOB_LAZY_IMPORT", "false").lower() in ("1", "true", "yes")
+
+# CPU 密集型任务的进程池：@process_mode 声明或 execution_mode=process 的 handler 在子进程中执行，0 表示关闭
+job_process_pool = JobProcessPool(
+    config.log_local_dir,
+    max_workers=int(os.getenv("JOB_PROCESS_POOL_SIZE", 1)),
+    preload=os.getenv("JOB_PROCESS_POOL_PRELOAD", "").split(","),
+    logger=logger,
+)
+
+# 事件循环延迟监控：阻塞超过阈值时抓取事件循环线程的调用栈；/healthCheck/deep 的判定阈值
+loop_lag_monitor = LoopLagMonitor(
+    interval=float(os.getenv("LOOP_LAG_INTERVAL", 0.5)),
+    threshold=float(os.getenv("LOOP_LAG_STALL_THRESHOLD", 0.5)),
+    logger=logger,
+)
+HEALTH_LOOP_LAG_P99_LIMIT = float(os.getenv("HEALTH_LOOP_LAG_P99_LIMIT", 1))
+HEALTH_REDIS_TIMEOUT = float(os.getenv("HEALTH_REDIS_TIMEOUT", 2))
+
+# 执行器指标，/metrics 输出
+job_metrics = MetricsRegistry()
+JOB_DISPATCH_TOTAL = job_metrics.counter(
+    "pyxxl_job_dispatch_total", "/run 收到的调度数，result=running/queued/discarded/rejected/not_found",
+    ("handler", "result"),
+)
+JOB_RUN_TOTAL = job_metrics.counter(
+    "pyxxl_job_run_total", "执行完成的任务数，status=success/failed/timeout/cancelled", ("handler", "status")
+)
+JOB_RUN_SECONDS = job_metrics.histogram("pyxxl_job_run_duration_seconds", "任务执行耗时（不含排队）", ("handler",))
+JOB_QUEUE_WAIT_SECONDS = job_metrics.histogram(
+    "pyxxl_job_queue_wait_seconds", "从 /run 受理到开始执行的等待时长（串行队列 + 准入排队）", ("handler",)
+)
+UPSTREAM_REQUEST_SECONDS = job_metrics.histogram(
+    "pyxxl_upstream_request_duration_seconds", "上游 HTTP 请求耗时", ("domain", "method", "status"), LATENCY_BUCKETS
+)
+# logId -> /run 受理时间
+JOB_DISPATCHED_AT_SIZE = 10000
+_job_dispatched_at: "OrderedDict[int, float]" = OrderedDict()
+
 executor = PyxxlRunner(config)
 
 
 # ---------------------------------------------------
 # 2. 通用加载任务函数
 # ---------------------------------------------------
+# 模块名 -> 上次导入时实际注册的 handler 名称
+_loaded_module_handlers: Dict[str, Set[str]] = dict()
+_lazy_import_locks: Dict[str, asyncio.Lock] = dict()
+
+
+def _module_handler_names(module_name: str) -> Set[str]:
+    """模块对应的 handler：上次实际注册的、静态解析出的，以及与模块同名的"""
+    return (
+            _loaded_module_handlers.get(module_name, set())
+            | set(job_module_graph.handlers.get(module_name, []))
+            | {module_name}
+    )
+
+
+def _prefetch_job_module(module_path: str) -> None:
+    """只查找并读取模块文件（stat、读 .py / .pyc），在线程中执行；导入和 register 留在事件循环线程"""
+    try:
+        spec = importlib.util.find_spec(module_path)
+        if spec is not None and hasattr(spec.loader, "get_code"):
+            spec.loader.get_code(module_path)
+    except Exception as e:
+        logger.debug(f"预读任务模块<{module_path}>失败，导入时再读：{e}")
+
+
+def _make_lazy_handler(module_name: str, handler_name: str):
+    """占位 handler：首次被调度时才导入真正的任务模块，再转调模块注册的 handler"""
+
+    async def lazy_handler():
+        lock = _lazy_import_locks.setdefault(module_name, asyncio.Lock())
+        async with lock:
+            handler_obj = executor.handler.get(handler_name)
+            if handler_obj is None or handler_obj.handler is lazy_handler:
+                start = perf_counter()
+                # 导入会执行模块顶层代码和 register，与事件循环上的其它协程共享 executor.handler，不能放到线程里
+                await asyncio.to_thread(_prefetch_job_module, f"{jobs_path}.{module_name}")
+                load_job_module(f"{jobs_path}.{module_name}")
+                cost = (perf_counter() - start) * 1000
+                g.logger.info("Lazy import %s.%s cost %.1fms" % (jobs_path, module_name, cost))
+                handler_obj = executor.handler.get(handler_name)
+        if handler_obj is None or handler_obj.handler is lazy_handler:
+            raise error.JobNotFoundError("handler %s not registered by %s.%s" % (handler_name, jobs_path, module_name))
+        if _execution_mode(handler_obj.handler, g.xxl_run_data) == PROCESS_MODE:
+            return await _run_in_process(handler_obj.handler, g.xxl_run_data)
+        if handler_obj.is_async:
+            return await handler_obj.handler()
+        return await asyncio.to_thread(handler_obj.handler)
+
+    lazy_handler.__name__ = handler_name
+    lazy_handler.job_module = f"{jobs_path}.{module_name}"
+    return lazy_handler
+
+
+def register_lazy_job_module(module_name: str) -> List[str]:
+    """按静态解析出的 handler 名称注册占位 handler，不导入模块"""
+    handler_names = job_module_graph.handlers.get(module_name, [])
+    for handler_name in handler_names:
+        executor.handler.register(name=handler_name, replace=True)(_make_lazy_handler(module_name, handler_name))
+    return handler_names
+
+
+def reload_job_module(module_name: str) -> None:
+    """热重载一个模块：懒加载模式下还没被导入过的模块只刷新占位 handler"""
+    module_path = f"{jobs_path}.{module_name}"
+    if JOB_LAZY_IMPORT and module_path not in sys.modules:
+        if module_name not in job_module_graph.hashes:
+            return
+        for handler_name in _loaded_module_handlers.pop(module_name, set()):
+            executor.handler._handlers.pop(handler_name, None)
+        handler_names = register_lazy_job_module(module_name)
+        if handler_names:
+            logger.info(f"懒加载模式，刷新占位任务: {module_path} -> {handler_names}")
+        return
+    load_job_module(module_path)
+
+
 def load_job_module(module_path):
     """通用加载任务模块并注册的函数"""
     try:
@@ -241,22 +903,23 @@ def load_job_module(module_path):
             if isinstance(handlers_dict, dict):
                 logger.info(f"当前注册的任务数量: {len(handlers_dict)}")
 
-                if module_name in handlers_dict:
+                registered_names = [x for x in _module_handler_names(module_name) if x in handlers_dict]
+                if not registered_names:
+                    logger.info(f"任务 {module_name} 未注册，直接进行新注册")
+                for handler_name in registered_names:
                     # 保存旧处理器信息（用于调试）
-                    old_handler = handlers_dict[module_name]
+                    old_handler = handlers_dict[handler_name]
                     logger.info(f"旧处理器信息: {type(old_handler)}")
 
-                    # 取消注册
-                    del handlers_dict[module_name]
-                    logger.info(f"✓ 已取消注册任务: {module_name}")
+                    # 取消注册（包括懒加载的占位 handler）
+                    del handlers_dict[handler_name]
+                    logger.info(f"✓ 已取消注册任务: {handler_name}")
 
                     # 验证取消注册
-                    if module_name not in handlers_dict:
+                    if handler_name not in handlers_dict:
                         logger.info(f"✓ 取消注册验证成功")
                     else:
                         logger.error(f"✗ 取消注册验证失败")
-                else:
-                    logger.info(f"任务 {module_name} 未注册，直接进行新注册")
             else:
                 logger.warning(f"_handlers 不是字典: {type(handlers_dict)}")
         else:
@@ -290,16 +953,19 @@ def load_job_module(module_path):
         if hasattr(module, "register"):
             # 检查注册函数是否可调用
             if callable(module.register):
+                before = set(job_handler._handlers)
                 module.register(executor)
+                _loaded_module_handlers[module_name] = set(job_handler._handlers) - before
                 logger.info(f"✓ 成功调用 register 函数")
 
                 # 步骤6：验证注册结果
                 if hasattr(job_handler, '_handlers') and isinstance(job_handler._handlers, dict):
-                    if module_name in job_handler._handlers:
-                        new_handler = job_handler._handlers[module_name]
-                        logger.info(f"✓ 任务注册成功，新处理器: {type(new_handler)}")
-                    else:
-                        logger.error(f"✗ 任务注册失败，任务未出现在处理器字典中")
+                    for handler_name in job_module_graph.handlers.get(module_name) or [module_name]:
+                        if handler_name in job_handler._handlers:
+                            new_handler = job_handler._handlers[handler_name]
+                            logger.info(f"✓ 任务 {handler_name} 注册成功，新处理器: {type(new_handler)}")
+                        else:
+                            logger.error(f"✗ 任务 {handler_name} 注册失败，任务未出现在处理器字典中")
                 else:
                     logger.warning(f"无法验证注册结果")
             else:
@@ -351,23 +1017,30 @@ def auto_load_jobs():
         job_handler._handlers.clear()
         logger.info(f"已清空所有任务处理器")
 
-    for filename in os.listdir(jobs_path):
-        if filename.endswith(".py") and filename != "__init__.py":
-            module_name = filename[:-3]
-            module_path = f"{jobs_path}.{module_name}"
+    # 记录各模块的内容哈希和依赖关系，按依赖在前的顺序加载
+    job_module_graph.scan()
+    for module_name in job_module_graph.topo_order(job_module_graph.list_modules()):
+        module_path = f"{jobs_path}.{module_name}"
 
-            try:
-                # 直接导入并注册，不先检查是否已存在
-                module = importlib.import_module(module_path)
+        if JOB_LAZY_IMPORT:
+            # 懒加载：只注册占位 handler，首次调度时再导入模块
+            handler_names = register_lazy_job_module(module_name)
+            if handler_names:
+                logger.info(f"懒加载任务: {module_path} -> {handler_names}")
+            continue
 
-                if hasattr(module, "register"):
-                    module.register(executor)
-                    logger.info(f"加载任务: {module_path}")
-                else:
-                    logger.warning(f"{module_path} 未定义 register(executor)，跳过")
+        try:
+            # 直接导入并注册，不先检查是否已存在
+            module = importlib.import_module(module_path)
 
-            except Exception as e:
-                logger.error(f"加载任务 {module_path} 失败: {e}")
+            if hasattr(module, "register"):
+                module.register(executor)
+                logger.info(f"加载任务: {module_path}")
+            else:
+                logger.warning(f"{module_path} 未定义 register(executor)，跳过")
+
+        except Exception as e:
+            logger.error(f"加载任务 {module_path} 失败: {e}")
 
 
 # ---------------------------------------------------
@@ -394,30 +1067,33 @@ class DebouncedJobFileEventHandler(FileSystemEventHandler):
             self._timer = None
 
         logger.info(f"需要处理 {len(events)} 个事件")
-        for event_path in events:
-            self._handle_single_event(event_path)
+        self._reload_changed(events)
 
     @staticmethod
-    def _handle_single_event(event_path):
-        logger.info(f"处理单个事件: {event_path}")
-        if event_path.endswith(".py") and not event_path.endswith("__init__.py"):
-            if os.path.exists(event_path):
-                logger.info(f"重新加载模块: {event_path}")
-                module_name = os.path.basename(event_path)[:-3]
-                module_path = f"{jobs_path}.{module_name}"
-
-                # 卸载模块
-                if module_path in sys.modules:
-                    del sys.modules[module_path]
-                    logger.info(f"已卸载模块: {module_path}")
-
-                # 重新加载
-                try:
-                    load_job_module(module_path)
-                except Exception as e:
-                    logger.warning(f"重新加载失败: {e}")
-            else:
-                logger.error(f"文件不存在，跳过: {event_path}")
+    def _reload_changed(event_paths):
+        """按内容哈希找出真正变化的模块，连同依赖它们的模块一起按拓扑顺序重新加载"""
+        start = perf_counter()
+        changed = job_module_graph.refresh(event_paths)
+        if not changed:
+            logger.info(f"文件内容未变化，跳过重新加载: {sorted(event_paths)}")
+            return
+
+        plan = job_module_graph.reload_plan(changed)
+        logger.info(f"内容变化的模块: {changed}，需要按顺序重新加载: {plan}")
+        costs = list()
+        for module_name in plan:
+            module_start = perf_counter()
+            try:
+                reload_job_module(module_name)
+            except Exception as e:
+                logger.warning(f"重新加载失败: {e}")
+            costs.append(f"{module_name}={(perf_counter() - module_start) * 1000:.1f}ms")
+        # 子进程里缓存的是旧模块，重启进程池让后续任务导入新代码
+        job_process_pool.restart()
+
+        logger.info(
+            f"热重载完成，共重新加载 {len(plan)} 个模块，总耗时 {(perf_counter() - start) * 1000:.1f}ms: {', '.join(costs)}"
+        )
 
     def _schedule_processing(self, event_path):
         logger.info(f"调度处理: {event_path}")
@@ -449,6 +1125,12 @@ class DebouncedJobFileEventHandler(FileSystemEventHandler):
             logger.info(f"文件已删除: {event.src_path}")
             module_name = os.path.basename(event.src_path)[:-3]
             module_path = f"jobs.{module_name}"
+            if event.src_path.endswith(".py"):
+                # 取消注册该模块的任务（包括懒加载的占位 handler）
+                for handler_name in _module_handler_names(module_name):
+                    executor.handler._handlers.pop(handler_name, None)
+                _loaded_module_handlers.pop(module_name, None)
+                job_module_graph.remove(module_name)
 
             if module_path in sys.modules:
                 del sys.modules[module_path]
@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""
+# ---------------------------------------------------------------------------------------------------------
+# ProjectName:  cronjob-1717
+# FileName:     __init__.py
+# Description:  性能基准测试包
+# Author:       ASUS
+# CreateDate:   2026/10/18
+# Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
+# ---------------------------------------------------------------------------------------------------------
+"""
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+# ---------------------------------------------------------------------------------------------------------
+# ProjectName:  cronjob-1717
+# FileName:     discard_dispatch_benchmark.py
+# Description:  mode=discard 丢弃路径基准：锁内写文件+回调 vs 锁外 journal 追加+后台回调
+# Author:       ASUS
+# CreateDate:   2026/10/18
+# Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
+# ---------------------------------------------------------------------------------------------------------
+"""
+import os
+import asyncio
+import aiofiles
+import tempfile
+from time import time, perf_counter
+from datetime import datetime
+from typing import List
+from discard_journal import DiscardJournal
+
+"""
+运行方式（项目根目录下）：python -m benchmarks.discard_dispatch_benchmark
+模拟同一个 jobId 正在运行时，admin 并发触发大量 mode=discard 调度，统计每次 run_job 的返回耗时和总吞吐
+回调 admin 的网络耗时用 CALLBACK_LATENCY 模拟
+"""
+
+CALLBACK_LATENCY = 0.02
+TRIGGERS = (100, 500)
+PARAMS = "mode=discard&order_id=123456"
+
+
+class FakeXXL:
+
+    def __init__(self):
+        self.callbacks = 0
+
+    async def callback(self, log_id: int, timestamp: int, code: int = 200, msg: str = "") -> None:
+        await asyncio.sleep(CALLBACK_LATENCY)
+        self.callbacks += 1
+
+
+class FakeExecutor:
+    """只保留丢弃路径用到的属性：锁、正在运行的任务、回调客户端"""
+
+    def __init__(self, log_dir: str):
+        self.lock = asyncio.Lock()
+        self.tasks = {1: object()}
+        self.xxl_client = FakeXXL()
+        self.loop = asyncio.get_running_loop()
+        self.log_dir = log_dir
+        self.journal = DiscardJournal(log_dir)
+        self.background = set()
+
+
+async def legacy_discard(self: FakeExecutor, log_id: int) -> str:
+    """改造前：持有 executor 锁时创建独立日志文件、写 5 行、等待 admin 回调"""
+    async with self.lock:
+        if self.tasks.get(1):
+            os.makedirs(self.log_dir, exist_ok=True)
+            log_file = os.path.join(self.log_dir, f"pyxxl-{log_id}.log")
+            start_time = int(time() * 1000)
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            lines = [
+                f"[{timestamp}] INFO - Task discarded by executor.\n",
+                f"[{timestamp}] INFO - Reason: Execution mode is 'discard'.\n",
+                f"[{timestamp}] INFO - Job ID: 1, Log ID: {log_id}\n",
+                f"[{timestamp}] INFO - Handler: bench\n",
+                f"[{timestamp}] INFO - Parameters: {PARAMS}\n",
+            ]
+            async with aiofiles.open(log_file, mode="w", encoding="utf-8") as f:
+                await f.writelines(lines)
+            await self.xxl_client.callback(log_id, start_time, code=200, msg="")
+            return "DISCARDED"
+    return "Running"
+
+
+async def journal_discard(self: FakeExecutor, log_id: int) -> str:
+    """改造后：锁内只做判定，锁外追加一行 journal，回调放到后台"""
+    async with self.lock:
+        if not self.tasks.get(1):
+            return "Running"
+    self.journal.append(1, log_id, "bench", PARAMS)
+    task = self.loop.create_task(self.xxl_client.callback(log_id, int(time() * 1000), code=200, msg=""))
+    self.background.add(task)
+    task.add_done_callback(self.background.discard)
+    return "DISCARDED"
+
+
+async def run(func, triggers: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        executor = FakeExecutor(tmp)
+        cost: List[float] = list()
+
+        async def trigger(log_id: int) -> None:
+            start = perf_counter()
+            await func(executor, log_id)
+            cost.append(perf_counter() - start)
+
+        start = perf_counter()
+        await asyncio.gather(*(trigger(i) for i in range(1, triggers + 1)))
+        elapsed = perf_counter() - start
+        await asyncio.gather(*executor.background)
+        files = len(os.listdir(tmp))
+        cost.sort()
+        print(
+            f"{func.__name__:<16} triggers={triggers:<6} total={elapsed * 1000:>9.1f}ms  "
+            f"p50={cost[len(cost) // 2] * 1000:>9.2f}ms  p99={cost[int(len(cost) * 0.99) - 1] * 1000:>9.2f}ms  "
+            f"files={files:<6} callbacks={executor.xxl_client.callbacks}"
+        )
+
+
+async def main() -> None:
+    for triggers in TRIGGERS:
+        for func in (legacy_discard, journal_discard):
+            await run(func, triggers)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,532 @@
+# -*- coding: utf-8 -*-
+"""
+# ---------------------------------------------------------------------------------------------------------
+# ProjectName:  cronjob-1717
+# FileName:     job_harness_benchmark.py
+# Description:  任务压测台：本地 Redis + 假上游，测量抓取、比价、状态任务的吞吐和耗时
+# Author:       ASUS
+# CreateDate:   2026/10/18
+# Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
+# ---------------------------------------------------------------------------------------------------------
+"""
+import os
+import sys
+import socket
+import random
+import asyncio
+import logging
+import subprocess
+from aiohttp import web
+from html import escape
+from time import perf_counter, sleep
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Tuple
+
+"""
+运行方式（项目根目录下）：python -m benchmarks.job_harness_benchmark [订单数量，默认 200] [每个任务执行次数，默认 100]
+1. Redis：默认进程内 fakeredis（替换 jobs.redis_utils 三个客户端的连接池，不会连到线上）；
+   BENCHMARK_REDIS=server 时在本机空闲端口拉起 redis-server（BENCHMARK_REDIS_SERVER 指定可执行文件，默认 redis-server），
+   通过 REDIS_HOST / REDIS_PORT / REDIS_PASSWORD 让 jobs 连接它，结束后关闭；两种方式都从空库开始
+2. 上游：本机 aiohttp 假服务，劲旅（活动订单表分页 HTML、订单详情 HTML）、去哪儿 fuwu（/tts/agent/tool/statistics/bidding）、
+   钉钉机器人接口各占一个端口；劲旅地址作为任务参数传入，fuwu、机器人地址改写 jobs.config；
+   页面结构与 qlv_helper 的解析函数一致，任务走真实的 HTTP 客户端、解析、对账、缓存、队列代码
+3. 延迟与错误注入（环境变量，一个值作用于全部上游，或写成 qlv=50,fuwu=200,robot=10 分别指定，未写的上游为 0）：
+   BENCHMARK_LATENCY_MS 每个请求的延迟毫秒数（默认 20），BENCHMARK_LATENCY_JITTER 延迟的随机浮动比例（默认 0.5），
+   BENCHMARK_ERROR_RATE 返回 HTTP 500 的比例（默认 0）
+4. 先预热抓取一次（不计入结果），把全部订单写入详情缓存和两个队列；抓取任务不可用时（如缺少 qlv_helper 的依赖）
+   按解析结果的结构直接经 OrderReconciler 写入
+5. 任务（BENCHMARK_JOBS 选择，默认 fetch,compare,state）：
+   - fetch：抓取活动订单，顺序执行；每次执行前劲旅列表中 BENCHMARK_CHURN 比例（默认 0.1）的订单换成新订单
+   - compare、state：去哪儿比价、更新订单状态，按 BENCHMARK_CONCURRENCY（默认 4）并发执行
+   队列后端按 ORDER_QUEUE_BACKEND：schedule 后端检查过的订单要到期才会再被取出，多出的执行次数为空跑
+6. 每个任务输出：执行次数，成功 / 空跑 / 异常次数，处理订单数和每秒订单数，单次执行耗时 p50 / p99，各上游接口请求数；
+   处理订单数：fetch 为每次列表中的订单数之和，compare、state 为取到订单并请求上游（去哪儿 / 订单详情）的次数
+"""
+
+ORDERS = 200
+RUNS = 100
+PAGE_SIZE = 20
+SERVICES = ("qlv", "fuwu", "robot")
+CITIES = (("SYX", "三亚"), ("TYN", "太原"), ("CAN", "广州"), ("PEK", "北京"), ("SHA", "上海"), ("CTU", "成都"))
+NAMES = ("李晓璐", "王建国", "张敏", "陈思远", "刘洋", "赵丽")
+CABINS = ("Y", "B", "M", "H", "K", "L", "S", "V")
+TABLE_HEADERS = (
+    "来源", "订单号", "平台订单号", "成人PNR", "支付时间", "支付秒数", "出票时限", "剩余秒数", "起飞时间", "政策", "总人数", "总价",
+    "订单操作", "余座", "操作",
+)
+FLIGHT_HEADERS = ("票状态", "乘客信息", "票面价", "销售价", "机建费", "燃油费", "PNR", "行程", "票号", "行程单号")
+
+_datetime_format = "%Y-%m-%d %H:%M:%S"
+
+
+def _per_service(name: str, default: str) -> Dict[str, float]:
+    value = os.getenv(name, default).strip()
+    if "=" not in value:
+        return {service: float(value) for service in SERVICES}
+    result = {service: 0.0 for service in SERVICES}
+    for item in value.split(","):
+        service, _, number = item.partition("=")
+        if service.strip() not in result:
+            raise ValueError(f"{name} 中的上游 {service.strip()} 不存在，可选：{','.join(SERVICES)}")
+        result[service.strip()] = float(number)
+    return result
+
+
+class FakeUpstream:
+    """三个假上游共用的订单数据、延迟与错误注入和请求计数"""
+
+    def __init__(self, count: int, latency: Dict[str, float], jitter: float, error_rate: Dict[str, float]):
+        self.rnd = random.Random(1717)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.orders: Dict[int, Dict[str, Any]] = dict()
+        self.requests: Dict[str, int] = dict()
+        self.errors: Dict[str, int] = dict()
+        self.ports: Dict[str, int] = dict()
+        self._runners: List[web.AppRunner] = list()
+        self._next_id = 150000
+        for _ in range(count):
+            self._add_order()
+
+    # ---------------- 订单数据 ----------------
+    def _add_order(self) -> None:
+        rnd, now = self.rnd, datetime.now().replace(second=0, microsecond=0)
+        order_id, self._next_id = self._next_id, self._next_id + 1
+        (code_dep, city_dep), (code_arr, city_arr) = rnd.sample(CITIES, 2)
+        flight_no = "%s%04d" % (rnd.choice(("CZ", "MU", "CA", "SC", "HU")), rnd.randint(1000, 9999))
+        cabin = rnd.choice(CABINS)
+        dat_dep = now + timedelta(minutes=rnd.randint(6 * 60, 14 * 24 * 60))
+        # 出票时限在 1 小时 ~ 3 天之间，且早于起飞 2 小时
+        last_time_ticket = now + timedelta(
+            minutes=rnd.randint(60, min(72 * 60, int((dat_dep - now).total_seconds() / 60) - 120))
+        )
+        price_std = rnd.randint(400, 2000)
+        peoples = list()
+        for i in range(rnd.randint(1, 2)):
+            peoples.append({
+                "ticket_state": "未出票", "p_name": rnd.choice(NAMES), "p_type": "成人", "id_type": "身份证",
+                "id_no": "4201031983%04d%04d" % (order_id % 10000, i), "birth_day": "1983-10-01",
+                "gender": rnd.choice(("男", "女")), "new_nation": "CN|中国", "card_issue_place": "CN|中国",
+                "id_valid_dat": "1900-01-01", "price_std": price_std, "price_sell": round(price_std * 0.96, 1),
+                "tax_air": 50, "tax_fuel": 20, "pnr": "HX%04d" % (order_id % 10000), "code_dep": code_dep,
+                "code_arr": code_arr, "ticket_no": "", "pid": str(order_id * 10 + i), "tid": str(order_id * 10 + i),
+                "fid": str(order_id),
+            })
+        self.orders[order_id] = {
+            "source_name": "去哪儿", "id": order_id, "raw_order_no": "%d-%d" % (order_id * 7, order_id * 7),
+            "adult_pnr": peoples[0]["pnr"], "payment_time": now.strftime(_datetime_format), "sec_from_pay": 60,
+            "last_time_ticket": last_time_ticket.strftime(_datetime_format),
+            "remaining_time": int((last_time_ticket - now).total_seconds()),
+            "dat_dep": dat_dep.strftime(_datetime_format), "dat_arr": (dat_dep + timedelta(hours=2)).strftime(_datetime_format),
+            "code_dep": code_dep, "code_arr": code_arr, "city_dep": city_dep, "city_arr": city_arr,
+            "flight_no": flight_no, "cabin": cabin, "total_people": len(peoples), "total_adult": len(peoples),
+            "total_child": 0, "receipted": round(price_std * 0.96 * len(peoples) + 70, 1), "receipted_ota": round(
+                price_std * 0.96 * len(peoples) + 70, 1
+            ), "kickback": 0, "trip_type": "单程", "stat_order": "待处理", "stat_opration": "收款完成",
+            "flights": peoples, "peoples": peoples,
+        }
+
+    def churn(self, ratio: float) -> None:
+        """ratio 比例的订单下架，换成同样数量的新订单"""
+        count = int(len(self.orders) * ratio)
+        for order_id in self.rnd.sample(sorted(self.orders), count):
+            del self.orders[order_id]
+        for _ in range(count):
+            self._add_order()
+
+    # ---------------- 页面 ----------------
+    def table_html(self, page: int) -> str:
+        order_ids = sorted(self.orders)
+        pages = max(1, (len(order_ids) + PAGE_SIZE - 1) // PAGE_SIZE)
+        rows = list()
+        for order_id in order_ids[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]:
+            order = self.orders[order_id]
+            rows.append(
+                "<tr>"
+                f"<td>{order['source_name']}</td>"
+                f"<td><a href=\"/OrderProcessing/OrderNavigation/{order_id}\">{order_id}</a></td>"
+                f"<td>{order['raw_order_no']}</td><td>{order['adult_pnr']} | </td><td>{order['payment_time']}</td>"
+                f"<td class=\"secFrmPay\" tag=\"{order['sec_from_pay']}\"></td><td>{order['last_time_ticket']}</td>"
+                f"<td class=\"remainingtime\" remainingtime=\"{order['remaining_time']}\" state=\"{order['stat_opration']}\"></td>"
+                f"<td>{order['dat_dep'][:16]} {order['code_dep']}-{order['code_arr']} {order['flight_no']} {order['cabin']}</td>"
+                f"<td>活动政策</td><td>{order['total_people']}【{order['total_adult']}/{order['total_child']}】</td>"
+                f"<td>{order['receipted']}</td><td>{order['stat_opration']}</td><td>9</td><td>出票 锁定</td>"
+                "</tr>"
+            )
+        headers = "".join(f"<th>{x}</th>" for x in TABLE_HEADERS)
+        return (
+            "<html><head><title>国内活动订单</title></head><body>"
+            f"<table class=\"table table_hover table_border table_center\"><tr>{headers}</tr>{''.join(rows)}</table>"
+            f"<div class=\"redirect\"><label>{page}</label>/<label>{pages}</label>"
+            f"<span>第 {page} 页，每页 {PAGE_SIZE} 条，共 {len(order_ids)} 条</span></div>"
+            "</body></html>"
+        )
+
+    @staticmethod
+    def detail_html(order: Dict[str, Any]) -> str:
+        info = "".join(
+            f"<td>{label}：<b>{order[key]}</b></td>" for label, key in (
+                ("OTA实收", "receipted_ota"), ("佣金", "kickback"), ("平台订单号", "raw_order_no"), ("行程类型", "trip_type"),
+                ("订单号", "id"), ("订单操作", "stat_opration"), ("订单状态", "stat_order"),
+            )
+        )
+        rows = list()
+        for people in order["peoples"]:
+            birth = datetime.strptime(people["birth_day"], "%Y-%m-%d")
+            copy = "|".join((
+                people["p_name"], "", people["id_type"], people["id_no"], people["gender"], "",
+                f"{birth.year}/{birth.month}/{birth.day} 0:00:00", "", "1900/1/1 0:00:00",
+            ))
+            rows.append(
+                f"<tr pid=\"{people['pid']}\" tid=\"{people['tid']}\"><td>{people['ticket_state']}</td>"
+                f"<td><img onclick=\"copyFn('{escape(copy)}')\"/><span>【{people['p_type']}】</span>"
+                f"<span name=\"guobie\">{people['new_nation']}</span><span name=\"guobie\">{people['card_issue_place']}</span>"
+                f"<a id=\"IDNo_{people['pid']}\"></a></td>"
+                f"<td>{people['price_std']}</td><td>{people['price_sell']}</td><td>{people['tax_air']}</td>"
+                f"<td>{people['tax_fuel']}</td><td>{people['pnr']}</td>"
+                f"<td>{people['code_dep']}-{people['code_arr']}<input name=\"fid\" value=\"{people['fid']}\"/></td>"
+                "<td></td><td></td></tr>"
+            )
+        headers = "".join(f"<th>{x}</th>" for x in FLIGHT_HEADERS)
+        return (
+            "<html><head><title>订单出票查看</title></head><body>"
+            f"<table class=\"table no_border\"><tr>{info}</tr></table>"
+            f"<table class=\"info_flight\"><tr><td><span class=\"DatDep\">{order['dat_dep'][:16]}</span>"
+            f"<span class=\"CityDep\">{order['city_dep']}【{order['code_dep']}】</span>"
+            f"<p class=\"DatArr\">{order['dat_arr'][:16]}</p>"
+            f"<span class=\"CityArr\">{order['city_arr']}【{order['code_arr']}】</span></td></tr></table>"
+            "<table class=\"table table_border table_center\"></table><table class=\"table table_border table_center\"></table>"
+            f"<table class=\"table table_border table_center\"><tr>{headers}</tr>{''.join(rows)}</table>"
+            "</body></html>"
+        )
+
+    # ---------------- 接口 ----------------
+    async def order_table(self, request: web.Request) -> web.Response:
+        page = 1
+        if request.method == "POST":
+            page = int((await request.json()).get("JumpPageFromPage") or 1)
+        return web.Response(text=self.table_html(page), content_type="text/html")
+
+    async def order_detail(self, request: web.Request) -> web.Response:
+        order = self.orders.get(int(request.match_info["order_id"]))
+        if order is None:
+            html = "<html><head><title>操作提示</title></head><body><h3>订单不存在</h3></body></html>"
+        else:
+            html = self.detail_html(order)
+        return web.Response(text=html, content_type="text/html")
+
+    async def bidding(self, request: web.Request) -> web.Response:
+        # 在同航班订单的销售价上下 10% 内报价，比价任务有降价、涨价、持平几种结果
+        flight_no = request.query.get("flightNo")
+        prices = [x["peoples"][0]["price_sell"] for x in self.orders.values() if x["flight_no"] == flight_no]
+        base = prices[0] if prices else self.rnd.randint(400, 2000)
+        order_list = list()
+        for _ in range(self.rnd.randint(3, 6)):
+            sell_price = round(base * self.rnd.uniform(0.9, 1.1))
+            order_list.append({
+                "sellPrice": sell_price, "maxViewPrice": sell_price + self.rnd.randint(0, 30),
+                "sellFloorPrice": sell_price - 10, "cabin": self.rnd.choice(CABINS),
+            })
+        return web.json_response({"ret": True, "data": {"orderList": order_list}})
+
+    async def robot(self, request: web.Request) -> web.Response:
+        await request.read()
+        return web.json_response({"code": 200, "message": "success", "data": None})
+
+    def _middleware(self, service: str) -> Callable:
+        @web.middleware
+        async def inject(request: web.Request, handler: Callable) -> web.StreamResponse:
+            name = request.match_info.route.name or service
+            self.requests[name] = self.requests.get(name, 0) + 1
+            latency = self.latency.get(service, 0) / 1000
+            if latency > 0:
+                await asyncio.sleep(latency * self.rnd.uniform(1 - self.jitter, 1 + self.jitter))
+            if self.rnd.random() < self.error_rate.get(service, 0):
+                self.errors[name] = self.errors.get(name, 0) + 1
+                return web.Response(status=500, text="injected error")
+            return await handler(request)
+
+        return inject
+
+    async def start(self) -> None:
+        routes = {
+            "qlv": (
+                ("GET", "/OrderList/GuoNei_ActivityOrders", self.order_table, "qlv_table"),
+                ("POST", "/OrderList/GuoNei_ActivityOrders", self.order_table, "qlv_table_page"),
+                ("GET", "/OrderProcessing/NewTicket_show/{order_id}", self.order_detail, "qlv_detail"),
+            ),
+            "fuwu": (("GET", "/tts/agent/tool/statistics/bidding", self.bidding, "fuwu_bidding"),),
+            "robot": (("POST", "/api/v1/agent/message/dingding/robot/send", self.robot, "robot_send"),),
+        }
+        for service, items in routes.items():
+            app = web.Application(middlewares=[self._middleware(service)])
+            for method, path, handler, name in items:
+                app.router.add_route(method, path, handler, name=name)
+            runner = web.AppRunner(app, access_log=None)
+            await runner.setup()
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.bind(("127.0.0.1", 0))
+            await web.SockSite(runner, sock).start()
+            self.ports[service] = sock.getsockname()[1]
+            self._runners.append(runner)
+
+    async def close(self) -> None:
+        for runner in self._runners:
+            await runner.cleanup()
+
+    def domain(self, service: str) -> str:
+        return f"127.0.0.1:{self.ports[service]}"
+
+
+# ---------------- Redis ----------------
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def spawn_redis_server() -> subprocess.Popen:
+    """拉起本机 redis-server（不落盘），并通过环境变量让 jobs.redis_utils 连接它；需在导入 jobs 之前调用"""
+    port = _free_port()
+    process = subprocess.Popen(
+        [os.getenv("BENCHMARK_REDIS_SERVER", "redis-server"), "--port", str(port), "--bind", "127.0.0.1",
+         "--save", "", "--appendonly", "no"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    for _ in range(100):
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                break
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError(f"redis-server 启动失败，退出码：{process.returncode}")
+            sleep(0.05)
+    else:
+        process.kill()
+        raise RuntimeError("redis-server 启动超时")
+    os.environ.update(REDIS_HOST="127.0.0.1", REDIS_PORT=str(port), REDIS_PASSWORD="")
+    return process
+
+
+def use_fakeredis() -> None:
+    """jobs.redis_utils 的客户端已在导入时创建，替换连接池即可，订单缓存、队列、登录状态缓存都持有同一个客户端对象"""
+    import fakeredis
+    from jobs import redis_utils
+
+    server = fakeredis.FakeServer()
+    for client, db, decode in (
+            (redis_utils.redis_client_0, 0, True), (redis_utils.redis_client_1, 1, True),
+            (redis_utils.redis_binary_client_0, 0, False),
+    ):
+        fake = fakeredis.FakeAsyncRedis(server=server, db=db, decode_responses=decode)
+        client.redis.connection_pool = fake.connection_pool
+
+
+# ---------------- 任务 ----------------
+@dataclass(slots=True)
+class JobStats:
+    name: str
+    runs: int = 0
+    ok: int = 0
+    empty: int = 0
+    failed: int = 0
+    orders: int = 0
+    seconds: float = 0.0
+    costs: List[float] = field(default_factory=list)
+    requests: Dict[str, int] = field(default_factory=dict)
+    last_error: Optional[str] = None
+
+    def line(self) -> str:
+        costs = sorted(self.costs) or [0.0]
+        p50, p99 = costs[len(costs) // 2], costs[max(int(len(costs) * 0.99) - 1, 0)]
+        requests = " ".join(f"{name}={count}" for name, count in sorted(self.requests.items()) if count)
+        return (
+            f"  {self.name:<8} {self.runs:>6} {self.ok:>6} {self.empty:>6} {self.failed:>6} {self.orders:>8} "
+            f"{self.orders / self.seconds if self.seconds else 0:>10.1f} {p50 * 1000:>9.1f} {p99 * 1000:>9.1f}  {requests}"
+        )
+
+
+def _load_executors() -> Tuple[Dict[str, Callable[..., Awaitable[Any]]], Dict[str, str]]:
+    """逐个导入任务模块，缺少依赖的任务跳过并记录原因"""
+    modules = {
+        "fetch": ("jobs.fetch_flight_activity_order", "executor_fetch_flight_activity_order_task"),
+        "compare": ("jobs.fuwu_qunar_flight_price_comparison", "executor_fuwu_qunar_flight_price_comparison_task"),
+        "state": ("jobs.update_qlv_order_state", "executor_update_order_state_task"),
+    }
+    executors, skipped = dict(), dict()
+    for name, (module, func) in modules.items():
+        try:
+            executors[name] = getattr(__import__(module, fromlist=[func]), func)
+        except Exception as e:
+            skipped[name] = f"{type(e).__name__}: {e}"
+    return executors, skipped
+
+
+async def seed_orders(upstream: FakeUpstream) -> int:
+    """抓取任务不可用时，按 get_order_info_with_http 解析结果的结构把订单直接写入详情缓存和两个队列"""
+    from jobs.order_key import OrderKey
+    from jobs.order_reconcile import OrderReconciler
+    from jobs.redis_utils import activity_order_queue, order_state_queue, order_cache
+
+    reconciler = OrderReconciler(activity_queue=activity_order_queue, state_queue=order_state_queue, order_cache=order_cache)
+    keys = {OrderKey.from_order(order).key: order for order in upstream.orders.values()}
+    await reconciler.sync(keys.keys())
+    for key, order in keys.items():
+        reconciler.cache(key=key, value=order, ex=order["remaining_time"])
+    return (await reconciler.apply()).cached
+
+
+async def run_job(
+        name: str, call: Callable[[], Awaitable[Any]], runs: int, concurrency: int, upstream: FakeUpstream,
+        orders_per_run: Optional[Callable[[], int]] = None, order_route: Optional[str] = None,
+        before_run: Optional[Callable[[], None]] = None
+) -> JobStats:
+    stats = JobStats(name=name)
+    requests_before = dict(upstream.requests)
+    remaining = runs
+
+    async def worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            if before_run is not None:
+                before_run()
+            listed = orders_per_run() if orders_per_run is not None else 0
+            start = perf_counter()
+            try:
+                result = await call()
+            except Exception as e:
+                stats.failed += 1
+                stats.last_error = f"{type(e).__name__}: {e}"[:200]
+            else:
+                if result:
+                    stats.ok += 1
+                else:
+                    stats.empty += 1
+                stats.orders += listed
+            stats.costs.append(perf_counter() - start)
+            stats.runs += 1
+
+    started = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    stats.seconds = perf_counter() - started
+    stats.requests = {
+        route: count - requests_before.get(route, 0) for route, count in upstream.requests.items()
+    }
+    if order_route is not None:
+        stats.orders = stats.requests.get(order_route, 0)
+    return stats
+
+
+async def run(count: int, runs: int, redis_mode: str) -> None:
+    import jobs.config as config
+    from jobs.order_queue import ORDER_QUEUE_BACKEND
+    from jobs.login_state import qlv_login_state_cache
+    from jobs.redis_utils import redis_client_0, redis_client_1, redis_binary_client_0, order_lease_reaper, \
+        gen_qlv_login_state_key
+
+    upstream = FakeUpstream(
+        count=count, latency=_per_service("BENCHMARK_LATENCY_MS", "20"),
+        jitter=float(os.getenv("BENCHMARK_LATENCY_JITTER", "0.5")), error_rate=_per_service("BENCHMARK_ERROR_RATE", "0")
+    )
+    concurrency = int(os.getenv("BENCHMARK_CONCURRENCY", "4"))
+    churn = float(os.getenv("BENCHMARK_CHURN", "0.1"))
+    selected = [x.strip() for x in os.getenv("BENCHMARK_JOBS", "fetch,compare,state").split(",") if x.strip()]
+    executors, skipped = _load_executors()
+    await upstream.start()
+    config.fuwu_protocol, config.fuwu_domain = "http", upstream.domain("fuwu")
+    config.robot_protocol, config.robot_domain = "http", upstream.domain("robot")
+    qlv = dict(qlv_domain=upstream.domain("qlv"), qlv_protocol="http")
+    logger = logging.getLogger("benchmarks.job_harness")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    try:
+        # 登录状态：cookie 内容不影响假上游，只要 Redis 中有这个 key
+        await redis_client_0.set(
+            gen_qlv_login_state_key(user_id=config.qlv_user_id),
+            {"cookies": [{"name": "ASP.NET_SessionId", "value": "benchmark", "domain": "127.0.0.1", "path": "/"}],
+             "origins": list()}, ex=3600
+        )
+        print(
+            f"订单 {count} 个，每个任务执行 {runs} 次，Redis：{redis_mode}，队列后端：{ORDER_QUEUE_BACKEND}，"
+            f"并发：{concurrency}，上游延迟 ms：{upstream.latency}，抖动：{upstream.jitter:g}，错误率：{upstream.error_rate}"
+        )
+        for name, reason in skipped.items():
+            print(f"  {name} 任务导入失败，跳过：{reason}")
+
+        async def fetch() -> Any:
+            return await executors["fetch"](logger=logger, qlv_user_id=config.qlv_user_id, timeout=config.timeout, **qlv)
+
+        async def compare() -> Any:
+            return await executors["compare"](
+                logger=logger, uuid=config.uuid, headers=config.headers, timeout=int(config.timeout),
+                low_threshold=config.low_threshold, high_threshold=config.high_threshold, enable_log=False, **qlv
+            )
+
+        async def state() -> Any:
+            return await executors["state"](
+                logger=logger, qlv_user_id=config.qlv_user_id, discard_state=config.discard_state, enable_log=False,
+                timeout=config.timeout, retry=0, **qlv
+            )
+
+        start = perf_counter()
+        if "fetch" in executors:
+            warmup = await run_job("warmup", fetch, 1, 1, upstream)
+            if warmup.failed:
+                raise RuntimeError(f"预热抓取失败：{warmup.last_error}")
+            print(f"预热抓取：列表 {count} 个订单，详情请求 {warmup.requests.get('qlv_detail', 0)} 次，"
+                  f"耗时 {(perf_counter() - start) * 1000:.1f}ms")
+        else:
+            print(f"预热：直接写入 {await seed_orders(upstream)} 个订单，耗时 {(perf_counter() - start) * 1000:.1f}ms")
+
+        jobs = {
+            "fetch": lambda: run_job(
+                "fetch", fetch, runs, 1, upstream, orders_per_run=lambda: len(upstream.orders),
+                before_run=lambda: upstream.churn(churn)
+            ),
+            "compare": lambda: run_job("compare", compare, runs, concurrency, upstream, order_route="fuwu_bidding"),
+            "state": lambda: run_job("state", state, runs, concurrency, upstream, order_route="qlv_detail"),
+        }
+        results = list()
+        for name in selected:
+            if name not in jobs:
+                raise ValueError(f"BENCHMARK_JOBS 中的任务 {name} 不存在，可选：{','.join(jobs)}")
+            if name in executors:
+                results.append(await jobs[name]())
+        print(f"  {'任务':<6} {'执行':>4} {'成功':>4} {'空跑':>4} {'异常':>4} {'订单数':>5} {'订单/秒':>7} "
+              f"{'p50(ms)':>9} {'p99(ms)':>9}  上游请求")
+        for stats in results:
+            print(stats.line())
+        for stats in results:
+            if stats.last_error:
+                print(f"  {stats.name} 最后一次异常：{stats.last_error}")
+    finally:
+        order_lease_reaper.close()
+        qlv_login_state_cache.close()
+        await upstream.close()
+        for client in (redis_client_0, redis_client_1, redis_binary_client_0):
+            await client.redis.aclose()
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else ORDERS
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else RUNS
+    logging.basicConfig(level=logging.ERROR)
+    # 注入错误时 qlv_helper 分页抓取不关闭 HTTP 会话，asyncio 会逐个报 Unclosed connector，压测时不输出
+    logging.getLogger("asyncio").setLevel(logging.CRITICAL)
+    redis_mode = os.getenv("BENCHMARK_REDIS", "fakeredis").strip().lower()
+    process = spawn_redis_server() if redis_mode == "server" else None
+    try:
+        if process is None:
+            use_fakeredis()
+        asyncio.run(run(count, runs, redis_mode))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+# ---------------------------------------------------------------------------------------------------------
+# ProjectName:  cronjob-1717
+# FileName:     job_startup_benchmark.py
+# Description:  执行器启动基准：全量导入 jobs vs 懒加载占位注册
+# Author:       ASUS
+# CreateDate:   2026/10/18
+# Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
+# ---------------------------------------------------------------------------------------------------------
+"""
+import os
+import sys
+import json
+import subprocess
+from typing import Dict, Any
+
+"""
+运行方式（项目根目录下）：python -m benchmarks.job_startup_benchmark
+每项测量都在全新的 Python 子进程中进行（冷启动，模块缓存为空）：
+1. 每个 jobs 模块单独导入的耗时（包含它拉起的 Playwright、qlv_helper、Redis 客户端等依赖）
+2. 全量导入并调用 register(executor) 完成注册的耗时（原 auto_load_jobs 的做法）
+3. 静态解析 register() 得到 handler 名称并注册占位 handler 的耗时（JOB_LAZY_IMPORT=true）
+"""
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_ONE = """
+import json, importlib
+from time import perf_counter
+start = perf_counter()
+try:
+    importlib.import_module("jobs.%s")
+    error = None
+except Exception as e:
+    error = "%%s: %%s" %% (type(e).__name__, e)
+print(json.dumps({"cost": (perf_counter() - start) * 1000, "error": error}))
+"""
+
+EAGER = """
+import json, importlib
+from time import perf_counter
+from pyxxl.executor import JobHandler
+from job_module_graph import JobModuleGraph
+# 两种方式都要先导入 pyxxl，从这之后开始计时
+start = perf_counter()
+handler = JobHandler()
+graph = JobModuleGraph("jobs")
+graph.scan()
+errors = dict()
+for name in graph.topo_order(graph.list_modules()):
+    try:
+        module = importlib.import_module("jobs." + name)
+        if hasattr(module, "register"):
+            module.register(handler)
+    except Exception as e:
+        errors[name] = "%s: %s" % (type(e).__name__, e)
+print(json.dumps({"cost": (perf_counter() - start) * 1000, "handlers": len(handler._handlers), "errors": errors}))
+"""
+
+LAZY = """
+import json
+from time import perf_counter
+from pyxxl.executor import JobHandler
+from job_module_graph import JobModuleGraph
+# 两种方式都要先导入 pyxxl，从这之后开始计时
+start = perf_counter()
+handler = JobHandler()
+graph = JobModuleGraph("jobs")
+graph.scan()
+for name in graph.topo_order(graph.list_modules()):
+    for handler_name in graph.handlers.get(name, []):
+        async def placeholder():
+            pass
+        handler.register(name=handler_name, replace=True)(placeholder)
+print(json.dumps({"cost": (perf_counter() - start) * 1000, "handlers": len(handler._handlers), "errors": {}}))
+"""
+
+
+def run_python(code: str) -> Dict[str, Any]:
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=300
+    )
+    lines = [x for x in output.stdout.splitlines() if x.startswith("{")]
+    if not lines:
+        return {"cost": float("nan"), "error": output.stderr.strip().splitlines()[-1:], "errors": {}}
+    return json.loads(lines[-1])
+
+
+def main() -> None:
+    sys.path.insert(0, PROJECT_ROOT)
+    from job_module_graph import JobModuleGraph
+
+    graph = JobModuleGraph(os.path.join(PROJECT_ROOT, "jobs"))
+    graph.scan()
+    print("各模块冷启动导入耗时：")
+    for name in graph.topo_order(graph.list_modules()):
+        result = run_python(IMPORT_ONE % name)
+        status = f"  ({result['error']})" if result.get("error") else ""
+        print(f"  jobs.{name:<40} {result['cost']:>9.1f}ms  handlers={graph.handlers.get(name)}{status}")
+
+    print("注册完成耗时（time-to-registration）：")
+    for label, code in (("eager", EAGER), ("lazy", LAZY)):
+        result = run_python(code)
+        print(f"  {label:<6} {result['cost']:>9.1f}ms  handlers={result.get('handlers')}")
+        for name, error in result.get("errors", {}).items():
+            print(f"         jobs.{name} 导入失败：{error}")
+
+
+if __name__ == "__main__":
+    main()
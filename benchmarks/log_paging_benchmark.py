@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+# ---------------------------------------------------------------------------------------------------------
+# ProjectName:  cronjob-1717
+# FileName:     log_paging_benchmark.py
+# Description:  任务日志分页读取基准：逐行读取 vs 行偏移索引
+# Author:       ASUS
+# CreateDate:   2026/10/18
+# Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
+# ---------------------------------------------------------------------------------------------------------
+"""
+import os
+import tempfile
+from time import perf_counter
+from typing import Tuple, List
+from log_utils import LineOffsetIndexCache
+
+"""
+运行方式（项目根目录下）：python -m benchmarks.log_paging_benchmark
+分别在 1k / 10k / 100k 行的日志上，从文件头、中间、末尾翻页，比较单次 /log 请求的耗时
+"""
+
+LOG_TAIL_LINES = 1000
+LINE = "2026-10-18 12:00:00.000 - [PID-1] - [MainThread-1] - [INFO] - [TASK] - [jobId=1] - [logId=1] - %06d\n"
+
+
+def read_lines_baseline(path: str, from_line: int, count: int) -> Tuple[str, int, bool]:
+    """原 hacked_get_logs 的读取方式：每次都从第 1 行开始逐行读取"""
+    logs, to_line = "", from_line - 1
+    with open(path, mode="r", encoding="utf-8") as f:
+        for i in range(1, from_line + count):
+            line = f.readline()
+            if line == "":
+                return logs, to_line, True
+            if i >= from_line:
+                to_line = i
+                logs += line
+    return logs, to_line, False
+
+
+def write_log(path: str, lines: int) -> None:
+    with open(path, mode="w", encoding="utf-8") as f:
+        f.writelines(LINE % i for i in range(1, lines + 1))
+
+
+def timeit(func, *args, repeat: int = 20) -> float:
+    cost: List[float] = list()
+    for _ in range(repeat):
+        start = perf_counter()
+        func(*args)
+        cost.append(perf_counter() - start)
+    cost.sort()
+    return cost[len(cost) // 2] * 1000
+
+
+def main() -> None:
+    print(f"{'lines':>8} {'fromLineNum':>12} {'baseline(ms)':>14} {'indexed(ms)':>12} {'append+poll(ms)':>16}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for total in (1_000, 10_000, 100_000):
+            path = os.path.join(tmp_dir, f"pyxxl-{total}.log")
+            write_log(path, total)
+            cache = LineOffsetIndexCache()
+            build_start = perf_counter()
+            cache.read_lines(path, 1, 1)
+            build_cost = (perf_counter() - build_start) * 1000
+            for from_line in (1, total // 2, max(total - LOG_TAIL_LINES + 1, 1)):
+                baseline = timeit(read_lines_baseline, path, from_line, LOG_TAIL_LINES)
+                indexed = timeit(cache.read_lines, path, from_line, LOG_TAIL_LINES)
+                assert cache.read_lines(path, from_line, LOG_TAIL_LINES) == read_lines_baseline(
+                    path, from_line, LOG_TAIL_LINES
+                )
+
+                # 模拟日志持续增长：每次轮询前追加 10 行，索引只需增量扫描新字节
+                def append_and_poll():
+                    with open(path, mode="a", encoding="utf-8") as f:
+                        f.writelines(LINE % 0 for _ in range(10))
+                    cache.read_lines(path, from_line, LOG_TAIL_LINES)
+
+                incremental = timeit(append_and_poll)
+                print(f"{total:>8} {from_line:>12} {baseline:>14.3f} {indexed:>12.3f} {incremental:>16.3f}")
+            print(f"{total:>8} {'(首次建索引)':>10} {build_cost:>14.3f}")
+
+
+if __name__ == '__main__':
+    main()
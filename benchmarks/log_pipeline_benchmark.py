@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+# ---------------------------------------------------------------------------------------------------------
+# ProjectName:  cronjob-1717
+# FileName:     log_pipeline_benchmark.py
+# Description:  日志队列基准：handler 直接写 vs 经队列交给写线程批量写
+# Author:       ASUS
+# CreateDate:   2026/10/18
+# Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
+# ---------------------------------------------------------------------------------------------------------
+"""
+import os
+import sys
+import asyncio
+import itertools
+import tempfile
+from time import perf_counter
+from typing import Dict, List
+import log_utils
+from pyxxl.ctx import g
+from pyxxl.schema import RunData
+from pyxxl.logger.disk import DiskLog
+
+"""
+运行方式（项目根目录下）：python -m benchmarks.log_pipeline_benchmark
+1. 模拟日志密集的任务：JOBS 个任务并发运行，每个任务发起 REQUESTS 次上游请求（asyncio.sleep 模拟），
+   每次请求前后写 LINES_PER_REQUEST 行任务日志（Loguru 控制台 + 任务日志文件）
+2. 分别在 LOG_QUEUE_ENABLED=false（handler 在调用方线程直接写）和 true（入队后由写线程批量写）下运行，统计：
+   任务全部完成的耗时（吞吐）、日志调用占用事件循环的总时长和单条耗时、任务结束到日志全部落盘的额外等待
+3. 另外测一次连续写 BURST 行（不超过一批，写线程不被唤醒）时每条日志在调用方的耗时，即事件循环线程本身要付出的开销
+4. 控制台输出重定向到 /dev/null，只比较格式化与写入本身的开销
+"""
+
+JOBS = 20
+REQUESTS = 40
+LINES_PER_REQUEST = 5
+UPSTREAM_LATENCY = 0.02
+BURST = 400
+
+# 每轮测量使用新的 logId，不复用上一轮同名的任务 logger
+_log_ids = itertools.count(1)
+
+
+def run_data(log_id: int) -> RunData:
+    return RunData(
+        jobId=log_id, logId=log_id, executorHandler="fetch_flight_activity_order", executorParams="",
+        executorBlockStrategy="SERIAL_EXECUTION", executorTimeout=0, glueType="BEAN", logDateTime=0,
+        broadcastIndex=0, broadcastTotal=1,
+    )
+
+
+async def log_heavy_job(factory: DiskLog, log_id: int, cost: List[float]) -> None:
+    g.set_xxl_run_data(run_data(log_id))
+    logger = factory.get_logger(log_id)
+    try:
+        for i in range(REQUESTS):
+            start = perf_counter()
+            for j in range(LINES_PER_REQUEST):
+                logger.info("订单<%s>第 %s 次比价，航班 CZ%04d，价格 %s", log_id, i, j, 1000 + i)
+            cost.append(perf_counter() - start)
+            # 模拟一次上游请求
+            await asyncio.sleep(UPSTREAM_LATENCY)
+    finally:
+        factory.after_running(logger)
+
+
+async def run_jobs(factory: DiskLog, cost: List[float]) -> None:
+    await asyncio.gather(*(log_heavy_job(factory, next(_log_ids), cost) for _ in range(JOBS)))
+
+
+def measure(queued: bool) -> Dict[str, float]:
+    log_utils.LOG_QUEUE_ENABLED = queued
+    cost = list()
+    with tempfile.TemporaryDirectory() as log_dir:
+        factory = DiskLog(log_dir)
+        start = perf_counter()
+        asyncio.run(run_jobs(factory, cost))
+        jobs_cost = perf_counter() - start
+        log_utils.task_log_writer.flush()
+        total_cost = perf_counter() - start
+        lines = sum(1 for name in os.listdir(log_dir) for _ in open(os.path.join(log_dir, name), encoding="utf-8"))
+    return {"jobs": jobs_cost, "logging": sum(cost), "drain": total_cost - jobs_cost, "lines": lines}
+
+
+def measure_burst(queued: bool) -> float:
+    log_utils.LOG_QUEUE_ENABLED = queued
+    with tempfile.TemporaryDirectory() as log_dir:
+        factory = DiskLog(log_dir)
+        log_id = next(_log_ids)
+        g.set_xxl_run_data(run_data(log_id))
+        logger = factory.get_logger(log_id)
+        # 刚刷完盘，写线程开始新一轮等待
+        log_utils.task_log_writer.flush()
+        start = perf_counter()
+        for i in range(BURST):
+            logger.info("订单<%s>第 %s 次比价，航班 CZ%04d，价格 %s", log_id, i, i, 1000 + i)
+        cost = (perf_counter() - start) / BURST
+        factory.after_running(logger)
+        log_utils.task_log_writer.flush()
+    return cost
+
+
+def main() -> None:
+    stdout = sys.stdout
+    results = dict()
+    with open(os.devnull, "w") as devnull:
+        sys.stdout = devnull
+        try:
+            measure(True)  # 预热：启动写线程、初始化 Loguru
+            for label, queued in (("direct", False), ("queued", True)):
+                results[label] = measure(queued)
+                results[label]["burst"] = measure_burst(queued)
+        finally:
+            sys.stdout = stdout
+    records = JOBS * REQUESTS * LINES_PER_REQUEST
+    ideal = REQUESTS * UPSTREAM_LATENCY
+    print(f"{JOBS} 个任务 × {REQUESTS} 次上游请求 × {LINES_PER_REQUEST} 行日志，共 {records} 条，"
+          f"不写日志时任务耗时约 {ideal * 1000:.0f}ms：")
+    for label, result in results.items():
+        print(
+            f"  {label:<7} 任务耗时 {result['jobs'] * 1000:>7.1f}ms  吞吐 {records / result['jobs']:>7.0f} 条/秒  "
+            f"日志占用事件循环 {result['logging'] * 1000:>7.1f}ms（单条 {result['logging'] / records * 1e6:>5.1f}us）  "
+            f"落盘等待 {result['drain'] * 1000:>5.1f}ms  落盘行数 {result['lines']}"
+        )
+    ratio = results["queued"]["logging"] / results["direct"]["logging"]
+    print(f"  日志占用事件循环的时间降为原来的 {ratio * 100:.1f}%（CPU 核数 {os.cpu_count()}）")
+    print(f"连续写 {BURST} 行时每条日志在调用方的耗时：")
+    for label, result in results.items():
+        print(f"  {label:<7} {result['burst'] * 1e6:>6.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+# ---------------------------------------------------------------------------------------------------------
+# ProjectName:  cronjob-1717
+# FileName:     metrics_overhead_benchmark.py
+# Description:  /metrics 埋点开销基准：每次调度的记录耗时 vs 一次调度本身的耗时
+# Author:       ASUS
+# CreateDate:   2026/10/18
+# Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
+# ---------------------------------------------------------------------------------------------------------
+"""
+import os
+import asyncio
+import tempfile
+from time import perf_counter
+from collections import OrderedDict
+from pyxxl import ExecutorConfig
+from pyxxl.schema import RunData
+from pyxxl.logger.disk import DiskLog
+from pyxxl.executor import Executor, JobHandler
+from metrics import MetricsRegistry, LATENCY_BUCKETS
+
+"""
+运行方式（项目根目录下）：python -m benchmarks.metrics_overhead_benchmark
+1. 用未打补丁的 pyxxl Executor 跑 DISPATCHES 次空 handler（创建 task、写任务日志、回调），得到一次调度的耗时
+2. 单独重复执行一次调度在 app.py 中新增的全部记录操作（受理计数、受理时间、排队时长、执行计数、执行耗时），
+   得到每次调度的埋点耗时，两者之比即为埋点开销
+3. 上游 HTTP 埋点按请求次数发生，单独给出每次请求的记录耗时
+"""
+
+DISPATCHES = 2000
+HANDLERS = ("fetch_flight_activity_order", "fuwu_qunar_flight_price_comparison", "pop_active_order")
+
+
+class FakeXXL:
+
+    async def callback(self, log_id: int, timestamp: int, code: int = 200, msg: str = "") -> None:
+        pass
+
+
+def run_data(log_id: int) -> RunData:
+    return RunData(
+        jobId=log_id, logId=log_id, executorHandler=HANDLERS[log_id % len(HANDLERS)], executorParams="",
+        executorBlockStrategy="SERIAL_EXECUTION", executorTimeout=0, glueType="BEAN", logDateTime=0,
+        broadcastIndex=0, broadcastTotal=1,
+    )
+
+
+async def dispatch_cost(log_dir: str) -> float:
+    config = ExecutorConfig(
+        xxl_admin_baseurl="http://127.0.0.1:1/api/", executor_app_name="benchmark", log_local_dir=log_dir,
+        executor_log_path=os.path.join(log_dir, "pyxxl.log"), dotenv_try=False,
+    )
+    handler = JobHandler()
+    for name in HANDLERS:
+        async def noop():
+            pass
+
+        handler.register(name=name)(noop)
+    executor = Executor(FakeXXL(), config=config, handler=handler, logger_factory=DiskLog(log_dir))
+    start = perf_counter()
+    for i in range(DISPATCHES):
+        await executor.run_job(run_data(i))
+    while executor.tasks:
+        await asyncio.sleep(0.001)
+    return (perf_counter() - start) / DISPATCHES
+
+
+def instrumentation_cost() -> float:
+    registry = MetricsRegistry()
+    dispatch_total = registry.counter("dispatch_total", "", ("handler", "result"))
+    run_total = registry.counter("run_total", "", ("handler", "status"))
+    run_seconds = registry.histogram("run_seconds", "", ("handler",))
+    queue_wait = registry.histogram("queue_wait_seconds", "", ("handler",))
+    dispatched_at = OrderedDict()
+    rounds = DISPATCHES * 50
+    start = perf_counter()
+    for i in range(rounds):
+        handler = HANDLERS[i % len(HANDLERS)]
+        # hacked_run_job
+        dispatched_at[i] = perf_counter()
+        if len(dispatched_at) > 10000:
+            dispatched_at.popitem(last=False)
+        dispatch_total.inc(handler, "running")
+        # hacked_handler_start
+        at = dispatched_at.pop(i, None)
+        begin = perf_counter()
+        queue_wait.observe(handler, value=begin - at)
+        run_total.inc(handler, "success")
+        run_seconds.observe(handler, value=perf_counter() - begin)
+    return (perf_counter() - start) / rounds
+
+
+def upstream_cost() -> float:
+    registry = MetricsRegistry()
+    upstream = registry.histogram("upstream_seconds", "", ("domain", "method", "status"), LATENCY_BUCKETS)
+    rounds = DISPATCHES * 50
+    start = perf_counter()
+    for _ in range(rounds):
+        begin = perf_counter()
+        upstream.observe("flights.qunar.com", "get", "ok", value=perf_counter() - begin)
+    return (perf_counter() - start) / rounds
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as log_dir:
+        dispatch = asyncio.run(dispatch_cost(log_dir))
+    instrumentation = instrumentation_cost()
+    print(f"一次调度耗时:   {dispatch * 1e6:>9.1f}us")
+    print(f"一次调度埋点:   {instrumentation * 1e6:>9.2f}us")
+    print(f"埋点开销占比:   {instrumentation / dispatch * 100:>9.3f}%")
+    print(f"一次上游请求埋点: {upstream_cost() * 1e6:>7.2f}us（上游请求本身在毫秒级）")
+
+
+if __name__ == "__main__":
+    main()
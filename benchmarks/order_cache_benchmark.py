@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+# ---------------------------------------------------------------------------------------------------------
+# ProjectName:  cronjob-1717
+# FileName:     order_cache_benchmark.py
+# Description:  订单详情缓存基准：原 JSON 字符串 vs hash 布局 + 各编解码器
+# Author:       ASUS
+# CreateDate:   2026/10/18
+# Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
+# ---------------------------------------------------------------------------------------------------------
+"""
+import os
+import sys
+import json
+import random
+import asyncio
+from time import perf_counter
+from typing import Dict, Any, List, Callable, Optional
+from jobs.order_cache import OrderCache, PROJECTION_FIELDS, FULL_FIELDS, _codecs_by_name
+
+"""
+运行方式（项目根目录下）：python -m benchmarks.order_cache_benchmark [订单数量，默认 2000]
+1. 随机生成订单详情（订单表字段 + 订单详情接口返回的 flights / peoples，乘客 1~3 人），结构与线上缓存一致
+2. 存储大小：原 JSON 字符串（AsyncRedisHelper.set 的写法）与 hash 布局下每种编解码器的值字节数（字段名 + 字段值），
+   按条平均；Redis 内部还有 key、过期时间、编码结构的开销，两种布局相差不大，这里不计入
+3. 解码耗时：原写法 GET 后 json.loads 整个详情；hash 布局分别统计只解码热字段（比价、状态任务）和解码完整订单，
+   只统计本地解码，不含网络往返
+4. 设置环境变量 BENCHMARK_REDIS_URL（如 redis://:password@127.0.0.1:6379/15）时，额外把订单写入该 Redis，
+   用 MEMORY USAGE 统计实际占用内存，结束后删除写入的 key；请使用空闲的库
+"""
+
+ORDERS = 2000
+CITIES = (("SYX", "三亚"), ("TYN", "太原"), ("CAN", "广州"), ("PEK", "北京"), ("SHA", "上海"), ("CTU", "成都"))
+NAMES = ("李晓璐", "王建国", "张敏", "陈思远", "刘洋", "赵丽")
+CABINS = ("Y", "B", "M", "H", "K", "L", "S", "V")
+
+
+def make_order(rnd: random.Random, order_id: int) -> Dict[str, Any]:
+    (code_dep, city_dep), (code_arr, city_arr) = rnd.sample(CITIES, 2)
+    flight_no = "%s%04d" % (rnd.choice(("CZ", "MU", "CA", "SC", "HU")), rnd.randint(1000, 9999))
+    cabin = rnd.choice(CABINS)
+    day, hour = rnd.randint(1, 28), rnd.randint(6, 22)
+    price_std = rnd.randint(400, 2000)
+    flight = {
+        "flight_no": flight_no, "cabin": cabin, "dat_dep": "2025-12-%02dT%02d:30:00.000Z" % (day, hour - 6),
+        "dat_arr": "2025-12-%02dT%02d:45:00.000Z" % (day, hour - 4), "code_dep": code_dep, "code_arr": code_arr,
+        "city_dep": city_dep, "city_arr": city_arr, "air_co": flight_no[:2], "plane_type": "320", "stop": 0,
+    }
+    peoples = list()
+    for _ in range(rnd.randint(1, 3)):
+        peoples.append({
+            "ticket_state": "未出票", "p_name": rnd.choice(NAMES), "p_type": "成人", "id_type": "身份证",
+            "id_no": "%018d" % rnd.randint(10 ** 16, 10 ** 17), "birth_day": "1983-10-01", "age": rnd.randint(18, 70),
+            "gender": rnd.choice(("男", "女")), "new_nation": "CN|中国", "card_issue_place": "CN|中国",
+            "id_valid_dat": "1900-01-01", "price_std": price_std, "price_sell": round(price_std * 0.96, 1),
+            "tax_air": 50, "tax_fuel": 20, "pnr": "XE小(000000) 大(000000)【 RT 】【 PAT 】【 RTC 】",
+            "code_dep": code_dep, "code_arr": code_arr, "ticket_no": "",
+        })
+    return {
+        "id": order_id, "raw_order_no": "%d-%d" % (order_id * 7, order_id * 7), "trip_type": "单程",
+        "code_dep": code_dep, "code_arr": code_arr, "flight_no": flight_no, "cabin": cabin,
+        "dat_dep": "2025-12-%02d %02d:30:00" % (day, hour), "source_name": "去哪儿",
+        "last_time_ticket": "2025-12-%02d %02d:00:00" % (day, hour - 2), "stat_order": "待处理",
+        "stat_opration": "收款完成", "receipted_ota": round(price_std * 0.96 + 70, 1), "kickback": 0,
+        "flights": [flight], "peoples": peoples,
+    }
+
+
+def make_orders(count: int) -> List[Dict[str, Any]]:
+    rnd = random.Random(1717)
+    return [make_order(rnd, 150000 + i) for i in range(count)]
+
+
+def hash_size(mapping: Dict[str, bytes]) -> int:
+    return sum(len(name) + len(value) for name, value in mapping.items())
+
+
+def timed(func: Callable, items: List[Any]) -> float:
+    start = perf_counter()
+    for item in items:
+        func(item)
+    return perf_counter() - start
+
+
+async def memory_usage(url: str, orders: List[Dict[str, Any]], caches: Dict[str, OrderCache]) -> Dict[str, float]:
+    from redis.asyncio import Redis
+    redis = Redis.from_url(url, decode_responses=False)
+    result = dict()
+    try:
+        for label, cache in caches.items():
+            keys = [f"benchmark:order_cache:{label}:{order['id']}" for order in orders]
+            pipe = redis.pipeline(transaction=False)
+            for key, order in zip(keys, orders):
+                if cache is None:
+                    pipe.set(key, json.dumps(order, ensure_ascii=False))
+                else:
+                    cache.stage_set(pipe, key, order)
+            await pipe.execute()
+            pipe = redis.pipeline(transaction=False)
+            for key in keys:
+                pipe.memory_usage(key)
+            result[label] = sum(await pipe.execute()) / len(keys)
+            await redis.delete(*keys)
+    finally:
+        await redis.aclose()
+    return result
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else ORDERS
+    orders = make_orders(count)
+    legacy = [json.dumps(order, ensure_ascii=False).encode("utf-8") for order in orders]
+    caches: Dict[str, Optional[OrderCache]] = {"原 JSON": None}
+    for name in _codecs_by_name:
+        caches[f"hash {name}"] = OrderCache(redis=None, layout="hash", codec=name)
+
+    print(f"{count} 条订单详情（可用编解码器：{list(_codecs_by_name)}）：")
+    print(f"  {'':<20} {'字节/条':>8} {'热字段解码':>10} {'完整解码':>10}")
+    legacy_loads = timed(json.loads, legacy)
+    print(
+        f"  {'原 JSON':<20} {sum(map(len, legacy)) / count:>8.0f} {legacy_loads / count * 1e6:>10.1f}us "
+        f"{legacy_loads / count * 1e6:>10.1f}us"
+    )
+    for label, cache in caches.items():
+        if cache is None:
+            continue
+        mappings = [cache.encode(order) for order in orders]
+        projections = [[mapping.get(name) for name in PROJECTION_FIELDS] for mapping in mappings]
+        fulls = [[mapping.get(name) for name in FULL_FIELDS] for mapping in mappings]
+        for order, values in zip(orders, fulls):
+            assert cache.decode_full("", values) == order
+        projection_seconds = timed(lambda values: cache.decode_projection("", values), projections)
+        full_seconds = timed(lambda values: cache.decode_full("", values), fulls)
+        print(
+            f"  {label:<20} {sum(map(hash_size, mappings)) / count:>8.0f} "
+            f"{projection_seconds / count * 1e6:>10.1f}us {full_seconds / count * 1e6:>10.1f}us"
+        )
+
+    url = os.getenv("BENCHMARK_REDIS_URL")
+    if url:
+        print("Redis MEMORY USAGE：")
+        for label, size in asyncio.run(memory_usage(url, orders, caches)).items():
+            print(f"  {label:<20} {size:>8.0f}B/条")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+# ---------------------------------------------------------------------------------------------------------
+# ProjectName:  cronjob-1717
+# FileName:     order_key_benchmark.py
+# Description:  订单 key 编解码基准：原字符串拼接/切分函数 vs OrderKey
+# Author:       ASUS
+# CreateDate:   2026/10/18
+# Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
+# ---------------------------------------------------------------------------------------------------------
+"""
+import sys
+import random
+import tracemalloc
+from time import perf_counter
+from typing import Dict, Any, List, Callable
+from jobs.order_key import encode_orders, decode_keys, _decode, _from_order_fields
+
+"""
+运行方式（项目根目录下）：python -m benchmarks.order_key_benchmark [key 数量，默认 100000]
+1. 随机生成 KEYS 条活动订单（城市、日期、航班、舱位从有限集合中取值，订单号唯一）
+2. 编码：原 gen_qlv_flight_order_key_prefix 逐条拼接 vs encode_orders 批量编码，
+   分别统计首轮（缓存未命中）和第二轮（同一批订单再抓一轮）的耗时；key 数量超过 ORDER_KEY_CACHE_SIZE 时
+   第二轮同样未命中，传入较小的数量（如 5000）可看到缓存命中时的耗时
+3. 解码：原 qlv_flight_order_key_convert_dict 逐条切分 vs decode_keys，同样统计首轮和第二轮，
+   并统计解析结果常驻内存（原函数为 dict，OrderKey 为 __slots__ 对象 + intern 字符串）
+4. 原函数依赖的 redis_helper、playwright_helper 在基准环境中不一定可用，这里原样复制一份作为对照，
+   safe_convert_advanced 以纯数字转 int 代替
+"""
+
+KEYS = 100000
+CITIES = ("CAN", "WUS", "PEK", "SHA", "CTU", "SZX", "KMG", "XIY", "SYX", "TYN", "HGH", "CKG")
+CABINS = ("Y", "B", "M", "H", "K", "L", "S", "V")
+
+
+def safe_convert_advanced(value: str) -> Any:
+    return int(value) if value.isdigit() else value
+
+
+def gen_qlv_flight_order_key_prefix(
+        *, dep_city: str = None, arr_city: str = None, dep_date: str = None, flight_no: str = None, cabin: str = None,
+        extend: str = None
+) -> str:
+    li = ["flight", "order", "qlv"]
+    if dep_city:
+        if isinstance(dep_city, str) is False:
+            dep_city = str(dep_city)
+        li.append(dep_city)
+    if arr_city:
+        if isinstance(arr_city, str) is False:
+            arr_city = str(arr_city)
+        li.append(arr_city)
+    if dep_date:
+        if isinstance(dep_date, str) is False:
+            dep_date = str(dep_date)
+        dep_date = dep_date.replace(" ", "T")
+        dep_date = dep_date.replace(":", "/")
+        li.append(dep_date)
+    if flight_no:
+        if isinstance(flight_no, str) is False:
+            flight_no = str(flight_no)
+        li.append(flight_no)
+    if cabin:
+        if isinstance(cabin, str) is False:
+            cabin = str(cabin)
+        li.append(cabin)
+    if extend:
+        if isinstance(extend, str) is False:
+            extend = str(extend)
+        li.append(extend)
+    return ":".join(li)
+
+
+def qlv_flight_order_key_convert_dict(key: str) -> Dict[str, Any]:
+    try:
+        key_slice = key.split(":")
+        dep_date = key_slice[5]
+        dep_date = dep_date.replace("T", " ")
+        dep_date = dep_date.replace("/", ":")
+        data = {
+            "dep_city": key_slice[3],
+            "arr_city": key_slice[4],
+            "dep_date": dep_date,
+            "flight_no": key_slice[6],
+            "cabin": key_slice[7],
+            "extend": safe_convert_advanced(value=key_slice[8])
+        }
+        if len(key_slice) > 9:
+            data["extend+"] = ":".join(key_slice[9:])
+        return data
+    except (IndexError, ValueError, Exception) as e:
+        print(e)
+        return dict()
+
+
+def make_orders(count: int) -> List[Dict[str, Any]]:
+    rnd = random.Random(1717)
+    orders = list()
+    for i in range(count):
+        orders.append({
+            "id": 150000 + i,
+            "code_dep": rnd.choice(CITIES),
+            "code_arr": rnd.choice(CITIES),
+            # 接口每次返回的都是新字符串，这里也不复用同一个对象
+            "dat_dep": "2025-12-%02d %02d:%02d:00" % (rnd.randint(1, 30), rnd.randint(6, 22), rnd.choice((0, 30))),
+            "flight_no": "%s%04d" % (rnd.choice(("CZ", "MU", "CA", "SC", "HU")), rnd.randint(1000, 1200)),
+            "cabin": rnd.choice(CABINS),
+        })
+    return orders
+
+
+def legacy_encode(orders: List[Dict[str, Any]]) -> Dict[Any, str]:
+    keys = dict()
+    for order in orders:
+        order_id = order.get("id")
+        if order_id:
+            keys[order_id] = gen_qlv_flight_order_key_prefix(
+                dep_city=order.get("code_dep"), arr_city=order.get("code_arr"), dep_date=order.get("dat_dep"),
+                extend=order_id, cabin=order.get("cabin"), flight_no=order.get("flight_no"),
+            )
+    return keys
+
+
+def legacy_decode(keys: List[str]) -> List[Dict[str, Any]]:
+    return [qlv_flight_order_key_convert_dict(key) for key in keys]
+
+
+def timed(func: Callable, arg: Any) -> float:
+    start = perf_counter()
+    func(arg)
+    return perf_counter() - start
+
+
+def retained(func: Callable, arg: Any) -> int:
+    """解析结果本身占用的内存（不含作为输入的 key 列表）"""
+    tracemalloc.start()
+    result = func(arg)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else KEYS
+    orders = make_orders(count)
+    keys = [key + "" for key in legacy_encode(orders).values()]
+    assert list(encode_orders(orders).values()) == keys
+    assert [x.to_dict() for x in decode_keys(keys)] == legacy_decode(keys)
+    _decode.cache_clear()
+    _from_order_fields.cache_clear()
+
+    # key 数量超过缓存容量时第二轮仍然全部未命中，即冷路径；不超过时第二轮全部命中
+    results = dict()
+    for label, func, arg in (
+            ("编码 原函数", legacy_encode, orders), ("编码 OrderKey", encode_orders, orders),
+            ("解码 原函数", legacy_decode, keys), ("解码 OrderKey", decode_keys, keys),
+    ):
+        results[label] = (timed(func, arg), timed(func, arg))
+        _decode.cache_clear()
+        _from_order_fields.cache_clear()
+    print(f"{count} 条订单 key（缓存容量 {_decode.cache_info().maxsize}）：")
+    print(f"  {'':<14} {'首轮':>10} {'第二轮':>10} {'单条(首轮)':>10} {'单条(第二轮)':>10}")
+    for label, (first, second) in results.items():
+        print(
+            f"  {label:<12} {first * 1000:>10.1f}ms {second * 1000:>8.1f}ms "
+            f"{first / count * 1e6:>10.2f}us {second / count * 1e6:>10.2f}us"
+        )
+    print("解析结果常驻内存：")
+    legacy_size = retained(legacy_decode, keys)
+    _decode.cache_clear()
+    order_key_size = retained(decode_keys, keys)
+    _decode.cache_clear()
+    print(f"  原函数 dict      {legacy_size / 1024 / 1024:>7.1f}MB（{legacy_size / count:.0f}B/条）")
+    print(f"  OrderKey        {order_key_size / 1024 / 1024:>7.1f}MB（{order_key_size / count:.0f}B/条，含 LRU 缓存）")
+
+
+if __name__ == "__main__":
+    main()
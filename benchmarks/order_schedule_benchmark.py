@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+# ---------------------------------------------------------------------------------------------------------
+# ProjectName:  cronjob-1717
+# FileName:     order_schedule_benchmark.py
+# Description:  订单检查调度模拟：原轮询（FIFO）vs 按出票时限、价格波动调度
+# Author:       ASUS
+# CreateDate:   2026/10/18
+# Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
+# ---------------------------------------------------------------------------------------------------------
+"""
+import sys
+import heapq
+import random
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Tuple
+from jobs.order_schedule import PRICE_HISTORY_FIELD, ORDER_SCHEDULE_MAX_INTERVAL, next_check_delay
+
+"""
+运行方式（项目根目录下）：python -m benchmarks.order_schedule_benchmark [订单数量，默认 600] [任务间隔秒数，默认 10]
+1. 不连接 Redis，纯本地模拟 6 小时：比价任务每个间隔取一个订单检查一次（与线上调度频率一致），两种方式的检查预算相同
+2. 订单最晚出票时间在 1 小时 ~ 14 天之间随机分布，三分之一的订单价格波动大（最近几次最低价相差约 10%）；
+   超过出票时限的订单离开队列（对账任务会将其移除）
+3. FIFO：原集合队列的行为，每个订单轮流检查；调度：ScheduledOrderQueue 的行为，新订单按紧迫程度排先后，取最早到期的订单，
+   检查后按 next_check_delay 排回，没有到期的订单时本次任务跳过（不消耗上游请求）
+4. 按距出票时限分组输出：每个订单平均检查次数、平均检查间隔、组内最大的检查间隔（分钟），以及实际消耗的检查次数
+"""
+
+ORDERS = 600
+TICK = 10.0
+HORIZON = 6 * 3600
+BUCKETS = ((0, 6, "< 6 小时"), (6, 24, "6 ~ 24 小时"), (24, 72, "1 ~ 3 天"), (72, 10 ** 6, "> 3 天"))
+
+
+def make_orders(count: int, start: datetime) -> List[Dict[str, Any]]:
+    rnd = random.Random(1717)
+    orders = list()
+    for i in range(count):
+        hours = rnd.uniform(1, 14 * 24)
+        base = rnd.randint(400, 2000)
+        spread = 0.1 if i % 3 == 0 else 0.005
+        orders.append({
+            "id": i, "stat_order": "待处理",
+            "last_time_ticket": (start + timedelta(hours=hours)).strftime("%Y-%m-%d %H:%M:%S"),
+            PRICE_HISTORY_FIELD: [round(base * rnd.uniform(1 - spread, 1 + spread)) for _ in range(4)],
+            "_hours": hours,
+        })
+    return orders
+
+
+def _record(checks: Dict[int, List[float]], order: Dict[str, Any], t: float) -> None:
+    checks.setdefault(order["id"], list()).append(t)
+
+
+def simulate_fifo(orders: List[Dict[str, Any]], tick: float) -> Tuple[Dict[int, List[float]], int]:
+    checks: Dict[int, List[float]] = dict()
+    queue, used, t = deque(orders), 0, 0.0
+    while t < HORIZON and queue:
+        order = queue.popleft()
+        if order["_hours"] * 3600 > t:
+            _record(checks, order, t)
+            used += 1
+            queue.append(order)
+        t += tick
+    return checks, used
+
+
+def simulate_schedule(orders: List[Dict[str, Any]], tick: float, start: datetime) -> Tuple[Dict[int, List[float]], int]:
+    checks: Dict[int, List[float]] = dict()
+    # 与 ScheduledOrderQueue.stage_add 一致：新订单都已到期，按检查间隔排先后
+    heap = [
+        (min(next_check_delay(order, now=start, jitter=False) - ORDER_SCHEDULE_MAX_INTERVAL, 0), order["id"], order)
+        for order in orders
+    ]
+    heapq.heapify(heap)
+    used, t = 0, 0.0
+    while t < HORIZON and heap:
+        if heap[0][0] <= t:
+            score, _, order = heapq.heappop(heap)
+            if order["_hours"] * 3600 > t:
+                _record(checks, order, t)
+                used += 1
+                delay = next_check_delay(order, now=start + timedelta(seconds=t))
+                # 与 SCHEDULE_REQUEUE_SCRIPT 一致：从原分数起算，积压时各订单按间隔比例分到检查次数
+                heapq.heappush(heap, (max(score, t - ORDER_SCHEDULE_MAX_INTERVAL) + delay, order["id"], order))
+        t += tick
+    return checks, used
+
+
+def report(label: str, orders: List[Dict[str, Any]], checks: Dict[int, List[float]], used: int) -> None:
+    print(f"  {label}（消耗检查 {used} 次）：")
+    for low, high, name in BUCKETS:
+        bucket = [x for x in orders if low <= x["_hours"] < high]
+        if not bucket:
+            continue
+        counts, intervals, gaps = list(), list(), list()
+        for order in bucket:
+            # 模拟时段内（或出票时限前）的检查，间隔包括开始到第一次、最后一次到结束
+            end = min(HORIZON, order["_hours"] * 3600)
+            times = [0.0] + [x for x in checks.get(order["id"], list()) if x < end] + [end]
+            counts.append(len(times) - 2)
+            intervals.append(end / (len(times) - 1))
+            gaps.append(max(b - a for a, b in zip(times, times[1:])))
+        print(
+            f"    {name:<12} 订单 {len(bucket):>4}  平均检查 {sum(counts) / len(bucket):>6.1f} 次  "
+            f"平均间隔 {sum(intervals) / len(bucket) / 60:>6.1f} 分钟  最大间隔 {max(gaps) / 60:>6.1f} 分钟"
+        )
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else ORDERS
+    tick = float(sys.argv[2]) if len(sys.argv) > 2 else TICK
+    start = datetime.now().replace(microsecond=0)
+    orders = make_orders(count, start)
+    print(f"{count} 个订单，任务每 {tick:g} 秒检查一个，模拟 {HORIZON // 3600} 小时（预算 {int(HORIZON / tick)} 次）：")
+    report("FIFO 轮询", orders, *simulate_fifo(orders, tick))
+    report("按时限 / 波动调度", orders, *simulate_schedule(orders, tick, start))
+
+
+if __name__ == "__main__":
+    main()
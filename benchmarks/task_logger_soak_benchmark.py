@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+# ---------------------------------------------------------------------------------------------------------
+# ProjectName:  cronjob-1717
+# FileName:     task_logger_soak_benchmark.py
+# Description:  任务 logger 生命周期浸泡测试：大量调度后内存、文件句柄、logger 数量是否持平
+# Author:       ASUS
+# CreateDate:   2026/10/18
+# Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
+# ---------------------------------------------------------------------------------------------------------
+"""
+import os
+import gc
+import sys
+import shutil
+import logging
+import asyncio
+import tempfile
+from time import perf_counter
+from typing import Dict, Any
+import log_utils
+from loguru import logger as loguru_logger
+from pyxxl import ExecutorConfig
+from pyxxl.ctx import g
+from pyxxl.schema import RunData
+from pyxxl.logger.disk import DiskLog
+from pyxxl.executor import Executor, JobHandler
+
+"""
+运行方式（项目根目录下）：python -m benchmarks.task_logger_soak_benchmark [调度次数，默认 100000]
+1. 用打过 log_utils 补丁的 pyxxl Executor 连续调度 handler，每个任务写几行任务日志，其中一部分任务抛异常
+2. 每 BATCH 次调度等待任务全部结束、删除已写完的任务日志文件（模拟过期清理），
+   每 SAMPLE_EVERY 次调度采样一次：RSS、打开的文件句柄数、logging 管理器中的 logger 数、
+   Loguru sink 数、执行中的任务 logger 数
+3. 控制台输出重定向到 /dev/null；各项指标在预热后应保持持平
+"""
+
+DISPATCHES = 100000
+BATCH = 1000
+SAMPLE_EVERY = 10000
+HANDLERS = ("fetch_flight_activity_order", "pop_active_order")
+
+
+class FakeXXL:
+
+    async def callback(self, log_id: int, timestamp: int, code: int = 200, msg: str = "") -> None:
+        pass
+
+
+def run_data(log_id: int) -> RunData:
+    return RunData(
+        jobId=log_id % BATCH, logId=log_id, executorHandler=HANDLERS[log_id % len(HANDLERS)], executorParams="",
+        executorBlockStrategy="SERIAL_EXECUTION", executorTimeout=0, glueType="BEAN", logDateTime=0,
+        broadcastIndex=0, broadcastTotal=1,
+    )
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def open_fds() -> int:
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return -1
+
+
+def sample(dispatched: int) -> Dict[str, Any]:
+    gc.collect()
+    return {
+        "dispatched": dispatched,
+        "rss": rss_mb(),
+        "fds": open_fds(),
+        "loggers": len(logging.Logger.manager.loggerDict),
+        "sinks": len(loguru_logger._core.handlers),
+        "active": log_utils.task_logger_pool.stats()["active"],
+    }
+
+
+def make_handler() -> JobHandler:
+    handler = JobHandler()
+
+    @handler.register(name=HANDLERS[0])
+    async def fetch_flight_activity_order():
+        for i in range(3):
+            g.logger.info("订单<%s>第 %s 次比价", g.xxl_run_data.logId, i)
+
+    @handler.register(name=HANDLERS[1])
+    async def pop_active_order():
+        g.logger.info("弹出订单<%s>", g.xxl_run_data.logId)
+        if g.xxl_run_data.logId % 10 == 1:
+            raise ValueError("订单不存在")
+
+    return handler
+
+
+async def soak(log_dir: str, dispatches: int) -> list:
+    config = ExecutorConfig(
+        xxl_admin_baseurl="http://127.0.0.1:1/api/", executor_app_name="benchmark", log_local_dir=log_dir,
+        executor_log_path=os.path.join(log_dir, "pyxxl.log"), dotenv_try=False,
+    )
+    task_dir = os.path.join(log_dir, "tasks")
+    os.makedirs(task_dir)
+    executor = Executor(FakeXXL(), config=config, handler=make_handler(), logger_factory=DiskLog(task_dir))
+    samples = [sample(0)]
+    for start in range(0, dispatches, BATCH):
+        for log_id in range(start + 1, start + BATCH + 1):
+            await executor.run_job(run_data(log_id))
+        while executor.tasks:
+            await asyncio.sleep(0.001)
+        log_utils.task_log_writer.flush()
+        shutil.rmtree(task_dir)
+        os.makedirs(task_dir)
+        if (start + BATCH) % SAMPLE_EVERY == 0:
+            samples.append(sample(start + BATCH))
+    return samples
+
+
+def main() -> None:
+    dispatches = int(sys.argv[1]) if len(sys.argv) > 1 else DISPATCHES
+    stdout = sys.stdout
+    with open(os.devnull, "w") as devnull, tempfile.TemporaryDirectory() as log_dir:
+        sys.stdout = devnull
+        begin = perf_counter()
+        try:
+            samples = asyncio.run(soak(log_dir, dispatches))
+        finally:
+            sys.stdout = stdout
+    cost = perf_counter() - begin
+    print(f"{dispatches} 次调度，耗时 {cost:.1f}s（{cost / dispatches * 1e6:.0f}us/次）")
+    print(f"  {'调度次数':<8} {'RSS(MB)':>8} {'文件句柄':>6} {'logger 数':>8} {'Loguru sink':>11} {'执行中 logger':>12}")
+    for s in samples:
+        print(
+            f"  {s['dispatched']:<12} {s['rss']:>8.1f} {s['fds']:>10} {s['loggers']:>10} "
+            f"{s['sinks']:>11} {s['active']:>14}"
+        )
+    first, last = samples[1] if len(samples) > 1 else samples[0], samples[-1]
+    print(
+        f"  首次采样到结束：RSS {last['rss'] - first['rss']:+.1f}MB，文件句柄 {last['fds'] - first['fds']:+d}，"
+        f"logger 数 {last['loggers'] - first['loggers']:+d}"
+    )
+
+
+if __name__ == "__main__":
+    main()
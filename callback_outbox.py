@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+# ---------------------------------------------------------------------------------------------------------
+# ProjectName:  cronjob-1717
+# FileName:     callback_outbox.py
+# Description:  执行结果回调 admin 的本地发件箱
+# Author:       ASUS
+# CreateDate:   2026/10/18
+# Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
+# ---------------------------------------------------------------------------------------------------------
+"""
+import os
+import json
+import asyncio
+import threading
+from aiohttp import ClientError
+from pyxxl.error import XXLClientError
+from collections import OrderedDict
+from logging import Logger, getLogger
+from typing import Dict, Any, List, Optional
+
+"""
+回调流程
+1. XXL.callback 不再直接请求 admin，而是把回调内容追加到本地 journal（logs/pyxxl-callback.outbox）后立即返回
+2. 后台 flusher 协程把待发送的回调按批次（admin 的 /api/callback 本身接收列表）发给 admin
+3. 发送成功后追加一条确认记录；失败则按指数退避重试，期间新的回调继续积累
+4. flusher 启动时重放 journal，把未确认的回调重新发送；没有待发送回调时截断 journal
+5. 连接类失败（admin 不可达、超时）一直重试；其它失败（admin 拒绝、序列化失败）同一批连续失败 max_attempts 次后
+   把批次减半重试，单条仍然失败时移入死信文件（logs/pyxxl-callback.deadletter）并确认，不再堵住后面的回调
+journal 每行是一个 JSON 数组：
+    ["+", {回调内容}]   待发送
+    ["-", [logId, ...]] 已确认
+"""
+
+OUTBOX_FILE_NAME = "pyxxl-callback.outbox"
+DEAD_LETTER_FILE_NAME = "pyxxl-callback.deadletter"
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_FLUSH_INTERVAL = 0.2
+DEFAULT_MIN_BACKOFF = 1
+DEFAULT_MAX_BACKOFF = 60
+DEFAULT_MAX_ATTEMPTS = 5
+
+
+class CallbackOutbox:
+
+    def __init__(
+            self, log_dir: str, *, batch_size: int = DEFAULT_BATCH_SIZE, flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+            min_backoff: float = DEFAULT_MIN_BACKOFF, max_backoff: float = DEFAULT_MAX_BACKOFF,
+            max_attempts: int = DEFAULT_MAX_ATTEMPTS, logger: Optional[Logger] = None
+    ):
+        self.path = os.path.join(log_dir, OUTBOX_FILE_NAME)
+        self.dead_letter_path = os.path.join(log_dir, DEAD_LETTER_FILE_NAME)
+        self.batch_size = batch_size
+        # 当前每批条数，排查发不出去的回调时逐次减半，移走一条死信后恢复
+        self._batch_limit = batch_size
+        self.max_attempts = max_attempts
+        self.flush_interval = flush_interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.logger = logger or getLogger(__name__)
+        self._lock = threading.Lock()
+        self._pending: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._fd: Optional[int] = None
+        self._event: Optional[asyncio.Event] = None
+
+    # ================= journal =================
+
+    def open(self) -> None:
+        """
+        重放 journal 并打开写入句柄，推迟到 flusher 启动或首次写入时：
+        进程池子进程导入 app 时只创建对象，不会改写主进程正在使用的 journal
+        """
+        with self._lock:
+            if self._fd is None:
+                self._replay()
+
+    def _replay(self) -> None:
+        """重放 journal，恢复未确认的回调，并把 journal 重写为只包含这些回调"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if os.path.exists(self.path):
+            with open(self.path, mode="r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        op, value = json.loads(line)
+                    except ValueError:
+                        # 进程被杀时可能留下半行，忽略
+                        continue
+                    if op == "+":
+                        self._pending[value["logId"]] = value
+                    elif op == "-":
+                        for log_id in value:
+                            self._pending.pop(log_id, None)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, mode="w", encoding="utf-8") as f:
+            f.writelines(self._dumps("+", item) for item in self._pending.values())
+        os.replace(tmp_path, self.path)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        if self._pending:
+            self.logger.warning(f"回调发件箱重放未确认的回调<{len(self._pending)}>条")
+
+    @staticmethod
+    def _dumps(op: str, value: Any) -> str:
+        return json.dumps([op, value], ensure_ascii=False, default=str) + "\n"
+
+    def _write(self, op: str, value: Any) -> None:
+        os.write(self._fd, self._dumps(op, value).encode("utf-8"))
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def put(self, log_id: int, timestamp: int, code: int = 200, msg: Optional[str] = None) -> None:
+        """写入一条回调（与 XXL.callback 的 payload 格式一致，executeResult 兼容 xxl-job 2.2）"""
+        item = {
+            "logId": log_id,
+            "logDateTim": timestamp,
+            "handleCode": code,
+            "handleMsg": msg,
+            "executeResult": {"code": code, "msg": msg},
+        }
+        if self._fd is None:
+            self.open()
+        with self._lock:
+            self._write("+", item)
+            self._pending[log_id] = item
+        if self._event is not None:
+            self._event.set()
+
+    def _take(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [item for _, item in zip(range(self._batch_limit), self._pending.values())]
+
+    def _ack(self, batch: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            acked = list()
+            for item in batch:
+                # 发送期间同一个 logId 又有新回调时，保留新的
+                if self._pending.get(item["logId"]) is item:
+                    self._pending.pop(item["logId"])
+                    acked.append(item["logId"])
+            if not self._pending:
+                # 全部确认后截断 journal，避免无限增长
+                os.ftruncate(self._fd, 0)
+            elif acked:
+                self._write("-", acked)
+
+    def _dead_letter(self, item: Dict[str, Any], error: Exception) -> None:
+        """反复发送失败的回调写入死信文件后确认，留待人工排查"""
+        with self._lock:
+            with open(self.dead_letter_path, mode="a", encoding="utf-8") as f:
+                f.write(json.dumps({"item": item, "error": repr(error)}, ensure_ascii=False, default=str) + "\n")
+        self._ack([item])
+        self._batch_limit = self.batch_size
+        self.logger.error(
+            f"回调<logId={item['logId']}>连续发送失败<{self.max_attempts}>次，已移入死信文件<{self.dead_letter_path}>：{error}"
+        )
+
+    @staticmethod
+    def _is_transient(e: Exception) -> bool:
+        """admin 不可达或超时，等它恢复即可；pyxxl 重试用尽后把连接错误包装成 XXLClientError"""
+        if isinstance(e, (ClientError, OSError, asyncio.TimeoutError)):
+            return True
+        return isinstance(e, XXLClientError) and str(e).startswith("Connection error")
+
+    # ================= flusher =================
+
+    async def flush_once(self, xxl_client) -> int:
+        """发送一批待确认的回调，返回发送成功的数量；失败时抛出异常"""
+        batch = self._take()
+        if not batch:
+            return 0
+        await xxl_client._post("callback", batch, retry_times=1)
+        self._ack(batch)
+        self.logger.debug(f"批量回调 admin 成功<{len(batch)}>条")
+        return len(batch)
+
+    async def run(self, xxl_client) -> None:
+        """后台 flusher：有新回调或到达 flush_interval 时批量发送，失败按指数退避"""
+        self._event = asyncio.Event()
+        backoff, attempts = self.min_backoff, 0
+        while True:
+            if not self._pending:
+                self._batch_limit = self.batch_size
+                self._event.clear()
+                await self._event.wait()
+            # 稍等片刻，让同一时刻完成的任务合并成一批
+            await asyncio.sleep(self.flush_interval)
+            while self._pending:
+                try:
+                    await self.flush_once(xxl_client)
+                    backoff, attempts = self.min_backoff, 0
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    if not self._is_transient(e):
+                        attempts += 1
+                        if attempts >= self.max_attempts:
+                            attempts = 0
+                            if self._batch_limit > 1:
+                                self._batch_limit = max(self._batch_limit // 2, 1)
+                                self.logger.warning(f"批量回调 admin 反复失败，拆分为每批<{self._batch_limit}>条重试：{e}")
+                            else:
+                                self._dead_letter(self._take()[0], e)
+                            continue
+                    self.logger.warning(
+                        f"批量回调 admin 失败，待发送<{len(self._pending)}>条，{backoff}秒后重试：{e}"
+                    )
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, self.max_backoff)
+
+    async def close(self, xxl_client, timeout: float = 5) -> None:
+        """退出前尽量把剩余回调发完，发不完的留在 journal 里等下次启动重放"""
+        try:
+            async with asyncio.timeout(timeout):
+                while await self.flush_once(xxl_client):
+                    pass
+        except Exception as e:
+            self.logger.warning(f"退出前回调 admin 未完成，剩余<{len(self._pending)}>条将在重启后重放：{e}")
+        # journal 保持打开：executor 关闭时被取消的任务仍会写入回调，留待下次启动重放
+        self._event = None
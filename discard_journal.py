@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+# ---------------------------------------------------------------------------------------------------------
+# ProjectName:  cronjob-1717
+# FileName:     discard_journal.py
+# Description:  被丢弃调度的追加式日志
+# Author:       ASUS
+# CreateDate:   2026/10/18
+# Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
+# ---------------------------------------------------------------------------------------------------------
+"""
+import os
+import re
+import json
+import threading
+from time import time, monotonic
+from datetime import datetime
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+"""
+mode=discard 的调度不再各自创建 pyxxl-{logId}.log，而是每条追加一行到当天共享的 journal 文件：
+    logs/pyxxl-discard-20261018.journal
+每行是一个 JSON 数组：[时间戳, jobId, logId, executorHandler, executorParams]
+内存里保留最近的 logId -> (文件, 偏移) 映射，/log 查询时直接 seek 读取那一行并渲染成原来的 5 行日志；
+扫描全部 journal 仍找不到的 logId 在 miss_ttl 秒内直接判定不存在，admin 轮询未知 logId 时不会每次重扫
+"""
+
+JOURNAL_NAME_FORMAT = "pyxxl-discard-{date}.journal"
+JOURNAL_NAME_REGEX = re.compile(r"^pyxxl-discard-(\d{8})\.journal$")
+DEFAULT_OFFSET_CACHE_SIZE = 100000
+DEFAULT_MISS_TTL = 30
+
+DiscardRecord = Tuple[float, int, int, str, Optional[str]]
+
+
+class DiscardJournal:
+
+    def __init__(self, log_dir: str, *, offset_cache_size: int = DEFAULT_OFFSET_CACHE_SIZE,
+                 miss_ttl: float = DEFAULT_MISS_TTL):
+        self.log_dir = log_dir
+        self.offset_cache_size = offset_cache_size
+        self.miss_ttl = miss_ttl
+        self._lock = threading.Lock()
+        self._date: Optional[str] = None
+        self._path: Optional[str] = None
+        self._fd: Optional[int] = None
+        self._offsets: "OrderedDict[int, Tuple[str, int]]" = OrderedDict()
+        self._misses: "OrderedDict[int, float]" = OrderedDict()
+
+    def _open(self, date: str) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+        os.makedirs(self.log_dir, exist_ok=True)
+        self._path = os.path.join(self.log_dir, JOURNAL_NAME_FORMAT.format(date=date))
+        self._fd = os.open(self._path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._date = date
+
+    def append(self, job_id: int, log_id: int, handler: str, params: Optional[str]) -> None:
+        """追加一条丢弃记录：一次 write 系统调用，不创建新文件，也不等待 fsync"""
+        now = time()
+        line = json.dumps([now, job_id, log_id, handler, params], ensure_ascii=False).encode("utf-8") + b"\n"
+        date = datetime.fromtimestamp(now).strftime("%Y%m%d")
+        with self._lock:
+            if date != self._date:
+                self._open(date)
+            offset = os.lseek(self._fd, 0, os.SEEK_END)
+            os.write(self._fd, line)
+            self._offsets[log_id] = (self._path, offset)
+            self._misses.pop(log_id, None)
+            if len(self._offsets) > self.offset_cache_size:
+                self._offsets.popitem(last=False)
+
+    def _journal_paths(self) -> List[str]:
+        """按日期从新到旧排列的 journal 文件"""
+        try:
+            names = [x for x in os.listdir(self.log_dir) if JOURNAL_NAME_REGEX.match(x)]
+        except FileNotFoundError:
+            return list()
+        return [os.path.join(self.log_dir, x) for x in sorted(names, reverse=True)]
+
+    def _scan(self, log_id: int) -> Optional[DiscardRecord]:
+        """内存中没有偏移时（如进程重启后），从新到旧扫描 journal 文件"""
+        for path in self._journal_paths():
+            try:
+                with open(path, mode="rb") as f:
+                    found = None
+                    for line in f:
+                        record = json.loads(line)
+                        if record[2] == log_id:
+                            found = record
+                    if found:
+                        return tuple(found)
+            except (OSError, ValueError):
+                continue
+        return None
+
+    def get(self, log_id: int) -> Optional[DiscardRecord]:
+        with self._lock:
+            location = self._offsets.get(log_id)
+        if location:
+            path, offset = location
+            try:
+                with open(path, mode="rb") as f:
+                    f.seek(offset)
+                    return tuple(json.loads(f.readline()))
+            except (OSError, ValueError):
+                pass
+        now = monotonic()
+        with self._lock:
+            expires = self._misses.get(log_id)
+        if expires is not None and expires > now:
+            return None
+        record = self._scan(log_id)
+        with self._lock:
+            if record is None and log_id not in self._offsets:
+                self._misses[log_id] = now + self.miss_ttl
+                self._misses.move_to_end(log_id)
+                while len(self._misses) > self.offset_cache_size:
+                    self._misses.popitem(last=False)
+            else:
+                self._misses.pop(log_id, None)
+        return record
+
+    @staticmethod
+    def render(record: DiscardRecord) -> List[str]:
+        """渲染成与原先单独日志文件一致的内容"""
+        created, job_id, log_id, handler, params = record
+        timestamp = datetime.fromtimestamp(created).strftime("%Y-%m-%d %H:%M:%S")
+        return [
+            f"[{timestamp}] INFO - Task discarded by executor.\n",
+            f"[{timestamp}] INFO - Reason: Execution mode is 'discard'.\n",
+            f"[{timestamp}] INFO - Job ID: {job_id}, Log ID: {log_id}\n",
+            f"[{timestamp}] INFO - Handler: {handler}\n",
+            f"[{timestamp}] INFO - Parameters: {params}\n",
+        ]
+
+    def read_lines(self, log_id: int, from_line: int, count: int) -> Tuple[str, int, bool]:
+        """按 /log 的行号语义读取某个 logId 的丢弃记录；没有记录时抛 FileNotFoundError"""
+        record = self.get(log_id)
+        if record is None:
+            raise FileNotFoundError(f"logId {log_id} is not in discard journal")
+        lines = self.render(record)
+        start_line = max(from_line, 1)
+        page = lines[start_line - 1:start_line - 1 + max(count, 0)]
+        to_line = start_line + len(page) - 1 if page else from_line - 1
+        return "".join(page), to_line, start_line + count - 1 > len(lines)
+
+    def expire(self, expired_seconds: float) -> int:
+        """删除超过保留时间的 journal 文件（当天正在写的文件除外），返回删除数量"""
+        expire_date = datetime.fromtimestamp(time() - expired_seconds).strftime("%Y%m%d")
+        removed = set()
+        for path in self._journal_paths():
+            date = JOURNAL_NAME_REGEX.match(os.path.basename(path)).group(1)
+            if date < expire_date and date != self._date:
+                try:
+                    os.remove(path)
+                    removed.add(path)
+                except FileNotFoundError:
+                    pass
+        if removed:
+            with self._lock:
+                self._offsets = OrderedDict((k, v) for k, v in self._offsets.items() if v[0] not in removed)
+        return len(removed)
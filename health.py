@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+# ---------------------------------------------------------------------------------------------------------
+# ProjectName:  cronjob-1717
+# FileName:     health.py
+# Description:  事件循环延迟监控与浏览器池登记
+# Author:       ASUS
+# CreateDate:   2026/10/18
+# Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
+# ---------------------------------------------------------------------------------------------------------
+"""
+import sys
+import asyncio
+import threading
+import traceback
+from weakref import WeakSet
+from collections import deque
+from time import monotonic, time
+from logging import Logger, getLogger
+from typing import Dict, Any, Deque, List, Optional
+
+"""
+事件循环延迟监控逻辑
+1. 采样协程每隔 interval 秒 sleep 一次，醒来时间比预期晚多少就是本次调度延迟，最近 window 个样本用于计算 p50/p90/p99/max
+2. 事件循环被同步代码卡住时采样协程根本醒不过来，所以另起一个守护线程盯着：
+   超过预期醒来时间 threshold 秒仍未醒，就抓取事件循环线程当前的调用栈和正在运行的 task 名称，
+   每次卡顿只抓一次，保留最近 stall_history 次
+3. 深度健康检查根据 p99 延迟和最近一次醒来距今的时长判断事件循环是否健康
+浏览器池登记
+4. jobs 中创建的 BrowserPool 登记到弱引用集合，健康检查时报告每个池的大小、空闲数和是否启动，池被回收后自动移除
+"""
+
+DEFAULT_INTERVAL = 0.5
+DEFAULT_THRESHOLD = 0.5
+DEFAULT_WINDOW = 1200
+DEFAULT_STALL_HISTORY = 20
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+class LoopLagMonitor:
+
+    def __init__(
+            self, *, interval: float = DEFAULT_INTERVAL, threshold: float = DEFAULT_THRESHOLD,
+            window: int = DEFAULT_WINDOW, stall_history: int = DEFAULT_STALL_HISTORY, logger: Optional[Logger] = None
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.logger = logger or getLogger(__name__)
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._stalls: Deque[Dict[str, Any]] = deque(maxlen=stall_history)
+        self.stall_count = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        # 采样协程下一次应当醒来的时间；None 表示未启动
+        self._expected_wake: Optional[float] = None
+        self._captured_wake: Optional[float] = None
+        self._last_tick: Optional[float] = None
+        self._stop = threading.Event()
+
+    # ================= 采样 =================
+
+    async def run(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        watcher = threading.Thread(target=self._watch, name="loop-lag-watcher", daemon=True)
+        watcher.start()
+        try:
+            while True:
+                start = monotonic()
+                self._last_tick = start
+                self._expected_wake = start + self.interval
+                await asyncio.sleep(self.interval)
+                self._samples.append(max(0.0, monotonic() - self._expected_wake))
+        finally:
+            self._stop.set()
+            self._expected_wake = None
+
+    def _watch(self) -> None:
+        while not self._stop.wait(min(self.threshold, self.interval) / 2):
+            expected = self._expected_wake
+            if expected is None or expected == self._captured_wake:
+                continue
+            lag = monotonic() - expected
+            if lag > self.threshold:
+                self._captured_wake = expected
+                self._capture(lag)
+
+    def _capture(self, lag: float) -> None:
+        """在监控线程中抓取事件循环线程当前的调用栈"""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+        task = None
+        try:
+            current = asyncio.current_task(self._loop)
+            task = current.get_name() if current is not None else None
+        except RuntimeError:
+            pass
+        self.stall_count += 1
+        self._stalls.append({"time": int(time() * 1000), "lagSeconds": round(lag, 3), "task": task, "stack": stack})
+        self.logger.warning(f"事件循环已阻塞超过 {lag:.3f} 秒，当前 task: {task}，调用栈:\n{stack}")
+
+    # ================= 查询 =================
+
+    def percentiles(self) -> Dict[str, float]:
+        values = sorted(self._samples)
+        return {
+            "p50": round(_percentile(values, 0.5), 4),
+            "p90": round(_percentile(values, 0.9), 4),
+            "p99": round(_percentile(values, 0.99), 4),
+            "max": round(values[-1], 4) if values else 0.0,
+        }
+
+    def last_tick_age(self) -> Optional[float]:
+        """距采样协程上次醒来的秒数，正常情况下不超过 interval"""
+        if self._last_tick is None:
+            return None
+        return max(0.0, monotonic() - self._last_tick)
+
+    def stats(self, stall_limit: int = 5) -> Dict[str, Any]:
+        age = self.last_tick_age()
+        return {
+            **self.percentiles(),
+            "samples": len(self._samples),
+            "intervalSeconds": self.interval,
+            "lastTickAgeSeconds": None if age is None else round(age, 3),
+            "stallCount": self.stall_count,
+            "recentStalls": list(self._stalls)[-stall_limit:],
+        }
+
+
+# ================= 浏览器池 =================
+
+_browser_pools: "WeakSet[Any]" = WeakSet()
+
+
+def track_browser_pool(pool: Any) -> Any:
+    _browser_pools.add(pool)
+    return pool
+
+
+def browser_pool_stats() -> List[Dict[str, Any]]:
+    stats = list()
+    for pool in list(_browser_pools):
+        idle = pool._queue.qsize()
+        in_use = max(0, pool.size - idle) if pool._started else 0
+        stats.append({"size": pool.size, "started": pool._started, "idle": idle, "inUse": in_use})
+    return stats
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+# ---------------------------------------------------------------------------------------------------------
+# ProjectName:  cronjob-1717
+# FileName:     job_module_graph.py
+# Description:  jobs 包的内容哈希与模块依赖图
+# Author:       ASUS
+# CreateDate:   2026/10/18
+# Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
+# ---------------------------------------------------------------------------------------------------------
+"""
+import os
+import ast
+import hashlib
+import threading
+from logging import Logger, getLogger
+from typing import Dict, Iterable, List, Optional, Set
+
+"""
+热重载逻辑
+1. 记录 jobs 目录下每个模块文件内容的哈希，文件事件到来时重新计算，哈希没变（touch、编辑器临时保存）就不重新加载
+2. 静态解析每个模块的 import 语句，得到 jobs 包内的依赖关系，例如 fetch_flight_activity_order -> redis_utils -> config
+3. 某个模块变化时，它以及所有直接/间接依赖它的模块都要重新导入，并按依赖在前的拓扑顺序进行，
+   这样被依赖的 common、redis_utils 先换成新模块，job 模块重新导入时拿到的就是新的 Redis 客户端和工具函数
+4. 同时静态解析 register(executor) 中注册的 handler 名称，懒加载模式下不导入模块也能先向 admin 注册
+"""
+
+
+class JobModuleGraph:
+
+    def __init__(self, jobs_dir: str, package: str = "jobs", logger: Optional[Logger] = None):
+        self.jobs_dir = jobs_dir
+        self.package = package
+        self.logger = logger or getLogger(__name__)
+        self._lock = threading.Lock()
+        # 模块名（不带包名） -> 内容哈希
+        self.hashes: Dict[str, str] = dict()
+        # 模块名 -> 它导入的 jobs 包内模块
+        self.deps: Dict[str, Set[str]] = dict()
+        # 模块名 -> register(executor) 中注册的 handler 名称
+        self.handlers: Dict[str, List[str]] = dict()
+
+    # ================= 扫描 =================
+
+    def module_name(self, path: str) -> Optional[str]:
+        name = os.path.basename(path)
+        if not name.endswith(".py") or name == "__init__.py":
+            return None
+        return name[:-3]
+
+    def module_path(self, name: str) -> str:
+        return os.path.join(self.jobs_dir, f"{name}.py")
+
+    def list_modules(self) -> List[str]:
+        try:
+            names = os.listdir(self.jobs_dir)
+        except FileNotFoundError:
+            return list()
+        return sorted(x for x in (self.module_name(n) for n in names) if x)
+
+    def _parse_imports(self, name: str, tree: ast.Module) -> Set[str]:
+        """解析模块中对 jobs 包内其他模块的导入"""
+        prefix = self.package + "."
+        found = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                # import jobs.config as config
+                for alias in node.names:
+                    if alias.name.startswith(prefix):
+                        found.add(alias.name[len(prefix):].split(".")[0])
+            elif isinstance(node, ast.ImportFrom):
+                if node.level:
+                    # from .common import xxx / from . import common
+                    base = node.module
+                elif node.module == self.package:
+                    base = None
+                elif node.module and node.module.startswith(prefix):
+                    base = node.module[len(prefix):]
+                else:
+                    continue
+                if base:
+                    found.add(base.split(".")[0])
+                else:
+                    # from jobs import common, config
+                    found.update(alias.name for alias in node.names)
+        found.discard(name)
+        return found
+
+    @staticmethod
+    def _parse_handlers(tree: ast.Module) -> List[str]:
+        """
+        解析模块级 register(executor) 函数里注册的 handler 名称，不导入模块：
+            def register(executor):
+                @executor.register(name="fetch_flight_activity_order")
+                async def fetch_flight_activity_order(): ...
+        未指定 name 时与 pyxxl 一致，取被装饰函数的函数名
+        """
+        names = list()
+        for node in tree.body:
+            if not (isinstance(node, ast.FunctionDef) and node.name == "register"):
+                continue
+            for inner in ast.walk(node):
+                if not isinstance(inner, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    continue
+                for decorator in inner.decorator_list:
+                    func = decorator.func if isinstance(decorator, ast.Call) else decorator
+                    if not (isinstance(func, ast.Attribute) and func.attr == "register"):
+                        continue
+                    handler_name = inner.name
+                    if isinstance(decorator, ast.Call):
+                        for keyword in decorator.keywords:
+                            if keyword.arg == "name" and isinstance(keyword.value, ast.Constant):
+                                handler_name = keyword.value.value
+                    names.append(handler_name)
+        return names
+
+    def _update(self, name: str) -> bool:
+        """重新计算一个模块的哈希和依赖，返回内容是否发生了变化"""
+        try:
+            with open(self.module_path(name), mode="rb") as f:
+                source = f.read()
+        except FileNotFoundError:
+            return self.remove(name)
+        digest = hashlib.sha1(source).hexdigest()
+        if self.hashes.get(name) == digest:
+            return False
+        self.hashes[name] = digest
+        try:
+            tree = ast.parse(source, filename=self.module_path(name))
+            self.deps[name] = self._parse_imports(name, tree)
+            self.handlers[name] = self._parse_handlers(tree)
+        except SyntaxError as e:
+            # 语法错误时沿用旧的解析结果，导入时会报出具体错误
+            self.logger.warning(f"模块<{name}>静态解析失败：{e}")
+            self.deps.setdefault(name, set())
+            self.handlers.setdefault(name, list())
+        return True
+
+    def scan(self) -> List[str]:
+        """全量扫描 jobs 目录，返回内容有变化的模块"""
+        with self._lock:
+            names = self.list_modules()
+            for name in set(self.hashes) - set(names):
+                self.remove(name)
+            return [name for name in names if self._update(name)]
+
+    def refresh(self, paths: Iterable[str]) -> List[str]:
+        """文件事件到来时调用，只重新计算这些文件，返回内容确实变化了的模块"""
+        with self._lock:
+            changed = list()
+            for path in paths:
+                name = self.module_name(path)
+                if name and self._update(name):
+                    changed.append(name)
+            return changed
+
+    def remove(self, name: str) -> bool:
+        existed = self.hashes.pop(name, None) is not None
+        self.deps.pop(name, None)
+        self.handlers.pop(name, None)
+        return existed
+
+    # ================= 依赖 =================
+
+    def dependents(self, names: Iterable[str]) -> Set[str]:
+        """names 以及所有直接/间接依赖它们的模块"""
+        reverse: Dict[str, Set[str]] = dict()
+        for module, deps in self.deps.items():
+            for dep in deps:
+                reverse.setdefault(dep, set()).add(module)
+        affected, stack = set(), list(names)
+        while stack:
+            name = stack.pop()
+            if name in affected:
+                continue
+            affected.add(name)
+            stack.extend(reverse.get(name, ()))
+        return affected
+
+    def topo_order(self, names: Iterable[str]) -> List[str]:
+        """依赖在前的拓扑顺序；存在循环导入时，环内模块按名称顺序排在最后"""
+        pending = set(names)
+        order = list()
+        while pending:
+            ready = sorted(x for x in pending if not (self.deps.get(x, set()) & pending))
+            if not ready:
+                self.logger.warning(f"jobs 模块存在循环导入：{sorted(pending)}")
+                ready = sorted(pending)
+            order.extend(ready)
+            pending.difference_update(ready)
+        return order
+
+    def reload_plan(self, changed: Iterable[str]) -> List[str]:
+        """变化的模块需要按什么顺序重新导入"""
+        with self._lock:
+            affected = {x for x in self.dependents(changed) if x in self.hashes}
+            return self.topo_order(affected)
@@ -13,6 +13,7 @@ import platform
 import jobs.config as config
 from datetime import datetime
 from urllib.parse import quote
+from health import track_browser_pool
 from log_utils import get_screenshot_dir
 from typing import Literal, Optional, Dict
 from playwright_helper.middlewares.stealth import *
@@ -27,13 +28,14 @@ else:
 
 
 def get_browser_pool(logger: Logger) -> BrowserPool:
-    return BrowserPool(
+    # 登记到健康检查，池被回收后自动移除
+    return track_browser_pool(BrowserPool(
         size=2,
         logger=logger,
         headless=headless,
         args=CHROME_STEALTH_ARGS,
         ignore_default_args=IGNORE_ARGS,
-    )
+    ))
 
 
 def get_playwright_executor(
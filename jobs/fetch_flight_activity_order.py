@@ -9,22 +9,26 @@
 # Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
 # ---------------------------------------------------------------------------------------------------------
 """
-import json
 import asyncio
 from logging import Logger
+from time import perf_counter
 import jobs.config as config
-from aiohttp import CookieJar
+from jobs.params import get_job_params, FetchFlightActivityOrderParams
 from typing import Dict, Any, Optional
 from qlv_helper.controller.order_detail import get_order_info_with_http
 from qlv_helper.controller.order_table import get_domestic_activity_order_table
-from jobs.redis_utils import redis_client_0, activity_order_queue, order_state_queue, gen_qlv_login_state_key, \
-    gen_qlv_flight_order_key_prefix
+from jobs.login_state import qlv_login_state_cache
+from jobs.redis_utils import activity_order_queue, order_state_queue, order_cache
+from jobs.order_key import OrderKey, OrderKeyError
+from jobs.order_reconcile import OrderReconciler
 
 """
 抓取逻辑
 1. 获取劲旅平台登录状态数据，即cookie
 2. 拼装参数，调用二方包的api，获取劲旅平台订单
 3. 订单详情数据，放入redis，并将订单号放入redis活动订单队列
+4. 与 Redis 的对账由 OrderReconciler 批量完成：求差和移除已下架订单在 Redis 端一次完成，只有差集传回；
+   清除已下架订单的详情缓存、写入新订单详情并入队在一个 pipeline 中完成
 """
 
 
@@ -32,15 +36,15 @@ async def executor_fetch_flight_activity_order_task(
         *, logger: Logger, qlv_domain: str, qlv_protocol: str, qlv_user_id: str, timeout: float = 60.0, retry: int = 0,
         semaphore: int = 10
 ) -> Optional[str]:
-    playwright_state = await redis_client_0.get(key=gen_qlv_login_state_key(user_id=qlv_user_id))
-    if not playwright_state:
+    login_state = await qlv_login_state_cache.get(user_id=qlv_user_id)
+    if not login_state:
         raise RuntimeError("Redis中劲旅登录状态数据已过期")
     # -------------------------
     # 获取订单列表（非并发）
     # -------------------------
     table_response = await get_domestic_activity_order_table(
         domain=qlv_domain, protocol=qlv_protocol, retry=retry, timeout=int(timeout), enable_log=True,
-        cookie_jar=CookieJar(), playwright_state=playwright_state
+        cookie_jar=login_state.cookie_jar()
     )
     pagination_data = table_response.get("data") or dict()
     domestic_activity_orders = pagination_data.get("data")
@@ -59,88 +63,68 @@ async def executor_fetch_flight_activity_order_task(
                     try:
                         return await get_order_info_with_http(
                             order_id=order_id, timeout=int(timeout), domain=qlv_domain, protocol=qlv_protocol,
-                            enable_log=True, retry=retry, cookie_jar=CookieJar(), playwright_state=playwright_state
+                            enable_log=True, retry=retry, cookie_jar=login_state.cookie_jar()
                         )
                     except Exception as ex:
                         logger.error(f"获取订单：{order_id}详情失败：{ex}")
                         return dict(code=-1, message=str(ex), data=None)
 
-        activity_order_set = await activity_order_queue.get_all_pending()
-        order_state_set = await order_state_queue.get_all_pending()
-        is_not_fetch: Dict[int, Any] = dict()
+        started = perf_counter()
+        reconciler = OrderReconciler(
+            activity_queue=activity_order_queue, state_queue=order_state_queue, order_cache=order_cache
+        )
         domestic_activity_orders_dict: Dict[int, Any] = dict()
         fetch_order_dict: Dict[str, int] = dict()
         logger.info(f"当前国内活动订单列表中一共有<{len(domestic_activity_orders)}>条数据")
         for domestic_activity_order in domestic_activity_orders:
             order_id = domestic_activity_order.get("id")
             if order_id:
-                key = gen_qlv_flight_order_key_prefix(
-                    dep_city=domestic_activity_order.get("code_dep"), arr_city=domestic_activity_order.get("code_arr"),
-                    dep_date=domestic_activity_order.get("dat_dep"), extend=order_id,
-                    cabin=domestic_activity_order.get("cabin"), flight_no=domestic_activity_order.get("flight_no"),
-                )
+                try:
+                    key = OrderKey.from_order(domestic_activity_order).key
+                except OrderKeyError as e:
+                    logger.error(f"订单<{order_id}>无法生成缓存key，跳过：{e}")
+                    continue
                 fetch_order_dict[key] = order_id
-                if key not in activity_order_set:
-                    is_not_fetch[order_id] = key
                 domestic_activity_orders_dict[order_id] = domestic_activity_order
 
-        # 需要插入活动订单集合的订单
-        # need_insert = fetch_order_set.difference(activity_order_set)
-        # need_insert = set(is_not_fetch.values())
-        # 需要从活动订单集合删除的订单
-        need_delete_1 = activity_order_set.difference(set(fetch_order_dict.keys()))
-        need_delete_1_count = len(need_delete_1)
-        if need_delete_1_count > 0:
-            logger.info(f"有<{need_delete_1_count}>条数据需要从活动订单集合中删除")
-        flag = False
-        for key in need_delete_1:
-            if flag is False:
-                flag = True
-            await activity_order_queue.finish(task=key)
-            logger.info(f"活动订单集合中的元素：{key} 已经被移除集合")
-            order_id = fetch_order_dict.get(key)
-            if order_id:
-                cache_data = await redis_client_0.get(key)
-                if cache_data:
-                    await redis_client_0.expire(key=key, expire=1)
-                    logger.info(f"订单<{order_id}>，详情数据在Redis缓存中已被清除")
-        # 需要从状态订单集合删除的订单
-        need_delete_2 = order_state_set.difference(set(fetch_order_dict.keys()))
-        need_delete_2_count = len(need_delete_2)
-        if need_delete_2_count > 0:
-            logger.info(f"有<{need_delete_2_count}>条数据需要从状态订单集合中删除")
-        for key in need_delete_2:
-            if flag is False:
-                flag = True
-            await order_state_queue.finish(task=key)
-            logger.info(f"状态订单集合中的元素：{key} 已经被移除集合")
-            order_id = fetch_order_dict.get(key)
-            if order_id:
-                cache_data = await redis_client_0.get(key)
-                if cache_data:
-                    await redis_client_0.expire(key=key, expire=1)
-                    logger.info(f"订单<{order_id}>，详情数据在Redis缓存中已被清除")
+        # Redis 端求差：已从活动订单集合、状态订单集合删除的订单，以及活动订单集合中还没有、需要抓取详情的订单
+        need_delete_1, need_delete_2, need_insert = await reconciler.sync(fetch_order_dict.keys())
+        if need_delete_1:
+            logger.info(f"有<{len(need_delete_1)}>条数据已从活动订单集合中删除：{sorted(need_delete_1)}")
+        if need_delete_2:
+            logger.info(f"有<{len(need_delete_2)}>条数据已从状态订单集合中删除：{sorted(need_delete_2)}")
+        is_not_fetch: Dict[int, str] = {fetch_order_dict[key]: key for key in need_insert}
 
         # 创建任务
         tasks = [asyncio.create_task(fetch_detail(order_id=order_id)) for order_id in is_not_fetch.keys()]
         results = await asyncio.gather(*tasks, return_exceptions=True)
         for result in results:
             if isinstance(result, dict) and result.get("code") == 200 and "订单出票查看" in result.get("message"):
-                if flag is False:
-                    flag = True
                 order_data = result.get("data")
                 order_id = order_data.get("id")
                 key = is_not_fetch.get(order_id)
                 activity_order = domestic_activity_orders_dict.get(order_id)
+                if not key or not activity_order:
+                    logger.warning(f"订单<{order_id}>详情与活动订单列表对应不上，跳过")
+                    continue
                 remaining_time = activity_order.get("remaining_time")
                 activity_order.update(order_data)
-                await redis_client_0.set(key=key, value=activity_order, ex=remaining_time)
-                logger.info(f"订单<{order_id}>，详情数据已添加到Redis缓存")
-                await activity_order_queue.lpush_if_not_exists(task=key)  # 原本是 LPUSH 到 activity 队列
-                logger.info(f"订单<{order_id}>，已更新到活动订单集合中")
-                await order_state_queue.lpush_if_not_exists(task=key)  # 原本是 LPUSH 到 order 队列
-                logger.info(f"订单<{order_id}>，已更新到状态订单集合中")
-        if flag is True:
+                if remaining_time is not None:
+                    try:
+                        remaining_time = int(remaining_time)
+                    except (TypeError, ValueError):
+                        remaining_time = 0
+                    if remaining_time <= 0:
+                        logger.warning(f"订单<{order_id}>剩余时间<{activity_order.get('remaining_time')}>已到期，不再缓存")
+                        continue
+                reconciler.cache(key=key, value=activity_order, ex=remaining_time)
+                logger.info(f"订单<{order_id}>，详情数据待写入Redis缓存并加入活动订单、状态订单集合")
+
+        report = await reconciler.apply()
+        for error in report.errors:
+            logger.error(f"Redis对账命令执行失败：{error}")
+        logger.info(f"本轮对账{report.summary()}，总耗时<{(perf_counter() - started) * 1000:.1f}>ms")
+        if report.changed:
             msg: str = "任务执行成功"
             logger.info(msg)
             return msg
@@ -171,18 +155,13 @@ def register(executor):
     @executor.register(name="fetch_flight_activity_order")
     async def fetch_flight_activity_order():
         from pyxxl.ctx import g
-        executor_params = g.xxl_run_data.executorParams if isinstance(
-            g.xxl_run_data.executorParams, dict
-        ) else json.loads(g.xxl_run_data.executorParams)
+        executor_params = get_job_params(FetchFlightActivityOrderParams, g.xxl_run_data)
         g.logger.info(
             f"[fetch_flight_activity_order] running with executor params: %s" % executor_params)
         return await executor_fetch_flight_activity_order_task(
-            logger=g.logger, qlv_domain=executor_params.get("qlv_domain") or config.qlv_domain,
-            qlv_protocol=executor_params.get("qlv_protocol") or config.qlv_protocol,
-            semaphore=executor_params.get("semaphore") or config.semaphore,
-            retry=executor_params.get("retry") or config.retry,
-            timeout=executor_params.get("timeout") or config.timeout,
-            qlv_user_id=executor_params.get("qlv_user_id") or config.qlv_user_id
+            logger=g.logger, qlv_domain=executor_params.qlv_domain, qlv_protocol=executor_params.qlv_protocol,
+            semaphore=executor_params.semaphore, retry=executor_params.retry, timeout=executor_params.timeout,
+            qlv_user_id=executor_params.qlv_user_id
         )
 
 
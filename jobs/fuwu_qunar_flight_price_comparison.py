@@ -9,20 +9,24 @@
 # Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
 # ---------------------------------------------------------------------------------------------------------
 """
-import json
 import asyncio
 from logging import Logger
 import jobs.config as config
+from log_utils import bind_log_context
+from jobs.params import get_job_params, FuwuQunarFlightPriceComparisonParams
 from typing import Optional, Dict, Any
 from jobs.common import fetch_tts_agent_tool_total, get_fuwu_qunar_price_comparison_template, \
     send_message_to_dingdin_robot
-from jobs.redis_utils import redis_client_0, activity_order_queue, iso_to_standard_datestr, iso_to_standard_datetimestr
+from jobs.redis_utils import order_lease_reaper, order_cache, activity_order_queue, iso_to_standard_datestr, \
+    iso_to_standard_datetimestr
+from jobs.order_schedule import PRICE_HISTORY_FIELD, append_price, next_check_delay
 
 """
 比价逻辑
-1. 从redis队列尾部中取出即将要比价的订单key，从K,V存储中取出订单详情
+1. 从redis队列尾部中取出即将要比价的订单key，从K,V存储中取出订单详情（只读比价用到的热字段，不解压完整详情）
 2. 详情有值，调用去哪儿平台API比价；无值则扔掉key，直接结束任务
 3. 详情有值，订单key插入redis队列队首，无值则忽略此步骤
+4. 记录本次查到的最低价（最近几次的波动用于调度），放回队列时按出票时限、价格波动计算下一次比价时间（schedule 后端生效）
 """
 
 
@@ -30,12 +34,12 @@ async def executor_fuwu_qunar_flight_price_comparison_task(
         *, logger: Logger, qlv_domain: str, qlv_protocol: str, uuid: Optional[str], headers: Optional[Dict[str, Any]],
         timeout: int = 60, retry: int = 0, low_threshold: int = 0, high_threshold: int = 0, enable_log: bool = True
 ) -> Optional[str]:
-    # 1. 恢复processing队列中的任务
-    await activity_order_queue.recover()
+    # 1. 确保本进程的过期租约回收任务在运行（不再每次恢复整个processing队列）
+    order_lease_reaper.ensure_started()
     # 2. 从队尾取出（FIFO）
     key = await activity_order_queue.pop()
     if key:
-        cache_data = await redis_client_0.get(key)
+        cache_data = await order_cache.get_projection(key)
         if cache_data:
             order_id = cache_data.get("id")
             flights = cache_data.get("flights")
@@ -47,6 +51,7 @@ async def executor_fuwu_qunar_flight_price_comparison_task(
                 flight_no = flight.get("flight_no")
             else:
                 flight_no = cache_data.get("flight_no")
+            bind_log_context(order_id=order_id, flight_no=flight_no)
             price_std = people.get("price_std")
             price_sell = people.get("price_sell")
             city_dep = flight.get("city_dep").strip() if flight.get("city_dep") else ""
@@ -75,6 +80,14 @@ async def executor_fuwu_qunar_flight_price_comparison_task(
                     order_list = data.get("orderList") or list()
                     if order_list:
                         logger.info(f"已检索到航班{flight_no}数据")
+                        sell_prices = [
+                            x.get("sellPrice") for x in order_list
+                            if isinstance(x.get("sellPrice"), (int, float)) and x.get("sellPrice") > 0
+                        ]
+                        cache_data[PRICE_HISTORY_FIELD] = append_price(
+                            cache_data.get(PRICE_HISTORY_FIELD), min(sell_prices) if sell_prices else None
+                        )
+                        await order_cache.update_hot(key, {PRICE_HISTORY_FIELD: cache_data[PRICE_HISTORY_FIELD]})
                         url = f"https://flight.qunar.com/site/oneway_list.htm?searchDepartureAirport={code_dep}&searchArrivalAirport={code_arr}&searchDepartureTime={dep_date}&searchArrivalTime={dep_date}&nextNDays=0&startSearch=true&fromCode={city_dep}&toCode={city_arr}&from=flight_dom_search&lowestPrice=null"
                         # 排序（默认升序）,reverse=False, sellPrice 外放底价， sellFloorPrice 外放追价底价
                         low_sell_price_list = [x for x in order_list if price_sell > x.get("sellPrice") > 0]
@@ -134,15 +147,15 @@ async def executor_fuwu_qunar_flight_price_comparison_task(
                     else:
                         logger.warning(f"没有检索到航班{flight_no}数据")
                         min_price = "无"
-                    await activity_order_queue.requeue(task=key)
+                    await activity_order_queue.requeue(task=key, delay=next_check_delay(cache_data))
                     message = f"劲旅订单：{order_id}，航班：{flight_no}，乘客票面价：{price_std}，销售价：{price_sell}，航班实时最低价：{min_price}"
                     logger.info(message)
                     return message
                 else:
-                    await activity_order_queue.requeue(task=key)
+                    await activity_order_queue.requeue(task=key, delay=next_check_delay(cache_data))
                     logger.warning(f"没有检索到航班{flight_no}数据")
             else:
-                await activity_order_queue.requeue(task=key)
+                await activity_order_queue.requeue(task=key, delay=next_check_delay(cache_data))
                 raise RuntimeError(f"调用去哪儿fuwu的API响应异常，响应如：{str(response)}")
         else:
             await activity_order_queue.finish(task=key)
@@ -177,20 +190,14 @@ def register(executor):
     @executor.register(name="fuwu_qunar_flight_price_comparison")
     async def fuwu_qunar_flight_price_comparison():
         from pyxxl.ctx import g
-        executor_params = g.xxl_run_data.executorParams if isinstance(
-            g.xxl_run_data.executorParams, dict
-        ) else json.loads(g.xxl_run_data.executorParams)
+        executor_params = get_job_params(FuwuQunarFlightPriceComparisonParams, g.xxl_run_data)
         g.logger.info(
             "[fuwu_qunar_flight_price_comparison] running with executor params: %s" % executor_params)
         return await executor_fuwu_qunar_flight_price_comparison_task(
-            logger=g.logger, uuid=executor_params.get("uuid") or config.uuid,
-            headers=executor_params.get("headers") or config.headers,
-            low_threshold=executor_params.get("low_threshold") or config.low_threshold,
-            high_threshold=executor_params.get("high_threshold") or config.high_threshold,
-            timeout=executor_params.get("timeout") or config.timeout,
-            retry=executor_params.get("retry") or config.retry, enable_log=True,
-            qlv_protocol=executor_params.get("qlv_protocol") or config.qlv_protocol,
-            qlv_domain=executor_params.get("qlv_domain") or config.qlv_domain
+            logger=g.logger, uuid=executor_params.uuid, headers=executor_params.headers,
+            low_threshold=executor_params.low_threshold, high_threshold=executor_params.high_threshold,
+            timeout=executor_params.timeout, retry=executor_params.retry, enable_log=True,
+            qlv_protocol=executor_params.qlv_protocol, qlv_domain=executor_params.qlv_domain
         )
 
 
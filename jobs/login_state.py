@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+# ---------------------------------------------------------------------------------------------------------
+# ProjectName:  cronjob-1717
+# FileName:     login_state.py
+# Description:  劲旅登录状态的进程内缓存
+# Author:       ASUS
+# CreateDate:   2026/10/18
+# Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
+# ---------------------------------------------------------------------------------------------------------
+"""
+import os
+import json
+import asyncio
+from yarl import URL
+from aiohttp import CookieJar
+from logging import getLogger
+from time import monotonic
+from typing import Dict, Any, Optional, Tuple
+from jobs.redis_utils import redis_client_0, gen_qlv_login_state_key
+
+"""
+登录状态缓存逻辑
+1. 每个任务开始时都要读一次登录状态（Playwright storage_state，含全部 cookies 和 origins），
+   这里按用户缓存在进程内，LOGIN_STATE_CACHE_TTL 秒内不再读 Redis；缓存时间不超过 Redis 中 key 的剩余时间
+2. 失效通知：update_qlv_login_state 写入新状态后向 LOGIN_STATE_CHANNEL 发布用户 ID；
+   同时订阅登录状态 key 的 keyspace 通知（服务端开启 notify-keyspace-events 时生效，可感知过期、删除和其他途径的写入），
+   收到任一消息即丢弃该用户的缓存
+3. 订阅连接未建立或已断开时不使用缓存，每次都读 Redis（与原来一致），订阅恢复后清空缓存重新开始，
+   不会因为漏掉失效消息而一直用旧状态
+4. 缓存时预先把 cookies 按域名、路径分组并构造好 URL，cookie_jar() 直接填充一个新的 CookieJar，
+   任务不用再传 playwright_state 让 HTTP 客户端逐条解析；每次返回新的 CookieJar，
+   一个任务收到的 Set-Cookie 不会串到其他任务
+5. 缓存、订阅任务属于当前进程和事件循环：进程池子进程各有一份；事件循环变化时（本地调试多次 asyncio.run）重新订阅；
+   jobs 热重载卸载本模块前由 __pyxxl_cleanup__ 停止订阅任务
+"""
+
+LOGIN_STATE_CACHE_TTL = float(os.getenv("LOGIN_STATE_CACHE_TTL", "60"))
+LOGIN_STATE_CHANNEL = "login:state:web:qlv:invalidate"
+LOGIN_STATE_RESUBSCRIBE_INTERVAL = 5.0
+
+logger = getLogger(__name__)
+
+
+class LoginState:
+    __slots__ = ("user_id", "state", "expires_at", "_cookies")
+
+    def __init__(self, user_id: str, state: Dict[str, Any], expires_at: float):
+        self.user_id = user_id
+        self.state = state
+        self.expires_at = expires_at
+        self._cookies = self._group_cookies(state)
+
+    @staticmethod
+    def _group_cookies(state: Dict[str, Any]) -> Tuple[Tuple[URL, Dict[str, str]], ...]:
+        """与 HttpClientFactory._load_playwright_cookies_to_aiohttp 的处理一致，同一 URL 的 cookie 合并为一次写入"""
+        groups: Dict[str, Dict[str, str]] = dict()
+        for cookie in state.get("cookies") or list():
+            host = cookie["domain"].lstrip(".")
+            groups.setdefault(f"{host}{cookie.get('path', '/')}", dict())[cookie["name"]] = cookie["value"]
+        # cookie 按域名生效，协议不影响写入结果，统一用 https
+        return tuple((URL(f"https://{url}"), cookies) for url, cookies in groups.items())
+
+    def cookie_jar(self) -> CookieJar:
+        jar = CookieJar()
+        for url, cookies in self._cookies:
+            jar.update_cookies(cookies=cookies, response_url=url)
+        return jar
+
+
+class LoginStateCache:
+
+    def __init__(self, redis: Any, *, ttl: float = LOGIN_STATE_CACHE_TTL, channel: str = LOGIN_STATE_CHANNEL):
+        self.redis = redis
+        self.ttl = ttl
+        self.channel = channel
+        self._states: Dict[str, LoginState] = dict()
+        # 每次失效加一；读 Redis 期间收到失效消息时，读到的旧状态不放入缓存
+        self._generation = 0
+        self._subscribed = False
+        self._listener: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        db = redis.connection_pool.connection_kwargs.get("db", 0)
+        self._keyspace_prefix = f"__keyspace@{db}__:"
+        self._keyspace_pattern = f"{self._keyspace_prefix}{gen_qlv_login_state_key(user_id='')}*"
+
+    async def get(self, user_id: str) -> Optional[LoginState]:
+        """读取登录状态，Redis 中已过期返回 None"""
+        self._ensure_listener()
+        if self._subscribed and self.ttl > 0:
+            login_state = self._states.get(user_id)
+            if login_state is not None and login_state.expires_at > monotonic():
+                return login_state
+        generation = self._generation
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.get(gen_qlv_login_state_key(user_id=user_id))
+        pipe.ttl(gen_qlv_login_state_key(user_id=user_id))
+        value, ttl = await pipe.execute()
+        if not value:
+            self._states.pop(user_id, None)
+            return None
+        ttl = self.ttl if ttl < 0 else min(self.ttl, ttl)
+        # 与 AsyncRedisHelper.get 一致，值是 JSON 字符串
+        login_state = LoginState(user_id=user_id, state=json.loads(value), expires_at=monotonic() + ttl)
+        if self._subscribed and ttl > 0 and generation == self._generation:
+            self._states[user_id] = login_state
+        return login_state
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        self._generation += 1
+        if user_id is None:
+            self._states.clear()
+        else:
+            self._states.pop(user_id, None)
+
+    async def publish(self, user_id: str) -> None:
+        """登录状态写入 Redis 后调用，通知所有进程丢弃缓存"""
+        self.invalidate(user_id)
+        await self.redis.publish(self.channel, user_id)
+
+    def _ensure_listener(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._listener is not None and not self._listener.done() and self._loop is loop:
+            return
+        if self._loop is not loop:
+            self.invalidate()
+            self._subscribed = False
+        self._loop = loop
+        self._listener = loop.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                await pubsub.psubscribe(self._keyspace_pattern)
+                # 订阅成功前可能漏掉的消息无从得知，从空缓存开始
+                self.invalidate()
+                self._subscribed = True
+                async for message in pubsub.listen():
+                    self._on_message(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"登录状态失效通知订阅中断，{LOGIN_STATE_RESUBSCRIBE_INTERVAL}秒后重新订阅：{e}")
+            finally:
+                self._subscribed = False
+                self.invalidate()
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(LOGIN_STATE_RESUBSCRIBE_INTERVAL)
+
+    def _on_message(self, message: Dict[str, Any]) -> None:
+        if message.get("type") == "message":
+            self.invalidate(message.get("data") or None)
+        elif message.get("type") == "pmessage":
+            channel = message.get("channel") or ""
+            self.invalidate(channel[len(self._keyspace_prefix) + len(gen_qlv_login_state_key(user_id='')):])
+
+    def close(self) -> None:
+        """可在其他线程调用（热重载在 watchdog 线程中执行清理）"""
+        listener, self._listener = self._listener, None
+        if listener is not None and not listener.done() and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(listener.cancel)
+        self._subscribed = False
+        self.invalidate()
+
+
+qlv_login_state_cache = LoginStateCache(redis=redis_client_0.redis)
+
+
+def __pyxxl_cleanup__() -> None:
+    qlv_login_state_cache.close()
@@ -0,0 +1,354 @@
+# -*- coding: utf-8 -*-
+"""
+# ---------------------------------------------------------------------------------------------------------
+# ProjectName:  cronjob-1717
+# FileName:     order_cache.py
+# Description:  劲旅订单详情缓存的编解码与存储布局
+# Author:       ASUS
+# CreateDate:   2026/10/18
+# Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
+# ---------------------------------------------------------------------------------------------------------
+"""
+import os
+import json
+import zlib
+from logging import getLogger
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+"""
+订单缓存逻辑
+1. 值编解码器可插拔：每个编码后的值以 1 字节编解码器 ID 开头，解码时按 ID 选择编解码器，
+   切换 ORDER_CACHE_CODEC 后新旧数据可以共存；内置 json、json+zlib、msgpack、msgpack+zlib、msgpack+zstd，
+   msgpack、zstandard 未安装时对应编解码器不注册，自动退回下一个可用的
+2. 存储布局（ORDER_CACHE_LAYOUT=hash）：订单 key 是一个 Redis hash
+   - _v：布局版本号（ORDER_CACHE_SCHEMA_VERSION），读取时版本不认识直接报错
+   - 热字段：比价、状态任务要读的顶层字段各占一个 hash 字段，flights / peoples 只取第一项的部分字段，
+     存为 flights.0 / peoples.0，用不压缩的编解码器（值很小，压缩反而更大）
+   - _cold：去掉顶层热字段后的完整订单（含完整 flights / peoples），用 ORDER_CACHE_CODEC 压缩
+   - 只读热字段时 HMGET 一次拿到，不传输、不解压 _cold；读完整订单时热字段覆盖到 _cold 上
+   - 状态任务只改 stat_order / stat_opration 两个热字段，HSET 即可，不用读出再整体写回
+3. ORDER_CACHE_LAYOUT=json 时按原来的 JSON 字符串写入（回滚用）；读取总是先按配置的布局读，
+   遇到另一种类型（WRONGTYPE）再按另一种读，上线期间新旧两种 key 共存也能正常读写
+4. 二进制值必须用 decode_responses=False 的连接读取；写入可以放进任意连接的 pipeline
+5. _cold 一般有几百字节，超过 Redis 默认的 hash-max-listpack-value（64），hash 会转为 hashtable 编码，
+   每个字段多出几十字节的结构开销；服务端把 hash-max-listpack-value 调到 1024 可保持紧凑编码，
+   实际占用以 benchmarks/order_cache_benchmark.py 的 MEMORY USAGE 结果为准
+"""
+
+ORDER_CACHE_SCHEMA_VERSION = 1
+ORDER_CACHE_LAYOUT = os.getenv("ORDER_CACHE_LAYOUT", "hash").strip().lower()
+ORDER_CACHE_CODEC = os.getenv("ORDER_CACHE_CODEC", "msgpack+zstd").strip().lower()
+ORDER_CACHE_ZSTD_LEVEL = 3
+
+VERSION_FIELD = "_v"
+COLD_FIELD = "_cold"
+# 顶层热字段：比价任务、状态任务读取的订单表字段，以及比价任务记录的最低价历史（调度用）
+HOT_FIELDS = (
+    "id", "flight_no", "cabin", "dat_dep", "source_name", "last_time_ticket", "stat_order", "stat_opration",
+    "min_price_history"
+)
+# 第一段航程、第一个乘客中比价要用的字段
+HOT_LIST_FIELDS = {
+    "flights": ("flight_no", "cabin", "dat_dep", "code_dep", "code_arr", "city_dep", "city_arr"),
+    "peoples": ("price_std", "price_sell"),
+}
+HOT_LIST_HASH_FIELDS = tuple(f"{name}.0" for name in HOT_LIST_FIELDS)
+PROJECTION_FIELDS = (VERSION_FIELD, *HOT_FIELDS, *HOT_LIST_HASH_FIELDS)
+FULL_FIELDS = (VERSION_FIELD, COLD_FIELD, *HOT_FIELDS)
+
+logger = getLogger(__name__)
+
+
+class OrderCacheError(ValueError):
+    pass
+
+
+# KEYS: 订单 key；ARGV: 字段, 值, ...
+# key 是 hash 时写入热字段并返回 TTL，不存在返回 -2，是其它类型（JSON 字符串）返回 -3；
+# 判断和写入在同一个脚本里，key 不会在两者之间过期，留下只有热字段、没有 TTL 的残缺 hash
+UPDATE_HOT_SCRIPT = """
+local key_type = redis.call('TYPE', KEYS[1])['ok']
+if key_type == 'none' then
+    return -2
+end
+if key_type ~= 'hash' then
+    return -3
+end
+redis.call('HSET', KEYS[1], unpack(ARGV))
+return redis.call('TTL', KEYS[1])
+"""
+
+
+# ================= 编解码器 =================
+
+class ValueCodec:
+    __slots__ = ("codec_id", "name", "_dumps", "_loads", "_prefix")
+
+    def __init__(self, codec_id: int, name: str, dumps: Callable[[Any], bytes], loads: Callable[[bytes], Any]):
+        self.codec_id = codec_id
+        self.name = name
+        self._dumps = dumps
+        self._loads = loads
+        self._prefix = bytes((codec_id,))
+
+    def encode(self, value: Any) -> bytes:
+        return self._prefix + self._dumps(value)
+
+    def decode(self, data: bytes) -> Any:
+        # 热字段的值只有几十字节，切片复制比 memoryview 更快；_cold 的切片复制相对解压可以忽略
+        return self._loads(data[1:])
+
+    def __repr__(self) -> str:
+        return f"ValueCodec({self.codec_id}, {self.name!r})"
+
+
+_codecs_by_id: Dict[int, ValueCodec] = dict()
+_codecs_by_name: Dict[str, ValueCodec] = dict()
+
+
+def register_codec(
+        codec_id: int, name: str, dumps: Callable[[Any], bytes], loads: Callable[[bytes], Any]
+) -> ValueCodec:
+    """注册编解码器；ID 写在每个值的第一个字节，已经写入 Redis 的 ID 不能再改作他用"""
+    if not 0 < codec_id < 256:
+        raise ValueError(f"编解码器 ID 必须在 1~255 之间：{codec_id}")
+    existing = _codecs_by_id.get(codec_id)
+    if existing is not None and existing.name != name:
+        raise ValueError(f"编解码器 ID<{codec_id}>已被<{existing.name}>占用")
+    codec = ValueCodec(codec_id, name, dumps, loads)
+    _codecs_by_id[codec_id] = codec
+    _codecs_by_name[name] = codec
+    return codec
+
+
+def get_codec(name: str) -> ValueCodec:
+    codec = _codecs_by_name.get(name)
+    if codec is None:
+        raise OrderCacheError(f"未注册的编解码器：{name}，可用：{sorted(_codecs_by_name)}")
+    return codec
+
+
+def decode_value(data: bytes) -> Any:
+    if not data:
+        raise OrderCacheError("缓存值为空")
+    codec = _codecs_by_id.get(data[0])
+    if codec is None:
+        raise OrderCacheError(f"未知的编解码器 ID：{data[0]}")
+    return codec.decode(data)
+
+
+def _json_dumps(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+register_codec(1, "json", _json_dumps, json.loads)
+register_codec(2, "json+zlib", lambda v: zlib.compress(_json_dumps(v)), lambda d: json.loads(zlib.decompress(d)))
+
+if msgpack is not None:
+    # 订单来自 JSON 接口，字典的键都是字符串，unpackb 用默认参数即可（带关键字参数调用明显更慢）
+    register_codec(3, "msgpack", msgpack.packb, msgpack.unpackb)
+    register_codec(
+        4, "msgpack+zlib", lambda v: zlib.compress(msgpack.packb(v)), lambda d: msgpack.unpackb(zlib.decompress(d))
+    )
+    if zstandard is not None:
+        _zstd_compressor = zstandard.ZstdCompressor(level=ORDER_CACHE_ZSTD_LEVEL)
+        _zstd_decompressor = zstandard.ZstdDecompressor()
+        register_codec(
+            5, "msgpack+zstd", lambda v: _zstd_compressor.compress(msgpack.packb(v)),
+            lambda d: msgpack.unpackb(_zstd_decompressor.decompress(d))
+        )
+
+# 配置的编解码器不可用时依次退回
+_CODEC_FALLBACK = ("msgpack+zstd", "msgpack+zlib", "json+zlib")
+
+
+def _resolve_codec(name: str) -> ValueCodec:
+    if name in _codecs_by_name:
+        return _codecs_by_name[name]
+    for fallback in _CODEC_FALLBACK:
+        if fallback in _codecs_by_name:
+            logger.warning(f"订单缓存编解码器<{name}>不可用（未安装依赖或名称错误），改用<{fallback}>")
+            return _codecs_by_name[fallback]
+    return _codecs_by_name["json+zlib"]
+
+
+# ================= 布局 =================
+
+def _project_list(items: Any, fields: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+    if isinstance(items, list) and items and isinstance(items[0], dict):
+        first = items[0]
+        return {name: first[name] for name in fields if name in first}
+    return None
+
+
+def project_order(order: Dict[str, Any]) -> Dict[str, Any]:
+    """只保留热字段的订单，结构与完整订单一致（flights / peoples 只有第一项）"""
+    projection = {name: order[name] for name in HOT_FIELDS if name in order}
+    for name, fields in HOT_LIST_FIELDS.items():
+        first = _project_list(order.get(name), fields)
+        if first is not None:
+            projection[name] = [first]
+    return projection
+
+
+def is_wrongtype(error: Exception) -> bool:
+    return str(error).startswith("WRONGTYPE")
+
+
+class OrderCache:
+    """
+    redis：读取用的连接，必须是 decode_responses=False
+    layout：hash 或 json；codec：_cold 使用的编解码器名称
+    """
+
+    def __init__(self, redis: Any, *, layout: str = ORDER_CACHE_LAYOUT, codec: str = ORDER_CACHE_CODEC):
+        if layout not in ("hash", "json"):
+            raise OrderCacheError(f"不支持的订单缓存布局：{layout}")
+        self.redis = redis
+        self.layout = layout
+        self.codec = _resolve_codec(codec)
+        self.hot_codec = _codecs_by_name["msgpack"] if "msgpack" in _codecs_by_name else _codecs_by_name["json"]
+        self._version = str(ORDER_CACHE_SCHEMA_VERSION).encode()
+        # 只做编解码时（如基准测试）redis 可以为 None，首次 update_hot 时再注册脚本
+        self._update_hot_script = None
+
+    # ================= 编码 =================
+
+    def encode(self, order: Dict[str, Any]) -> Dict[str, bytes]:
+        """hash 布局下各字段的值"""
+        hot_encode = self.hot_codec.encode
+        mapping = {VERSION_FIELD: self._version}
+        cold = dict()
+        for name, value in order.items():
+            if name in HOT_FIELDS:
+                mapping[name] = hot_encode(value)
+            else:
+                cold[name] = value
+        for name, fields in HOT_LIST_FIELDS.items():
+            first = _project_list(order.get(name), fields)
+            if first is not None:
+                mapping[f"{name}.0"] = hot_encode(first)
+        mapping[COLD_FIELD] = self.codec.encode(cold)
+        return mapping
+
+    def stage_set(self, pipe: Any, key: str, order: Dict[str, Any], ex: Optional[int] = None) -> int:
+        """把写入命令加入 pipeline（可以是任意连接的），返回加入的命令数"""
+        if self.layout == "json":
+            pipe.set(key, json.dumps(order, ensure_ascii=False), ex=ex)
+            return 1
+        pipe.delete(key)
+        pipe.hset(key, mapping=self.encode(order))
+        if ex:
+            pipe.expire(key, ex)
+            return 3
+        return 2
+
+    async def set(self, key: str, order: Dict[str, Any], ex: Optional[int] = None) -> None:
+        pipe = self.redis.pipeline(transaction=True)
+        self.stage_set(pipe, key, order, ex=ex)
+        await pipe.execute()
+
+    # ================= 解码 =================
+
+    def _check_version(self, key: str, version: Optional[bytes]) -> None:
+        if version is not None and version != self._version:
+            raise OrderCacheError(f"订单缓存<{key}>布局版本<{version!r}>不受支持")
+
+    def decode_projection(self, key: str, values: List[Optional[bytes]]) -> Optional[Dict[str, Any]]:
+        if values[0] is None:
+            return None
+        self._check_version(key, values[0])
+        projection = dict()
+        for name, value in zip(PROJECTION_FIELDS[1:], values[1:]):
+            if value is not None:
+                if name in HOT_LIST_HASH_FIELDS:
+                    projection[name[:-2]] = [decode_value(value)]
+                else:
+                    projection[name] = decode_value(value)
+        return projection
+
+    def decode_full(self, key: str, values: List[Optional[bytes]]) -> Optional[Dict[str, Any]]:
+        if values[0] is None:
+            return None
+        self._check_version(key, values[0])
+        # 热字段更新后 _cold 中的同名字段已经过期，以热字段为准；_cold 缺失（写入过程中过期）时只返回热字段
+        order = decode_value(values[1]) if values[1] is not None else dict()
+        for name, value in zip(HOT_FIELDS, values[2:]):
+            if value is not None:
+                order[name] = decode_value(value)
+        return order
+
+    async def _get_json(self, key: str) -> Optional[Dict[str, Any]]:
+        data = await self.redis.get(key)
+        return json.loads(data) if data is not None else None
+
+    async def _hmget(self, key: str, fields: Tuple[str, ...]) -> List[Optional[bytes]]:
+        return await self.redis.hmget(key, fields)
+
+    async def get_projection(self, key: str) -> Optional[Dict[str, Any]]:
+        """只读热字段，key 不存在返回 None"""
+        try:
+            if self.layout == "json":
+                order = await self._get_json(key)
+                return project_order(order) if order is not None else None
+            return self.decode_projection(key, await self._hmget(key, PROJECTION_FIELDS))
+        except Exception as e:
+            if not is_wrongtype(e):
+                raise
+        if self.layout == "json":
+            return self.decode_projection(key, await self._hmget(key, PROJECTION_FIELDS))
+        order = await self._get_json(key)
+        return project_order(order) if order is not None else None
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取完整订单，key 不存在返回 None"""
+        try:
+            if self.layout == "json":
+                return await self._get_json(key)
+            return self.decode_full(key, await self._hmget(key, FULL_FIELDS))
+        except Exception as e:
+            if not is_wrongtype(e):
+                raise
+        if self.layout == "json":
+            return self.decode_full(key, await self._hmget(key, FULL_FIELDS))
+        return await self._get_json(key)
+
+    # ================= 更新 =================
+
+    async def update_hot(self, key: str, fields: Dict[str, Any]) -> int:
+        """
+        只更新顶层热字段，不改变过期时间，返回更新后的 TTL（与 TTL 命令一致：-1 无过期，-2 不存在）
+        hash 布局的 key 用 UPDATE_HOT_SCRIPT 原子地判断存在并写入；
+        原 JSON 字符串格式的 key 读出、合并后按当前布局整体写回（保留原 TTL）
+        """
+        unknown = set(fields) - set(HOT_FIELDS)
+        if unknown:
+            raise OrderCacheError(f"只能更新热字段，不支持：{sorted(unknown)}")
+        if self.layout == "hash":
+            hot_encode = self.hot_codec.encode
+            args = [x for name, value in fields.items() for x in (name, hot_encode(value))]
+            if self._update_hot_script is None:
+                self._update_hot_script = self.redis.register_script(UPDATE_HOT_SCRIPT)
+            ttl = await self._update_hot_script(keys=[key], args=args)
+            if ttl != -3:
+                return ttl
+        key_type = await self.redis.type(key)
+        if key_type in (b"none", "none"):
+            return -2
+        ttl = await self.redis.ttl(key)
+        order = await self.get(key)
+        if order is None:
+            return -2
+        order.update(fields)
+        await self.set(key, order, ex=ttl if ttl > 0 else None)
+        return ttl if ttl > 0 else -1
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+# ---------------------------------------------------------------------------------------------------------
+# ProjectName:  cronjob-1717
+# FileName:     order_key.py
+# Description:  劲旅订单缓存 key 的编解码
+# Author:       ASUS
+# CreateDate:   2026/10/18
+# Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
+# ---------------------------------------------------------------------------------------------------------
+"""
+import os
+import sys
+from functools import lru_cache
+from typing import Dict, Any, Iterable, List, Optional, Tuple, Union
+
+"""
+订单 key 编解码逻辑
+1. 格式：flight:order:qlv:[departureCityCode]:[arrivalCityCode]:[日期]:[flightNo]:[cabin]:[平台单号][:采购平台订单号...]
+   如：flight:order:qlv:CAN:WUS:2025-12-01T08/30/00:SC4674:S:153471，日期中的空格写作 T、冒号写作 /
+2. OrderKey 是不可变的 __slots__ 对象，构造时严格校验：各段必须非空且不含冒号，平台单号纯数字时转为 int，
+   不合法直接抛 OrderKeyError（ValueError 子类），不再吞掉异常返回空字典
+3. 城市、日期、航班号、舱位的取值重复度很高，统一 sys.intern，大量 OrderKey 共用同一份字符串；
+   编码结果在构造时算好并 intern，同一订单每次生成的 key 是同一个字符串对象
+4. 活动订单列表每轮抓取基本不变，按订单原始字段做 LRU 编码缓存；集合、队列里弹出的 key 做 LRU 解析缓存，
+   容量由 ORDER_KEY_CACHE_SIZE 决定
+5. encode_orders / decode_keys 批量处理订单列表和 key 列表，decode_keys 可选择跳过不合法的 key
+"""
+
+ORDER_KEY_PREFIX = "flight:order:qlv"
+ORDER_KEY_CACHE_SIZE = int(os.getenv("ORDER_KEY_CACHE_SIZE", "8192"))
+
+_PREFIX_LEN = ORDER_KEY_PREFIX.count(":") + 1
+_PREFIX_HEAD = ORDER_KEY_PREFIX + ":"
+_FIELDS = ("dep_city", "arr_city", "dep_date", "flight_no", "cabin", "extend")
+_FIELD_COUNT = _PREFIX_LEN + len(_FIELDS)
+_intern = sys.intern
+
+
+class OrderKeyError(ValueError):
+    pass
+
+
+def _invalid_fields(raw: Tuple[Any, ...]) -> OrderKeyError:
+    """只在校验失败时调用，找出具体是哪个字段不合法"""
+    for name, value in zip(_FIELDS, raw):
+        if value is None:
+            return OrderKeyError(f"订单 key 缺少字段<{name}>")
+        value = encode_key_date(value) if name == "dep_date" else str(value)
+        if not value:
+            return OrderKeyError(f"订单 key 字段<{name}>为空")
+        if ":" in value:
+            return OrderKeyError(f"订单 key 字段<{name}>不能包含冒号：{value}")
+    return OrderKeyError(f"订单 key 字段不合法：{raw}")
+
+
+def encode_key_date(dep_date: Any) -> str:
+    if not isinstance(dep_date, str):
+        dep_date = str(dep_date)
+    return dep_date.replace(" ", "T").replace(":", "/")
+
+
+def _decode_extend(extend: str) -> Union[int, str]:
+    return int(extend) if extend.isdigit() else extend
+
+
+class OrderKey:
+    __slots__ = ("dep_city", "arr_city", "dep_date", "flight_no", "cabin", "extend", "extend_plus", "key")
+
+    dep_city: str
+    arr_city: str
+    dep_date: str
+    flight_no: str
+    cabin: str
+    extend: Union[int, str]
+    extend_plus: Optional[str]
+    key: str
+
+    def __init__(
+            self, *, dep_city: str, arr_city: str, dep_date: str, flight_no: str, cabin: str,
+            extend: Union[int, str], extend_plus: Optional[str] = None
+    ):
+        """dep_date 为原始日期（2025-12-01 08:30:00），extend 为平台单号，extend_plus 为其后的全部内容"""
+        _encode(self, dep_city, arr_city, dep_date, flight_no, cabin, extend, extend_plus)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"OrderKey 不可修改：{name}")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"OrderKey 不可修改：{name}")
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, OrderKey) and self.key == other.key
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def __str__(self) -> str:
+        return self.key
+
+    def __repr__(self) -> str:
+        return f"OrderKey({self.key!r})"
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return OrderKey.decode, (self.key,)
+
+    def encode(self) -> str:
+        return self.key
+
+    @classmethod
+    def decode(cls, key: str) -> "OrderKey":
+        """解析 redis 中的订单 key，结果按 key 做 LRU 缓存"""
+        if not isinstance(key, str):
+            raise OrderKeyError(f"订单 key 必须是字符串：{key!r}")
+        return _decode(key)
+
+    @classmethod
+    def from_order(cls, order: Dict[str, Any]) -> "OrderKey":
+        """由劲旅国内活动订单列表中的一条订单构造"""
+        return _from_order_fields(
+            order.get("code_dep"), order.get("code_arr"), order.get("dat_dep"), order.get("flight_no"),
+            order.get("cabin"), order.get("id")
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """与原 qlv_flight_order_key_convert_dict 返回的字典结构一致"""
+        data = {
+            "dep_city": self.dep_city,
+            "arr_city": self.arr_city,
+            "dep_date": self.dep_date,
+            "flight_no": self.flight_no,
+            "cabin": self.cabin,
+            "extend": self.extend,
+        }
+        if self.extend_plus is not None:
+            data["extend+"] = self.extend_plus
+        return data
+
+
+_new = OrderKey.__new__
+_set_dep_city = OrderKey.dep_city.__set__
+_set_arr_city = OrderKey.arr_city.__set__
+_set_dep_date = OrderKey.dep_date.__set__
+_set_flight_no = OrderKey.flight_no.__set__
+_set_cabin = OrderKey.cabin.__set__
+_set_extend = OrderKey.extend.__set__
+_set_extend_plus = OrderKey.extend_plus.__set__
+_set_key = OrderKey.key.__set__
+
+
+def _fill(
+        order_key: OrderKey, dep_city: str, arr_city: str, key_date: str, flight_no: str, cabin: str,
+        extend: Union[int, str], extend_plus: Optional[str], key: str
+) -> OrderKey:
+    """key_date 为 key 中的日期段（2025-12-01T08/30/00）；OrderKey 禁用了 __setattr__，直接调用 slot 描述符赋值"""
+    _set_dep_city(order_key, _intern(dep_city))
+    _set_arr_city(order_key, _intern(arr_city))
+    _set_dep_date(order_key, _intern(key_date.replace("T", " ").replace("/", ":")))
+    _set_flight_no(order_key, _intern(flight_no))
+    _set_cabin(order_key, _intern(cabin))
+    _set_extend(order_key, extend)
+    _set_extend_plus(order_key, extend_plus)
+    _set_key(order_key, _intern(key))
+    return order_key
+
+
+def _encode(
+        order_key: OrderKey, dep_city: Any, arr_city: Any, dep_date: Any, flight_no: Any, cabin: Any, extend: Any,
+        extend_plus: Any = None
+) -> OrderKey:
+    raw = (dep_city, arr_city, dep_date, flight_no, cabin, extend)
+    if None in raw:
+        raise _invalid_fields(raw)
+    parts = [x if x.__class__ is str else str(x) for x in raw]
+    parts[2] = key_date = parts[2].replace(" ", "T").replace(":", "/")
+    key = ":".join((ORDER_KEY_PREFIX, *parts))
+    # 各段非空且不含冒号时，冒号数量恰好等于段数减一
+    if "" in parts or key.count(":") != _FIELD_COUNT - 1:
+        raise _invalid_fields(raw)
+    if extend_plus:
+        extend_plus = str(extend_plus)
+        key = f"{key}:{extend_plus}"
+    else:
+        extend_plus = None
+    return _fill(
+        order_key, parts[0], parts[1], key_date, parts[3], parts[4],
+        extend if extend.__class__ is int else _decode_extend(parts[5]), extend_plus, key
+    )
+
+
+@lru_cache(maxsize=ORDER_KEY_CACHE_SIZE)
+def _decode(key: str) -> OrderKey:
+    parts = key.split(":", _FIELD_COUNT)
+    if len(parts) < _FIELD_COUNT or "" in parts[_PREFIX_LEN:_FIELD_COUNT] or not key.startswith(_PREFIX_HEAD):
+        raise OrderKeyError(f"不是合法的订单 key：{key}")
+    extend = parts[_FIELD_COUNT - 1]
+    return _fill(
+        _new(OrderKey), *parts[_PREFIX_LEN:_FIELD_COUNT - 1], int(extend) if extend.isdigit() else extend,
+        parts[_FIELD_COUNT] if len(parts) > _FIELD_COUNT else None, key
+    )
+
+
+@lru_cache(maxsize=ORDER_KEY_CACHE_SIZE)
+def _from_order_fields(
+        dep_city: Any, arr_city: Any, dep_date: Any, flight_no: Any, cabin: Any, extend: Any
+) -> OrderKey:
+    return _encode(_new(OrderKey), dep_city, arr_city, dep_date, flight_no, cabin, extend)
+
+
+def encode_orders(orders: Iterable[Dict[str, Any]]) -> Dict[Any, str]:
+    """批量生成订单 key：{订单 id: key}，跳过没有 id 的订单，其余字段不合法时抛 OrderKeyError"""
+    keys = dict()
+    for order in orders:
+        order_id = order.get("id")
+        if order_id:
+            keys[order_id] = OrderKey.from_order(order).key
+    return keys
+
+
+def decode_keys(keys: Iterable[str], *, strict: bool = True) -> List[OrderKey]:
+    """批量解析订单 key；strict=False 时跳过不合法的 key"""
+    result = list()
+    for key in keys:
+        try:
+            result.append(OrderKey.decode(key))
+        except OrderKeyError:
+            if strict:
+                raise
+    return result
+
+
+def order_key_cache_info() -> Dict[str, Any]:
+    return {"decode": _decode.cache_info()._asdict(), "encode": _from_order_fields.cache_info()._asdict()}
@@ -0,0 +1,683 @@
+# -*- coding: utf-8 -*-
+"""
+# ---------------------------------------------------------------------------------------------------------
+# ProjectName:  cronjob-1717
+# FileName:     order_queue.py
+# Description:  订单队列接口与 Redis 集合、Redis Streams、有序集合三种实现，过期租约回收
+# Author:       ASUS
+# CreateDate:   2026/10/18
+# Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
+# ---------------------------------------------------------------------------------------------------------
+"""
+import os
+import time
+import socket
+import asyncio
+from logging import getLogger
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from redis_helper.set_helper import AsyncReliableQueue
+from jobs.order_schedule import ORDER_SCHEDULE_MAX_INTERVAL
+
+"""
+订单队列逻辑
+1. OrderQueue 是任务模块使用的接口：pop / pop_batch 取订单 key，处理完 finish（移出队列）或 requeue（放回队列，
+   delay 为距下一次检查的秒数，只有 schedule 后端使用）；
+   对账任务通过 member_sets（并集即队列中的全部订单 key）求差、移除，通过 stage_add 入队
+2. 租约：取出的订单带有 ORDER_QUEUE_IDLE_TIMEOUT 秒的租约，处理时间长的订单用 renew 续期；
+   租约过期（进程崩溃、任务被杀）的订单由 LeaseReaper 协程分批放回队列，其他副本正在处理、租约未过期的订单不受影响
+   - set、schedule 后端：lease 有序集合保存每个订单的租约到期时间（Redis 服务端时间），
+     取出时返回的到期时间作为凭据，requeue / renew 时核对，租约已被回收并由其他副本重新取出时不再放回、续期
+   - 对账从队列移除的订单，处理完 requeue 时不再放回
+   - recover 只为升级前取出、没有租约的订单补上租约（LeaseReaper 启动时执行一次），不再把整个 processing 放回
+3. SetOrderQueue（ORDER_QUEUE_BACKEND=set，默认）：原 AsyncReliableQueue，pending、processing 两个集合，加 lease 有序集合
+4. StreamOrderQueue（ORDER_QUEUE_BACKEND=stream）：
+   - members 集合保存队列中的全部订单 key（去重、对账），Stream 只负责投递，每个订单 key 同一时刻只有一条消息
+   - 消费组内每个进程是一个消费者，XREADGROUP 一次取 N 条；取到的消息进入该消费者的 PEL，
+     空闲超过 ORDER_QUEUE_IDLE_TIMEOUT 秒（按消息单独计时）仍未 ack 的，由下一次 pop 用 XAUTOCLAIM 接管，
+     其他副本正在处理的消息不会被抢走；PEL 中的空闲时间就是租约，renew 用 XCLAIM 重置空闲时间，reap 不需要做任何事
+   - finish：XACK + XDEL + 移出 members；requeue：XACK + XDEL 后重新 XADD 到队尾
+   - 对账从 members 中移除的订单 key，对应的消息在被取到时发现已不在 members 中，直接 ack 并删除
+   - 取消息、放回、入队都在 Lua 脚本中完成，一次往返
+5. ScheduledOrderQueue（ORDER_QUEUE_BACKEND=schedule）：按下一次检查时间排序的有序集合
+   - members 集合保存队列中的全部订单 key（去重、对账），schedule 有序集合的分数为下一次检查时间（Redis 服务端时间）
+   - 新入队的订单立即到期，按对账时算出的检查间隔排先后（越紧迫越先取）；
+     pop 取已到期的、最早到期的订单，移入 processing 有序集合；没有到期的订单时返回空
+   - requeue 按 delay（jobs.order_schedule.next_check_delay 计算）重新排入 schedule，从取出时的分数起算：
+     不积压时即 当前时间 + delay；任务跟不上时各订单的检查次数按 delay 的倒数分配，临近出票的订单仍优先；
+     租约过期回收的订单按 delay 为 0 排回
+   - 对账从 members 中移除的订单 key，在到期被取到时直接丢弃
+6. stats() 返回各状态的数量（pending 待投递、processing 处理中，schedule 另有 scheduled 未到期），
+   consumer_stats() 返回各消费者未 ack 的消息数（仅 Streams），/metrics 的 Redis 队列指标由此采集
+7. 切换后端时新旧队列使用不同的 key，fetch_flight_activity_order 下一轮对账会把活动订单全部写入新队列
+"""
+
+ORDER_QUEUE_BACKEND = os.getenv("ORDER_QUEUE_BACKEND", "set").strip().lower()
+ORDER_QUEUE_GROUP = os.getenv("ORDER_QUEUE_GROUP", "cronjob")
+ORDER_QUEUE_IDLE_TIMEOUT = float(os.getenv("ORDER_QUEUE_IDLE_TIMEOUT", "300"))
+ORDER_QUEUE_REAP_INTERVAL = float(os.getenv("ORDER_QUEUE_REAP_INTERVAL", "30"))
+ORDER_QUEUE_REAP_BATCH = 100
+
+logger = getLogger(__name__)
+
+
+class OrderQueue:
+    key: str
+    redis: Any
+    # 并集为队列中的全部订单 key；第一个集合是对账时检查哪些订单已不在列表中的集合
+    member_sets: Tuple[str, ...]
+    lease_timeout: float
+
+    async def recover(self) -> int:
+        """为没有租约的处理中订单补上租约，返回补上的数量"""
+        raise NotImplementedError
+
+    async def pop(self) -> Optional[str]:
+        tasks = await self.pop_batch(1)
+        return tasks[0] if tasks else None
+
+    async def pop_batch(self, count: int) -> List[str]:
+        raise NotImplementedError
+
+    async def finish(self, task: str) -> None:
+        raise NotImplementedError
+
+    async def requeue(self, task: str, delay: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    async def renew(self, task: str, lease: Optional[float] = None) -> bool:
+        """租约续期 lease 秒（默认 lease_timeout），租约已被回收时返回 False，此时不应再 finish / requeue"""
+        raise NotImplementedError
+
+    async def reap(self, count: int) -> Tuple[int, int]:
+        """回收最多 count 个过期租约，返回 (处理的过期租约数, 放回队列的订单数)"""
+        raise NotImplementedError
+
+    def stage_add(self, pipe: Any, tasks: Iterable[str], delays: Optional[Dict[str, float]] = None) -> None:
+        """
+        在 pipeline 中加入一条去重入队命令，命令结果为实际新增的数量
+        delays：订单 key → 按 next_check_delay 计算的检查间隔，只有 schedule 后端用来排列新入队订单的先后
+        """
+        raise NotImplementedError
+
+    async def add(self, tasks: Iterable[str], delays: Optional[Dict[str, float]] = None) -> int:
+        tasks = list(tasks)
+        if not tasks:
+            return 0
+        pipe = self.redis.pipeline(transaction=False)
+        self.stage_add(pipe, tasks, delays)
+        return (await pipe.execute())[0]
+
+    async def stats(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+    async def consumer_stats(self) -> Dict[str, int]:
+        return dict()
+
+
+# ================= 租约（set、schedule 后端共用） =================
+
+# KEYS: lease；ARGV: 租约秒数, 订单 key...
+# 只给还没有租约的订单补上（ZADD NX）
+LEASE_ADOPT_SCRIPT = """
+local time = redis.call('TIME')
+local expires = tonumber(time[1]) + tonumber(time[2]) / 1000000 + tonumber(ARGV[1])
+local adopted = 0
+for i = 2, #ARGV do
+    adopted = adopted + redis.call('ZADD', KEYS[1], 'NX', expires, ARGV[i])
+end
+return adopted
+"""
+
+# KEYS: lease；ARGV: 凭据, 租约秒数, 订单 key
+# 返回新的凭据，租约已被回收或已换人时返回 false
+LEASE_RENEW_SCRIPT = """
+if redis.call('ZSCORE', KEYS[1], ARGV[3]) ~= ARGV[1] then
+    return false
+end
+local time = redis.call('TIME')
+redis.call('ZADD', KEYS[1], tonumber(time[1]) + tonumber(time[2]) / 1000000 + tonumber(ARGV[2]), ARGV[3])
+return redis.call('ZSCORE', KEYS[1], ARGV[3])
+"""
+
+
+class _LeaseMixin:
+    """本进程取到的订单 key → 租约凭据（Redis 中保存的到期时间字符串）"""
+    redis: Any
+    key: str
+    leases: str
+    lease_timeout: float
+
+    def _init_leases(self) -> None:
+        self._lease_tokens: Dict[str, str] = dict()
+        self._adopt_script = self.redis.register_script(LEASE_ADOPT_SCRIPT)
+        self._renew_script = self.redis.register_script(LEASE_RENEW_SCRIPT)
+
+    def _take_tokens(self, result: List[Any]) -> List[str]:
+        """脚本返回 {订单 key, 凭据, ...}，记下凭据，返回订单 key"""
+        tasks = list()
+        for i in range(0, len(result), 2):
+            self._lease_tokens[result[i]] = result[i + 1]
+            tasks.append(result[i])
+        return tasks
+
+    async def _adopt(self, tasks: Iterable[Any]) -> int:
+        tasks = list(tasks)
+        if not tasks:
+            return 0
+        return await self._adopt_script(keys=[self.leases], args=[self.lease_timeout, *tasks])
+
+    async def renew(self, task: str, lease: Optional[float] = None) -> bool:
+        token = self._lease_tokens.get(task)
+        if token is None:
+            return False
+        token = await self._renew_script(
+            keys=[self.leases], args=[token, self.lease_timeout if lease is None else lease, task]
+        )
+        if not token:
+            self._lease_tokens.pop(task, None)
+            return False
+        self._lease_tokens[task] = token
+        return True
+
+
+# ================= Redis 集合 =================
+
+# KEYS: pending, processing, lease；ARGV: 数量, 租约秒数
+# 返回 {订单 key, 凭据, ...}
+SET_POP_BATCH_SCRIPT = """
+local time = redis.call('TIME')
+local expires = tonumber(time[1]) + tonumber(time[2]) / 1000000 + tonumber(ARGV[2])
+local result = {}
+for _, task in ipairs(redis.call('SPOP', KEYS[1], ARGV[1])) do
+    redis.call('SADD', KEYS[2], task)
+    redis.call('ZADD', KEYS[3], expires, task)
+    table.insert(result, task)
+    table.insert(result, redis.call('ZSCORE', KEYS[3], task))
+end
+return result
+"""
+
+# KEYS: pending, processing, lease；ARGV: 凭据, 订单 key
+# 租约已被回收并由其他副本重新取出时返回 -1；已被回收或已被对账移除时返回 0；放回返回 1
+SET_REQUEUE_SCRIPT = """
+local lease = redis.call('ZSCORE', KEYS[3], ARGV[2])
+if lease and lease ~= ARGV[1] then
+    return -1
+end
+redis.call('ZREM', KEYS[3], ARGV[2])
+if redis.call('SREM', KEYS[2], ARGV[2]) == 1 then
+    redis.call('SADD', KEYS[1], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+# KEYS: pending, processing, lease；ARGV: 数量
+SET_REAP_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local expired = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', now, 'LIMIT', 0, tonumber(ARGV[1]))
+local reclaimed = 0
+for _, task in ipairs(expired) do
+    redis.call('ZREM', KEYS[3], task)
+    if redis.call('SREM', KEYS[2], task) == 1 then
+        redis.call('SADD', KEYS[1], task)
+        reclaimed = reclaimed + 1
+    end
+end
+return {#expired, reclaimed}
+"""
+
+
+class SetOrderQueue(_LeaseMixin, AsyncReliableQueue, OrderQueue):
+
+    def __init__(
+            self, redis: Any, key: str, consumer_id: Optional[str] = None,
+            lease_timeout: float = ORDER_QUEUE_IDLE_TIMEOUT
+    ):
+        super().__init__(redis=redis, key=key, consumer_id=consumer_id)
+        self.lease_timeout = lease_timeout
+        self.leases = f"queue:lease:set:{key}:{consumer_id}" if consumer_id else f"queue:lease:set:{key}"
+        self.member_sets = (self.pending, self.processing)
+        self._keys = [self.pending, self.processing, self.leases]
+        self._pop_batch_script = self.redis.register_script(SET_POP_BATCH_SCRIPT)
+        self._requeue_script = self.redis.register_script(SET_REQUEUE_SCRIPT)
+        self._reap_script = self.redis.register_script(SET_REAP_SCRIPT)
+        self._init_leases()
+
+    async def recover(self) -> int:
+        return await self._adopt(await self.redis.smembers(self.processing))
+
+    async def pop(self) -> Optional[str]:
+        # AsyncReliableQueue.pop 不带租约
+        return await OrderQueue.pop(self)
+
+    async def pop_batch(self, count: int) -> List[str]:
+        return self._take_tokens(await self._pop_batch_script(keys=self._keys, args=[count, self.lease_timeout]))
+
+    async def finish(self, task: str) -> None:
+        self._lease_tokens.pop(task, None)
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.srem(self.pending, task)
+        pipe.srem(self.processing, task)
+        pipe.zrem(self.leases, task)
+        await pipe.execute()
+
+    async def requeue(self, task: str, delay: Optional[float] = None) -> None:
+        token = self._lease_tokens.pop(task, "")
+        if await self._requeue_script(keys=self._keys, args=[token, task]) < 0:
+            logger.warning(f"队列<{self.key}>中<{task}>的租约已过期并被重新取出，忽略 requeue")
+
+    async def reap(self, count: int) -> Tuple[int, int]:
+        expired, reclaimed = await self._reap_script(keys=self._keys, args=[count])
+        return expired, reclaimed
+
+    def stage_add(self, pipe: Any, tasks: Iterable[str], delays: Optional[Dict[str, float]] = None) -> None:
+        pipe.sadd(self.pending, *tasks)
+
+    async def stats(self) -> Dict[str, int]:
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.scard(self.pending)
+        pipe.scard(self.processing)
+        pending, processing = await pipe.execute()
+        return {"pending": pending, "processing": processing}
+
+
+# ================= Redis Streams =================
+
+# KEYS: members, stream；ARGV: 订单 key...
+STREAM_ADD_SCRIPT = """
+local added = 0
+for i = 1, #ARGV do
+    if redis.call('SADD', KEYS[1], ARGV[i]) == 1 then
+        redis.call('XADD', KEYS[2], '*', 't', ARGV[i])
+        added = added + 1
+    end
+end
+return added
+"""
+
+# KEYS: members, stream；ARGV: 消费组, 消费者, 接管空闲时间（毫秒）, 数量
+# 返回 {消息 ID, 订单 key, 消息 ID, 订单 key, ...}
+STREAM_POP_SCRIPT = """
+local count = tonumber(ARGV[4])
+local entries = redis.call('XAUTOCLAIM', KEYS[2], ARGV[1], ARGV[2], ARGV[3], '0-0', 'COUNT', count)[2]
+if #entries < count then
+    local read = redis.call('XREADGROUP', 'GROUP', ARGV[1], ARGV[2], 'COUNT', count - #entries, 'STREAMS', KEYS[2], '>')
+    -- Redis 返回 {{stream, 消息...}}（没有消息时为 nil），fakeredis 返回 {stream, 消息...}
+    if read then
+        read = type(read[1]) == 'table' and read[1][2] or read[2]
+    end
+    for _, entry in ipairs(read or {}) do
+        table.insert(entries, entry)
+    end
+end
+local result = {}
+for _, entry in ipairs(entries) do
+    -- 已被删除的消息 XAUTOCLAIM 返回 nil（Redis 6.2）
+    if entry and entry[2] then
+        local task = entry[2][2]
+        if redis.call('SISMEMBER', KEYS[1], task) == 1 then
+            table.insert(result, entry[1])
+            table.insert(result, task)
+        else
+            redis.call('XACK', KEYS[2], ARGV[1], entry[1])
+            redis.call('XDEL', KEYS[2], entry[1])
+        end
+    end
+end
+return result
+"""
+
+# KEYS: members, stream；ARGV: 消费组, 消息 ID, 订单 key, 消费者
+# 返回值与 SET_REQUEUE_SCRIPT 相同：消息已被其他消费者接管时返回 -1，已不在 PEL 中返回 0
+STREAM_REQUEUE_SCRIPT = """
+local pending = redis.call('XPENDING', KEYS[2], ARGV[1], ARGV[2], ARGV[2], 1)
+if #pending == 0 then
+    return 0
+end
+if pending[1][2] ~= ARGV[4] then
+    return -1
+end
+redis.call('XACK', KEYS[2], ARGV[1], ARGV[2])
+redis.call('XDEL', KEYS[2], ARGV[2])
+if redis.call('SISMEMBER', KEYS[1], ARGV[3]) == 1 then
+    redis.call('XADD', KEYS[2], '*', 't', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+# KEYS: stream；ARGV: 消费组, 消费者, 消息 ID
+# 消息仍在本消费者的 PEL 中时重置空闲时间，已被其他消费者接管时返回 0
+STREAM_RENEW_SCRIPT = """
+local pending = redis.call('XPENDING', KEYS[1], ARGV[1], ARGV[3], ARGV[3], 1)
+if #pending == 0 or pending[1][2] ~= ARGV[2] then
+    return 0
+end
+redis.call('XCLAIM', KEYS[1], ARGV[1], ARGV[2], 0, ARGV[3], 'JUSTID')
+return 1
+"""
+
+
+class StreamOrderQueue(OrderQueue):
+
+    def __init__(
+            self, redis: Any, key: str, *, group: str = ORDER_QUEUE_GROUP, consumer: Optional[str] = None,
+            idle_timeout: float = ORDER_QUEUE_IDLE_TIMEOUT
+    ):
+        self.key = key
+        self.redis = redis
+        self.group = group
+        self.consumer = consumer or f"{socket.gethostname()}:{os.getpid()}"
+        self.idle_timeout = self.lease_timeout = idle_timeout
+        self.members = f"queue:members:set:{key}"
+        self.stream = f"queue:stream:{key}"
+        self.member_sets = (self.members,)
+        # 本进程取到的订单 key -> 消息 ID，finish / requeue 时 ack
+        self._message_ids: Dict[str, str] = dict()
+        self._group_ready = False
+        self._pop_script = self.redis.register_script(STREAM_POP_SCRIPT)
+        self._requeue_script = self.redis.register_script(STREAM_REQUEUE_SCRIPT)
+        self._renew_script = self.redis.register_script(STREAM_RENEW_SCRIPT)
+
+    async def _ensure_group(self) -> None:
+        if self._group_ready:
+            return
+        try:
+            await self.redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    async def recover(self) -> int:
+        """PEL 中的消息本身带有空闲时间，不需要补租约"""
+        return 0
+
+    async def pop_batch(self, count: int) -> List[str]:
+        await self._ensure_group()
+        keys = [self.members, self.stream]
+        args = [self.group, self.consumer, int(self.idle_timeout * 1000), count]
+        try:
+            result = await self._pop_script(keys=keys, args=args)
+        except Exception as e:
+            # Stream 被删除后消费组随之消失，重新创建
+            if "NOGROUP" not in str(e):
+                raise
+            self._group_ready = False
+            await self._ensure_group()
+            result = await self._pop_script(keys=keys, args=args)
+        tasks = list()
+        for i in range(0, len(result), 2):
+            self._message_ids[result[i + 1]] = result[i]
+            tasks.append(result[i + 1])
+        return tasks
+
+    async def finish(self, task: str) -> None:
+        message_id = self._message_ids.pop(task, None)
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.srem(self.members, task)
+        if message_id is not None:
+            pipe.xack(self.stream, self.group, message_id)
+            pipe.xdel(self.stream, message_id)
+        await pipe.execute()
+
+    async def requeue(self, task: str, delay: Optional[float] = None) -> None:
+        message_id = self._message_ids.pop(task, None)
+        if message_id is None:
+            # 不是本进程取到的，消息仍在别处，不重复投递
+            logger.warning(f"队列<{self.key}>中的<{task}>不是当前消费者取出的，忽略 requeue")
+            return
+        args = [self.group, message_id, task, self.consumer]
+        if await self._requeue_script(keys=[self.members, self.stream], args=args) < 0:
+            logger.warning(f"队列<{self.key}>中<{task}>的消息已空闲超时并被其他消费者接管，忽略 requeue")
+
+    async def renew(self, task: str, lease: Optional[float] = None) -> bool:
+        """接管时间固定为 idle_timeout，续期即重置空闲时间，lease 不生效"""
+        message_id = self._message_ids.get(task)
+        if message_id is None:
+            return False
+        if not await self._renew_script(keys=[self.stream], args=[self.group, self.consumer, message_id]):
+            self._message_ids.pop(task, None)
+            return False
+        return True
+
+    async def reap(self, count: int) -> Tuple[int, int]:
+        """空闲超时的消息由 pop 接管"""
+        return 0, 0
+
+    def stage_add(self, pipe: Any, tasks: Iterable[str], delays: Optional[Dict[str, float]] = None) -> None:
+        pipe.eval(STREAM_ADD_SCRIPT, 2, self.members, self.stream, *tasks)
+
+    async def stats(self) -> Dict[str, int]:
+        await self._ensure_group()
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.xlen(self.stream)
+        pipe.xpending(self.stream, self.group)
+        length, pending = await pipe.execute()
+        return {"pending": length - pending["pending"], "processing": pending["pending"]}
+
+    async def consumer_stats(self) -> Dict[str, int]:
+        await self._ensure_group()
+        pending = await self.redis.xpending(self.stream, self.group)
+        return {x["name"]: int(x["pending"]) for x in pending["consumers"]}
+
+
+# ================= 按检查时间排序 =================
+
+# KEYS: members, schedule；ARGV: 订单 key, 相对当前时间的分数偏移（不大于 0）, ...
+SCHEDULE_ADD_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local added = 0
+for i = 1, #ARGV, 2 do
+    if redis.call('SADD', KEYS[1], ARGV[i]) == 1 then
+        redis.call('ZADD', KEYS[2], 'NX', now + tonumber(ARGV[i + 1]), ARGV[i])
+        added = added + 1
+    end
+end
+return added
+"""
+
+# KEYS: members, schedule, processing, lease；ARGV: 数量, 租约秒数
+# processing 是有序集合，保留取出时的分数，放回时从该分数起算；返回 {订单 key, 凭据, ...}
+SCHEDULE_POP_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local result = {}
+local due = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now, 'WITHSCORES', 'LIMIT', 0, tonumber(ARGV[1]))
+for i = 1, #due, 2 do
+    redis.call('ZREM', KEYS[2], due[i])
+    if redis.call('SISMEMBER', KEYS[1], due[i]) == 1 then
+        redis.call('ZADD', KEYS[3], due[i + 1], due[i])
+        redis.call('ZADD', KEYS[4], now + tonumber(ARGV[2]), due[i])
+        table.insert(result, due[i])
+        table.insert(result, redis.call('ZSCORE', KEYS[4], due[i]))
+    end
+end
+return result
+"""
+
+# KEYS: members, schedule, processing, lease；ARGV: 延迟秒数, 最长间隔, 凭据, 订单 key
+# 下一次检查时间 = max(取出时的分数, 当前时间 - min(延迟, 最长间隔)) + 延迟：不积压时约等于 当前时间 + 延迟；
+# 积压时各订单从各自的分数起算，检查次数按间隔的倒数分配，不会退化成轮流检查；
+# 起算点最多落后当前时间一个间隔，新入队订单为排序提前的分数不会让它连续多次立即到期
+# 返回值与 SET_REQUEUE_SCRIPT 相同
+SCHEDULE_REQUEUE_SCRIPT = """
+local lease = redis.call('ZSCORE', KEYS[4], ARGV[4])
+if lease and lease ~= ARGV[3] then
+    return -1
+end
+redis.call('ZREM', KEYS[4], ARGV[4])
+local score = redis.call('ZSCORE', KEYS[3], ARGV[4])
+if not score then
+    return 0
+end
+redis.call('ZREM', KEYS[3], ARGV[4])
+if redis.call('SISMEMBER', KEYS[1], ARGV[4]) == 0 then
+    return 0
+end
+local time = redis.call('TIME')
+local floor = tonumber(time[1]) + tonumber(time[2]) / 1000000 - math.min(tonumber(ARGV[1]), tonumber(ARGV[2]))
+redis.call('ZADD', KEYS[2], math.max(tonumber(score), floor) + tonumber(ARGV[1]), ARGV[4])
+return 1
+"""
+
+# KEYS: members, schedule, processing, lease；ARGV: 最长间隔, 数量
+SCHEDULE_REAP_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local floor = now - tonumber(ARGV[1])
+local expired = redis.call('ZRANGEBYSCORE', KEYS[4], '-inf', now, 'LIMIT', 0, tonumber(ARGV[2]))
+local reclaimed = 0
+for _, task in ipairs(expired) do
+    redis.call('ZREM', KEYS[4], task)
+    local score = redis.call('ZSCORE', KEYS[3], task)
+    if score then
+        redis.call('ZREM', KEYS[3], task)
+        if redis.call('SISMEMBER', KEYS[1], task) == 1 then
+            redis.call('ZADD', KEYS[2], math.max(tonumber(score), floor), task)
+            reclaimed = reclaimed + 1
+        end
+    end
+end
+return {#expired, reclaimed}
+"""
+
+
+class ScheduledOrderQueue(_LeaseMixin, OrderQueue):
+
+    def __init__(self, redis: Any, key: str, lease_timeout: float = ORDER_QUEUE_IDLE_TIMEOUT):
+        self.key = key
+        self.redis = redis
+        self.lease_timeout = lease_timeout
+        self.members = f"queue:schedule:members:{key}"
+        self.schedule = f"queue:schedule:zset:{key}"
+        self.processing = f"queue:schedule:processing:{key}"
+        self.leases = f"queue:schedule:lease:{key}"
+        self.member_sets = (self.members,)
+        self._keys = [self.members, self.schedule, self.processing, self.leases]
+        self._pop_script = self.redis.register_script(SCHEDULE_POP_SCRIPT)
+        self._requeue_script = self.redis.register_script(SCHEDULE_REQUEUE_SCRIPT)
+        self._reap_script = self.redis.register_script(SCHEDULE_REAP_SCRIPT)
+        self._init_leases()
+
+    async def recover(self) -> int:
+        return await self._adopt(await self.redis.zrange(self.processing, 0, -1))
+
+    async def pop_batch(self, count: int) -> List[str]:
+        return self._take_tokens(await self._pop_script(keys=self._keys, args=[count, self.lease_timeout]))
+
+    async def finish(self, task: str) -> None:
+        self._lease_tokens.pop(task, None)
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.srem(self.members, task)
+        pipe.zrem(self.schedule, task)
+        pipe.zrem(self.processing, task)
+        pipe.zrem(self.leases, task)
+        await pipe.execute()
+
+    async def requeue(self, task: str, delay: Optional[float] = None) -> None:
+        token = self._lease_tokens.pop(task, "")
+        args = [max(delay or 0, 0), ORDER_SCHEDULE_MAX_INTERVAL, token, task]
+        if await self._requeue_script(keys=self._keys, args=args) < 0:
+            logger.warning(f"队列<{self.key}>中<{task}>的租约已过期并被重新取出，忽略 requeue")
+
+    async def reap(self, count: int) -> Tuple[int, int]:
+        expired, reclaimed = await self._reap_script(keys=self._keys, args=[ORDER_SCHEDULE_MAX_INTERVAL, count])
+        return expired, reclaimed
+
+    def stage_add(self, pipe: Any, tasks: Iterable[str], delays: Optional[Dict[str, float]] = None) -> None:
+        """
+        新入队的订单都立即到期，分数为 当前时间 - (最长间隔 - 检查间隔)，积压时越紧迫的订单越先取到；
+        提前的分数只影响首次取出的先后，放回时起算点最多落后一个检查间隔
+        """
+        delays = delays or dict()
+        args = list()
+        for task in tasks:
+            delay = delays.get(task, ORDER_SCHEDULE_MAX_INTERVAL)
+            args.extend((task, min(delay - ORDER_SCHEDULE_MAX_INTERVAL, 0)))
+        pipe.eval(SCHEDULE_ADD_SCRIPT, 2, self.members, self.schedule, *args)
+
+    async def stats(self) -> Dict[str, int]:
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zcount(self.schedule, "-inf", time.time())
+        pipe.zcard(self.schedule)
+        pipe.zcard(self.processing)
+        due, scheduled, processing = await pipe.execute()
+        return {"pending": due, "scheduled": scheduled - due, "processing": processing}
+
+
+def create_order_queue(redis: Any, key: str, backend: str = ORDER_QUEUE_BACKEND) -> OrderQueue:
+    if backend == "stream":
+        return StreamOrderQueue(redis=redis, key=key)
+    if backend == "schedule":
+        return ScheduledOrderQueue(redis=redis, key=key)
+    if backend != "set":
+        logger.warning(f"不支持的订单队列后端<{backend}>，使用 set")
+    return SetOrderQueue(redis=redis, key=key)
+
+
+# ================= 过期租约回收 =================
+
+class LeaseReaper:
+    """
+    每隔 interval 秒回收各队列中租约已过期的订单，每批 batch 个，直到没有过期租约
+    回收任务属于当前进程和事件循环，由任务执行时 ensure_started() 拉起，事件循环变化时重新创建；
+    多个进程、副本同时回收是安全的（回收在 Lua 脚本中原子完成）
+    """
+
+    def __init__(
+            self, queues: Iterable[OrderQueue], *, interval: float = ORDER_QUEUE_REAP_INTERVAL,
+            batch: int = ORDER_QUEUE_REAP_BATCH
+    ):
+        self.queues = tuple(queues)
+        self.interval = interval
+        self.batch = batch
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        self._loop = loop
+        self._task = loop.create_task(self._run())
+
+    async def reap_once(self) -> int:
+        """回收一轮，返回放回队列的订单数"""
+        reclaimed = 0
+        for queue in self.queues:
+            while True:
+                expired, count = await queue.reap(self.batch)
+                reclaimed += count
+                if expired < self.batch:
+                    break
+        return reclaimed
+
+    async def _run(self) -> None:
+        adopted = False
+        while True:
+            try:
+                if not adopted:
+                    # 升级前取出的订单没有租约，补上后按正常流程过期回收
+                    for queue in self.queues:
+                        count = await queue.recover()
+                        if count:
+                            logger.info(f"队列<{queue.key}>中<{count}>个处理中的订单没有租约，已补上")
+                    adopted = True
+                reclaimed = await self.reap_once()
+                if reclaimed:
+                    logger.warning(f"已将<{reclaimed}>个租约过期的订单放回队列")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"回收过期租约失败，{self.interval}秒后重试：{e}")
+            await asyncio.sleep(self.interval)
+
+    def close(self) -> None:
+        """可在其他线程调用（热重载在 watchdog 线程中执行清理）"""
+        task, self._task = self._task, None
+        if task is not None and not task.done() and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(task.cancel)
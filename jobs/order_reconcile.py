@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+# ---------------------------------------------------------------------------------------------------------
+# ProjectName:  cronjob-1717
+# FileName:     order_reconcile.py
+# Description:  活动订单与 Redis 队列的批量对账
+# Author:       ASUS
+# CreateDate:   2026/10/18
+# Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
+# ---------------------------------------------------------------------------------------------------------
+"""
+from uuid import uuid4
+from time import perf_counter
+from dataclasses import dataclass, field
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
+from jobs.order_cache import OrderCache
+from jobs.order_queue import OrderQueue
+from jobs.order_schedule import next_check_delay
+
+"""
+对账逻辑
+1. sync()：本轮抓到的订单 key 交给 Lua 脚本，在 Redis 端完成求差和移除，只有差集回到本地：
+   - 订单 key 写入临时集合（带过期时间，脚本异常中断也不会残留），SDIFF 得到两个队列第一个成员集合
+     （集合队列的 pending、Streams 队列的 members）中已不在列表里的 key，以及活动订单队列全部成员集合中都还没有的 key
+   - 已不在列表里的 key 从对应队列的全部成员集合中移除（与 finish 一致），求差与移除在同一个脚本里原子完成
+   - 不再把两个队列的 pending 集合整个读回本地，传输量从队列大小降为变动量
+2. 写入只在本地暂存：
+   - 已移除 key 的详情缓存 EXPIRE 1 秒（详情 key 不在脚本的 KEYS 中声明，放在 pipeline 里执行）
+   - cache：详情缓存按 OrderCache 的布局写入，key 通过 OrderQueue.stage_add 去重加入两个队列
+     （附带按出票时限计算的检查间隔，schedule 后端据此排列新订单的先后）
+3. apply()：所有暂存的命令在一个 pipeline（非事务）中发出，一次往返；单条命令失败不影响其他命令，计入 errors
+4. 每轮对账记录 Redis 往返次数、Redis 耗时、收到的集合成员数，以及按原写法估算的往返次数和成员数，便于对比
+"""
+
+RECONCILE_TMP_TTL = 60
+RECONCILE_CHUNK = 1000
+
+# KEYS: 临时集合, 活动订单队列成员集合..., 状态订单队列成员集合...
+# ARGV: 临时集合过期秒数, 分批大小, 活动订单队列成员集合数, 状态订单队列成员集合数, 本轮订单 key...
+RECONCILE_SCRIPT = """
+local tmp = KEYS[1]
+local chunk = tonumber(ARGV[2])
+local activity_sets = {unpack(KEYS, 2, 1 + tonumber(ARGV[3]))}
+local state_sets = {unpack(KEYS, 2 + tonumber(ARGV[3]), 1 + tonumber(ARGV[3]) + tonumber(ARGV[4]))}
+redis.call('DEL', tmp)
+for i = 5, #ARGV, chunk do
+    redis.call('SADD', tmp, unpack(ARGV, i, math.min(i + chunk - 1, #ARGV)))
+end
+redis.call('EXPIRE', tmp, ARGV[1])
+local removed_activity = redis.call('SDIFF', activity_sets[1], tmp)
+local removed_state = redis.call('SDIFF', state_sets[1], tmp)
+local missing = redis.call('SDIFF', tmp, unpack(activity_sets))
+local sizes = {redis.call('SCARD', activity_sets[1]), redis.call('SCARD', state_sets[1])}
+local counts = {0, 0}
+for n, removed in ipairs({removed_activity, removed_state}) do
+    local sets = ({activity_sets, state_sets})[n]
+    for i = 1, #removed, chunk do
+        local part = {unpack(removed, i, math.min(i + chunk - 1, #removed))}
+        counts[n] = counts[n] + redis.call('SREM', sets[1], unpack(part))
+        for j = 2, #sets do
+            redis.call('SREM', sets[j], unpack(part))
+        end
+    end
+end
+redis.call('DEL', tmp)
+return {removed_activity, removed_state, missing, counts, sizes}
+"""
+
+
+@dataclass(slots=True)
+class ReconcileReport:
+    removed_activity: int = 0
+    removed_state: int = 0
+    expired: int = 0
+    cached: int = 0
+    inserted_activity: int = 0
+    inserted_state: int = 0
+    errors: List[str] = field(default_factory=list)
+    round_trips: int = 0
+    legacy_round_trips: int = 0
+    received_members: int = 0
+    legacy_received_members: int = 0
+    redis_seconds: float = 0.0
+
+    @property
+    def changed(self) -> bool:
+        return bool(
+            self.removed_activity or self.removed_state or self.expired or self.cached or self.inserted_activity
+            or self.inserted_state
+        )
+
+    def summary(self) -> str:
+        return (
+            f"移除活动订单<{self.removed_activity}>条、状态订单<{self.removed_state}>条，清除详情缓存<{self.expired}>条，"
+            f"写入详情缓存<{self.cached}>条，新增活动订单<{self.inserted_activity}>条、状态订单<{self.inserted_state}>条；"
+            f"Redis 往返<{self.round_trips}>次（逐条写法约<{self.legacy_round_trips}>次），"
+            f"读回集合成员<{self.received_members}>个（整个读取 pending 集合为<{self.legacy_received_members}>个），"
+            f"Redis 耗时<{self.redis_seconds * 1000:.1f}>ms"
+        )
+
+
+class OrderReconciler:
+
+    def __init__(self, activity_queue: OrderQueue, state_queue: OrderQueue, order_cache: OrderCache):
+        self.activity_queue = activity_queue
+        self.state_queue = state_queue
+        self.order_cache = order_cache
+        self.redis = activity_queue.redis
+        self.report = ReconcileReport()
+        self._expire: Set[str] = set()
+        self._cache: Dict[str, Tuple[Dict[str, Any], Optional[int]]] = dict()
+        self._script = self.redis.register_script(RECONCILE_SCRIPT)
+
+    async def sync(self, fetched_keys: Iterable[str]) -> Tuple[List[str], List[str], List[str]]:
+        """
+        返回 (已从活动订单集合移除的 key, 已从状态订单集合移除的 key, 需要抓取详情的 key)
+        正在比价（processing 中）的订单已有详情缓存，不重复抓取，避免覆盖状态任务更新过的详情
+        """
+        tmp = f"{self.activity_queue.key}:reconcile:{uuid4().hex}"
+        activity_sets, state_sets = self.activity_queue.member_sets, self.state_queue.member_sets
+        keys = [tmp, *activity_sets, *state_sets]
+        start = perf_counter()
+        try:
+            removed_activity, removed_state, missing, counts, sizes = await self._script(
+                keys=keys,
+                args=[RECONCILE_TMP_TTL, RECONCILE_CHUNK, len(activity_sets), len(state_sets), *set(fetched_keys)]
+            )
+        finally:
+            self.report.round_trips += 1
+            self.report.redis_seconds += perf_counter() - start
+        report = self.report
+        report.removed_activity += counts[0]
+        report.removed_state += counts[1]
+        report.received_members += len(removed_activity) + len(removed_state) + len(missing)
+        # 原写法：两次 SMEMBERS 读回全部 pending，每个移除的 key 一次 finish 和一次 GET
+        report.legacy_received_members += sizes[0] + sizes[1]
+        report.legacy_round_trips += 2 + 2 * (len(removed_activity) + len(removed_state))
+        self._expire.update(removed_activity)
+        self._expire.update(removed_state)
+        return removed_activity, removed_state, missing
+
+    def cache(self, key: str, value: Dict[str, Any], ex: Optional[int] = None) -> None:
+        self._cache[key] = (value, ex)
+
+    async def apply(self) -> ReconcileReport:
+        """一个 pipeline 发出本轮暂存的全部过期、缓存写入和入队"""
+        report = self.report
+        if not self._expire and not self._cache:
+            return report
+        pipe = self.redis.pipeline(transaction=False)
+        # 每条命令对应 (统计项, 详情 key)；写一条详情缓存有多条命令，全部成功才计数
+        steps: List[Tuple[str, Optional[str]]] = list()
+        for key in self._expire:
+            pipe.expire(key, 1)
+            steps.append(("expired", None))
+        if self._cache:
+            for key, (value, ex) in self._cache.items():
+                steps.extend([("cached", key)] * self.order_cache.stage_set(pipe, key, value, ex=ex))
+            delays = {key: next_check_delay(value, jitter=False) for key, (value, _) in self._cache.items()}
+            self.activity_queue.stage_add(pipe, self._cache, delays)
+            self.state_queue.stage_add(pipe, self._cache, delays)
+            steps.extend((("inserted_activity", None), ("inserted_state", None)))
+        results = await self._execute(pipe, raise_on_error=False)
+        cached, failed = set(), set()
+        for (step, key), result in zip(steps, results):
+            if isinstance(result, Exception):
+                report.errors.append(str(result))
+                if key is not None:
+                    failed.add(key)
+            elif key is not None:
+                cached.add(key)
+            else:
+                # 入队命令返回实际新增数，EXPIRE 返回 True
+                setattr(report, step, getattr(report, step) + int(result))
+        report.cached += len(cached - failed)
+        # 原写法：每个写入的订单一次 SET 和两次 lpush_if_not_exists（EXPIRE 因取不到订单号从未执行）
+        report.legacy_round_trips += 3 * len(self._cache)
+        self._expire.clear()
+        self._cache.clear()
+        return report
+
+    async def _execute(self, pipe: Any, raise_on_error: bool = True) -> List[Any]:
+        start = perf_counter()
+        try:
+            return await pipe.execute(raise_on_error=raise_on_error)
+        finally:
+            self.report.round_trips += 1
+            self.report.redis_seconds += perf_counter() - start
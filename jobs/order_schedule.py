@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+# ---------------------------------------------------------------------------------------------------------
+# ProjectName:  cronjob-1717
+# FileName:     order_schedule.py
+# Description:  订单下一次比价、状态检查时间的计算
+# Author:       ASUS
+# CreateDate:   2026/10/18
+# Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
+# ---------------------------------------------------------------------------------------------------------
+"""
+import os
+import random
+from datetime import datetime
+from typing import Dict, Any, Iterable, List, Optional
+import jobs.config as config
+
+"""
+调度逻辑（ORDER_QUEUE_BACKEND=schedule 时生效，其他后端忽略 requeue 的 delay）
+1. 紧迫度：取最晚出票时间 last_time_ticket、起飞时间 dat_dep 中最早的一个未来时间，
+   检查间隔 = 剩余时间 / ORDER_SCHEDULE_URGENCY_DIVISOR，如距出票时限 2 小时 → 5 分钟、两周 → 上限 1 小时；
+   两个时间都已过去时按最短间隔检查，都没有时按最长间隔
+2. 价格波动：比价任务把每次查到的去哪儿最低价记在订单缓存的 min_price_history 中（最近 PRICE_HISTORY_SIZE 次），
+   波动率 = (最高 - 最低) / 平均，间隔除以 (1 + ORDER_SCHEDULE_VOLATILITY_WEIGHT × 波动率)
+3. 订单状态：discard_state 中的状态（出票完成、已作废等）即将被丢弃，按最长间隔；
+   待处理以外的其他状态间隔乘以 ORDER_SCHEDULE_OTHER_STATE_FACTOR
+4. 结果限制在 [ORDER_SCHEDULE_MIN_INTERVAL, ORDER_SCHEDULE_MAX_INTERVAL]，再加 ±10% 抖动，
+   避免同一批入队的订单每轮都同时到期
+5. 任务每次调度仍只取一个到期的订单，没有到期的订单就跳过，上游请求量不超过原来的轮询方式，
+   多出来的检查次数全部给了临近出票、价格波动大的订单
+"""
+
+ORDER_SCHEDULE_MIN_INTERVAL = float(os.getenv("ORDER_SCHEDULE_MIN_INTERVAL", "60"))
+ORDER_SCHEDULE_MAX_INTERVAL = float(os.getenv("ORDER_SCHEDULE_MAX_INTERVAL", "3600"))
+ORDER_SCHEDULE_URGENCY_DIVISOR = float(os.getenv("ORDER_SCHEDULE_URGENCY_DIVISOR", "24"))
+ORDER_SCHEDULE_VOLATILITY_WEIGHT = float(os.getenv("ORDER_SCHEDULE_VOLATILITY_WEIGHT", "10"))
+ORDER_SCHEDULE_OTHER_STATE_FACTOR = 2.0
+ORDER_SCHEDULE_JITTER = 0.1
+ACTIVE_STATE = "待处理"
+PRICE_HISTORY_FIELD = "min_price_history"
+PRICE_HISTORY_SIZE = 6
+
+_datetime_format = "%Y-%m-%d %H:%M:%S"
+
+
+def _parse_datetime(value: Any) -> Optional[datetime]:
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.strptime(value.strip()[:19], _datetime_format)
+    except ValueError:
+        return None
+
+
+def append_price(history: Optional[Iterable[Any]], price: Any) -> List[float]:
+    """追加一次查到的最低价，只保留最近 PRICE_HISTORY_SIZE 次"""
+    prices = [x for x in history or list() if isinstance(x, (int, float))]
+    if isinstance(price, (int, float)) and price > 0:
+        prices.append(price)
+    return prices[-PRICE_HISTORY_SIZE:]
+
+
+def price_volatility(history: Optional[Iterable[Any]]) -> float:
+    prices = [x for x in history or list() if isinstance(x, (int, float)) and x > 0]
+    if len(prices) < 2:
+        return 0.0
+    return (max(prices) - min(prices)) / (sum(prices) / len(prices))
+
+
+def next_check_delay(
+        order: Dict[str, Any], *, stat_order: Optional[str] = None, now: Optional[datetime] = None,
+        jitter: bool = True
+) -> float:
+    """
+    order：订单缓存中的订单（只用到 last_time_ticket、dat_dep、stat_order、min_price_history）
+    stat_order：刚查到的最新状态，不传时取订单缓存中的
+    返回距下一次检查的秒数
+    """
+    now = now or datetime.now()
+    stat_order = stat_order or order.get("stat_order")
+    if stat_order in config.discard_state:
+        delay = ORDER_SCHEDULE_MAX_INTERVAL
+    else:
+        deadlines = [
+            x for x in (_parse_datetime(order.get("last_time_ticket")), _parse_datetime(order.get("dat_dep")))
+            if x is not None
+        ]
+        remaining = [(x - now).total_seconds() for x in deadlines if x > now]
+        if remaining:
+            delay = min(remaining) / ORDER_SCHEDULE_URGENCY_DIVISOR
+        elif deadlines:
+            delay = ORDER_SCHEDULE_MIN_INTERVAL
+        else:
+            delay = ORDER_SCHEDULE_MAX_INTERVAL
+        delay /= 1 + ORDER_SCHEDULE_VOLATILITY_WEIGHT * price_volatility(order.get(PRICE_HISTORY_FIELD))
+        if stat_order and stat_order != ACTIVE_STATE:
+            delay *= ORDER_SCHEDULE_OTHER_STATE_FACTOR
+    delay = min(max(delay, ORDER_SCHEDULE_MIN_INTERVAL), ORDER_SCHEDULE_MAX_INTERVAL)
+    if jitter:
+        delay *= random.uniform(1 - ORDER_SCHEDULE_JITTER, 1 + ORDER_SCHEDULE_JITTER)
+    return delay
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+# ---------------------------------------------------------------------------------------------------------
+# ProjectName:  cronjob-1717
+# FileName:     params.py
+# Description:  任务参数解析模块
+# Author:       ASUS
+# CreateDate:   2026/10/18
+# Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
+# ---------------------------------------------------------------------------------------------------------
+"""
+import json
+import importlib
+from types import ModuleType
+from functools import lru_cache
+from urllib.parse import parse_qs
+from dataclasses import dataclass, field, fields
+from typing import Dict, Any, Tuple, Optional, Type, TypeVar, Union, Mapping, get_type_hints, get_origin, get_args
+
+"""
+executorParams 统一解析
+1. 同一个参数字符串只解析一次（JSON 或 querystring 两种写法），结果按字符串缓存
+2. 每个 handler 对应一个 frozen + slots 的参数类，字段通过 metadata 指定 jobs.config 中的默认值
+3. 参数类实例按 (参数类, jobId, executorParams) 缓存，同一个任务重复调度时直接复用
+4. 参数值为空（None / "" / 0）时取默认值，与原来 `executor_params.get(x) or config.x` 的行为一致；类型不对时抛 ValueError
+5. jobs/config.py 被 watchdog 重新加载后是一个新的模块对象，缓存键里带上模块对象，旧的默认值自然失效
+"""
+
+PARAMS_CACHE_SIZE = 1024
+
+T = TypeVar("T")
+
+
+def param(config_name: Optional[str] = None, *, repr: bool = True) -> Any:
+    """声明一个参数字段，config_name 为 jobs.config 中默认值的属性名"""
+    return field(default=None, repr=repr, metadata={"config": config_name})
+
+
+@lru_cache(maxsize=PARAMS_CACHE_SIZE)
+def _parse_params_str(params: str) -> Dict[str, Any]:
+    params = params.strip()
+    if not params:
+        return dict()
+    # JSON 风格
+    if params.startswith("{") and params.endswith("}"):
+        try:
+            value = json.loads(params)
+        except ValueError as e:
+            raise ValueError(f"executorParams 不是合法的 JSON：{e}") from e
+        if not isinstance(value, dict):
+            raise ValueError("executorParams 必须是 JSON 对象")
+        return value
+    # querystring 风格：mode=discard&retry=1
+    return {k: v[0] for k, v in parse_qs(params).items()}
+
+
+def parse_executor_params(params: Union[str, Dict[str, Any], None]) -> Mapping[str, Any]:
+    """把 executorParams 解析成字典（结果是缓存共享的，不要修改）"""
+    if isinstance(params, dict):
+        return params
+    return _parse_params_str(params or "")
+
+
+def get_mode(params: Union[str, Dict[str, Any], None]) -> Optional[str]:
+    """从 executorParams 中解析 mode，参数不合法时返回 None"""
+    try:
+        return parse_executor_params(params).get("mode")
+    except ValueError:
+        return None
+
+
+def get_execution_mode(params: Union[str, Dict[str, Any], None]) -> Optional[str]:
+    """从 executorParams 中解析 execution_mode（process 表示在进程池中执行），参数不合法时返回 None"""
+    try:
+        return parse_executor_params(params).get("execution_mode")
+    except ValueError:
+        return None
+
+
+def _coerce(name: str, value: Any, tp: Any) -> Any:
+    origin, args = get_origin(tp), get_args(tp)
+    if origin is Union:
+        # Optional[X]
+        return _coerce(name, value, next(x for x in args if x is not type(None)))
+    if tp is str:
+        if isinstance(value, str):
+            return value
+    elif tp is int:
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.strip().lstrip("-").isdigit():
+            return int(value)
+    elif tp is float:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+        if isinstance(value, str):
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    elif origin is tuple:
+        if isinstance(value, str):
+            value = [x for x in value.split(",") if x]
+        if isinstance(value, (list, tuple)):
+            return tuple(_coerce(name, x, args[0]) for x in value)
+    elif origin is dict:
+        if isinstance(value, dict):
+            return value
+    raise ValueError(f"executorParams 参数<{name}>类型错误，期望 {tp}，实际为 {type(value).__name__}: {value!r}")
+
+
+@lru_cache(maxsize=None)
+def _schema(cls: type) -> Tuple[Tuple[str, Any, Optional[str]], ...]:
+    hints = get_type_hints(cls)
+    return tuple((f.name, hints[f.name], f.metadata.get("config")) for f in fields(cls))
+
+
+def _get_config() -> ModuleType:
+    # 已导入时直接从 sys.modules 取，watchdog 重新加载后拿到的是新模块
+    return importlib.import_module("jobs.config")
+
+
+def build_params(cls: Type[T], raw: Mapping[str, Any], config: Optional[ModuleType] = None) -> T:
+    config = config or _get_config()
+    kwargs = dict()
+    for name, tp, config_name in _schema(cls):
+        value = raw.get(name)
+        if not value and config_name:
+            value = getattr(config, config_name)
+        kwargs[name] = None if value is None else _coerce(name, value, tp)
+    return cls(**kwargs)
+
+
+@lru_cache(maxsize=PARAMS_CACHE_SIZE)
+def _get_params_cached(cls: type, job_id: int, params: str, config: ModuleType) -> Any:
+    return build_params(cls, _parse_params_str(params), config)
+
+
+def get_job_params(cls: Type[T], run_data: Any) -> T:
+    """解析本次调度的参数，按 (参数类, jobId, executorParams) 缓存"""
+    params = run_data.executorParams
+    if isinstance(params, dict):
+        return build_params(cls, params)
+    return _get_params_cached(cls, run_data.jobId, params or "", _get_config())
+
+
+def clear_params_cache() -> None:
+    """丢弃已缓存的参数"""
+    _parse_params_str.cache_clear()
+    _get_params_cached.cache_clear()
+
+
+@dataclass(frozen=True, slots=True)
+class BaseJobParams:
+    mode: Optional[str] = param()
+    execution_mode: Optional[str] = param()
+    timeout: float = param("timeout")
+    retry: int = param("retry")
+
+
+@dataclass(frozen=True, slots=True)
+class QlvJobParams(BaseJobParams):
+    qlv_protocol: str = param("qlv_protocol")
+    qlv_domain: str = param("qlv_domain")
+    qlv_user_id: str = param("qlv_user_id")
+
+
+@dataclass(frozen=True, slots=True)
+class FetchFlightActivityOrderParams(QlvJobParams):
+    semaphore: int = param("semaphore")
+
+
+@dataclass(frozen=True, slots=True)
+class FuwuQunarFlightPriceComparisonParams(QlvJobParams):
+    uuid: str = param("uuid")
+    headers: Dict[str, Any] = param("headers")
+    low_threshold: int = param("low_threshold")
+    high_threshold: int = param("high_threshold")
+
+
+@dataclass(frozen=True, slots=True)
+class PopActiveOrderParams(QlvJobParams):
+    last_minute_threshold: int = param("last_minute_threshold")
+
+
+@dataclass(frozen=True, slots=True)
+class UpdateQlvLoginStateParams(QlvJobParams):
+    qlv_user_password: str = param("qlv_user_password", repr=False)
+    cache_expired_duration: int = param("qlv_user_login_state_expired_duration")
+    api_key: str = param("baidu_api_key", repr=False)
+    secret_key: str = param("baidu_secret_key", repr=False)
+    attempt: int = param("login_attempt")
+
+
+@dataclass(frozen=True, slots=True)
+class UpdateQlvOrderStateParams(QlvJobParams):
+    discard_state: Tuple[str, ...] = param("discard_state")
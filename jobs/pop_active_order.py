@@ -9,14 +9,13 @@
 # Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
 # ---------------------------------------------------------------------------------------------------------
 """
-import json
 import asyncio
 from logging import Logger
 import jobs.config as config
-from aiohttp import CookieJar
+from jobs.params import get_job_params, PopActiveOrderParams
 from typing import Any, Optional
 from datetime import datetime, timedelta
-from jobs.redis_utils import redis_client_0, gen_qlv_login_state_key
+from jobs.login_state import qlv_login_state_cache
 from qlv_helper.controller.order_table import get_domestic_activity_order_table
 from qlv_helper.controller.order_detail import kick_out_activity_orders_with_http
 from playwright.async_api import Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
@@ -26,15 +25,15 @@ async def executor_pop_actvite_order_task(
         *, logger: Logger, qlv_protocol: str, qlv_domain: str, qlv_user_id: str, last_minute_threshold: int,
         timeout: float = 20.0, retry: int = 0, **kwargs: Any
 ) -> Optional[str]:
-    playwright_state = await redis_client_0.get(key=gen_qlv_login_state_key(user_id=qlv_user_id))
-    if not playwright_state:
+    login_state = await qlv_login_state_cache.get(user_id=qlv_user_id)
+    if not login_state:
         raise RuntimeError("Redis中劲旅登录状态数据已过期")
     # -------------------------
     # 获取订单列表（非并发）
     # -------------------------
     table_response = await get_domestic_activity_order_table(
         domain=qlv_domain, protocol=qlv_protocol, retry=retry, timeout=int(timeout), enable_log=True,
-        cookie_jar=CookieJar(), playwright_state=playwright_state
+        cookie_jar=login_state.cookie_jar()
     )
     pagination_data = table_response.get("data") or dict()
     domestic_activity_orders = pagination_data.get("data")
@@ -54,7 +53,7 @@ async def executor_pop_actvite_order_task(
             logger.info(f"订单<{order_str}>，将要从国内活动订单列表剔出")
             response = await kick_out_activity_orders_with_http(
                 order_ids=need_kick_out_orders, domain=qlv_domain, protocol=qlv_protocol, retry=retry,
-                timeout=int(timeout), enable_log=True, cookie_jar=CookieJar(), playwright_state=playwright_state
+                timeout=int(timeout), enable_log=True, cookie_jar=login_state.cookie_jar()
             )
             if "成功" in response.get("data"):
                 msg: str = f"任务执行成功，订单<{order_str}>，已从国内活动订单列表剔出"
@@ -89,19 +88,14 @@ def register(executor):
     @executor.register(name="pop_actvite_order")
     async def pop_actvite_order():
         from pyxxl.ctx import g
-        executor_params = g.xxl_run_data.executorParams if isinstance(
-            g.xxl_run_data.executorParams, dict
-        ) else json.loads(g.xxl_run_data.executorParams)
+        executor_params = get_job_params(PopActiveOrderParams, g.xxl_run_data)
         g.logger.info(
             f"[pop_actvite_order] running with executor params: %s" % executor_params)
         try:
             return await executor_pop_actvite_order_task(
-                logger=g.logger, qlv_domain=executor_params.get("qlv_domain") or config.qlv_domain,
-                qlv_protocol=executor_params.get("qlv_protocol") or config.qlv_protocol,
-                last_minute_threshold=executor_params.get("last_minute_threshold") or config.last_minute_threshold,
-                timeout=executor_params.get("timeout") or config.timeout,
-                qlv_user_id=executor_params.get("qlv_user_id") or config.qlv_user_id,
-                retry=executor_params.get("retry") or config.retry,
+                logger=g.logger, qlv_domain=executor_params.qlv_domain, qlv_protocol=executor_params.qlv_protocol,
+                last_minute_threshold=executor_params.last_minute_threshold, timeout=executor_params.timeout,
+                qlv_user_id=executor_params.qlv_user_id, retry=executor_params.retry,
             )
         except Exception as e:
             g.logger.error(e)
@@ -9,14 +9,21 @@
 # Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
 # ---------------------------------------------------------------------------------------------------------
 """
+import os
 from typing import Dict, Any
 from datetime import datetime, timedelta
 from redis_helper.client import AsyncRedisHelper
-from redis_helper.set_helper import AsyncReliableQueue
-from playwright_helper.utils.type_utils import safe_convert_advanced
+from jobs.order_cache import OrderCache
+from jobs.order_queue import create_order_queue, LeaseReaper
+from jobs.order_key import ORDER_KEY_PREFIX, OrderKey, encode_key_date
 
 standard_date_format = "%Y-%m-%d %H:%M:%S"
 
+# 未设置时连接线上 Redis；本地压测（benchmarks.job_harness_benchmark）指向本机拉起的 redis-server，密码为空表示不认证
+REDIS_HOST = os.getenv("REDIS_HOST", "192.168.3.240")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", "Admin@123") or None
+
 
 def gen_qlv_flight_order_key_prefix(
         *, dep_city: str = None, arr_city: str = None, dep_date: str = None, flight_no: str = None, cabin: str = None,
@@ -24,56 +31,16 @@ def gen_qlv_flight_order_key_prefix(
 ) -> str:
     # 格式： flight:order:[平台ID]:[departureCityCode]:[arrivalCityCode]:[日期]:[flightNo]:[cabin]:[平台单号]:[采购平台订单号]
     # 如：flight:order:qlv:CAN:WUS:2025-12-01:SC4674:S:153471:13123123123113
-    li = ["flight", "order", "qlv"]
-    if dep_city:
-        if isinstance(dep_city, str) is False:
-            dep_city = str(dep_city)
-        li.append(dep_city)
-    if arr_city:
-        if isinstance(arr_city, str) is False:
-            arr_city = str(arr_city)
-        li.append(arr_city)
+    # 字段齐全时即完整的订单 key，请直接使用 OrderKey；这里只用于拼接缺少部分字段的前缀
     if dep_date:
-        if isinstance(dep_date, str) is False:
-            dep_date = str(dep_date)
-        dep_date = dep_date.replace(" ", "T")
-        dep_date = dep_date.replace(":", "/")
-        li.append(dep_date)
-    if flight_no:
-        if isinstance(flight_no, str) is False:
-            flight_no = str(flight_no)
-        li.append(flight_no)
-    if cabin:
-        if isinstance(cabin, str) is False:
-            cabin = str(cabin)
-        li.append(cabin)
-    if extend:
-        if isinstance(extend, str) is False:
-            extend = str(extend)
-        li.append(extend)
-    return ":".join(li)
+        dep_date = encode_key_date(dep_date)
+    parts = (dep_city, arr_city, dep_date, flight_no, cabin, extend)
+    return ":".join([ORDER_KEY_PREFIX, *(x if isinstance(x, str) else str(x) for x in parts if x)])
 
 
 def qlv_flight_order_key_convert_dict(key: str) -> Dict[str, Any]:
-    try:
-        key_slice = key.split(":")
-        dep_date = key_slice[5]
-        dep_date = dep_date.replace("T", " ")
-        dep_date = dep_date.replace("/", ":")
-        data = {
-            "dep_city": key_slice[3],
-            "arr_city": key_slice[4],
-            "dep_date": dep_date,
-            "flight_no": key_slice[6],
-            "cabin": key_slice[7],
-            "extend": safe_convert_advanced(value=key_slice[8])
-        }
-        if len(key_slice) > 9:
-            data["extend+"] = ":".join(key_slice[9:])
-        return data
-    except (IndexError, ValueError, Exception) as e:
-        print(e)
-        return dict()
+    """兼容旧调用：key 不合法时抛 OrderKeyError"""
+    return OrderKey.decode(key).to_dict()
 
 
 # 国内活动订单集合
@@ -114,11 +81,27 @@ def general_key_vid(last_time_ticket: str) -> int:
         return 86400
 
 
-redis_client_0 = AsyncRedisHelper(host='192.168.3.240', port=6379, db=0, password="Admin@123", decode_responses=True)
-redis_client_1 = AsyncRedisHelper(host='192.168.3.240', port=6379, db=1, password="Admin@123", decode_responses=True)
+redis_client_0 = AsyncRedisHelper(
+    host=REDIS_HOST, port=REDIS_PORT, db=0, password=REDIS_PASSWORD, decode_responses=True
+)
+redis_client_1 = AsyncRedisHelper(
+    host=REDIS_HOST, port=REDIS_PORT, db=1, password=REDIS_PASSWORD, decode_responses=True
+)
+# 订单详情缓存是二进制值，单独用一个不解码响应的连接读取
+redis_binary_client_0 = AsyncRedisHelper(
+    host=REDIS_HOST, port=REDIS_PORT, db=0, password=REDIS_PASSWORD, decode_responses=False
+)
+order_cache = OrderCache(redis=redis_binary_client_0.redis)
 
 # 队列值：flight:order:qlv:CAN:WUS:2025-12-01:SC4674:S:153471
-activity_order_queue = AsyncReliableQueue(redis=redis_client_0.redis, key=gen_domestic_activity_order_set_key())
+activity_order_queue = create_order_queue(redis=redis_client_0.redis, key=gen_domestic_activity_order_set_key())
 
 # 队列值：flight:order:qlv:CAN:WUS:2025-12-01:SC4674:S:153471
-order_state_queue = AsyncReliableQueue(redis=redis_client_0.redis, key=gen_update_state_order_set_key())
+order_state_queue = create_order_queue(redis=redis_client_0.redis, key=gen_update_state_order_set_key())
+
+# 比价、状态任务执行时拉起，回收两个队列中租约过期的订单
+order_lease_reaper = LeaseReaper(queues=(activity_order_queue, order_state_queue))
+
+
+def __pyxxl_cleanup__() -> None:
+    order_lease_reaper.close()
@@ -9,10 +9,10 @@
 # Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
 # ---------------------------------------------------------------------------------------------------------
 """
-import json
 import asyncio
 from logging import Logger
 import jobs.config as config
+from jobs.params import get_job_params, UpdateQlvLoginStateParams
 from aiohttp import CookieJar
 from typing import Dict, Any, Optional
 from playwright_stealth import Stealth
@@ -23,8 +23,10 @@ from qlv_helper.controller.main_page import open_main_page
 from qlv_helper.controller.user_login import username_login
 from qlv_helper.controller.wechat_login import wechat_login
 from jobs.common import get_browser_pool, get_playwright_executor
+from process_pool import process_mode
 from qlv_helper.controller.main_page import get_main_info_with_http
 from log_utils import setup_logger, get_screenshot_dir, get_log_dir
+from jobs.login_state import qlv_login_state_cache
 from jobs.redis_utils import redis_client_0, redis_client_1, gen_qlv_login_state_key
 from playwright.async_api import Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
 from qlv_helper.utils.stealth_browser import CHROME_STEALTH_ARGS, IGNORE_ARGS, USER_AGENT, viewport, setup_stealth_page
@@ -34,7 +36,7 @@ from qlv_helper.utils.stealth_browser import CHROME_STEALTH_ARGS, IGNORE_ARGS, U
 1. 从redis中获取登录状态信息
 2. 利用状态信息，打开订单详情页，看看能否正常返回详情页数据， 能返回说明登录状态有效，任务完成
 3. 若不能返回，则执行一次登录过程，若过程执行失败，抛异常
-4. 若过程执行成功，将状态数据写入redis，任务完成
+4. 若过程执行成功，将状态数据写入redis，并通知各进程丢弃本地缓存的登录状态，任务完成
 """
 
 
@@ -90,6 +92,7 @@ async def executor_update_qlv_login_state_with_wechat_task(
             await redis_client_1.set(
                 key=gen_qlv_login_state_key(user_id=qlv_user_id), value=state_json, ex=cache_expired_duration
             )
+            await qlv_login_state_cache.publish(user_id=qlv_user_id)
         await browser.close()
 
         if is_success is True:
@@ -138,6 +141,7 @@ async def executor_update_qlv_login_state_with_username_task(
         await redis_client_1.set(
             key=gen_qlv_login_state_key(user_id=qlv_user_id), value=result.result, ex=cache_expired_duration
         )
+        await qlv_login_state_cache.publish(user_id=qlv_user_id)
         msg: str = "任务执行成功"
         logger.info(msg)
         return msg
@@ -176,25 +180,23 @@ async def update_qlv_login_state_local_executor(
 
 def register(executor):
     @executor.register(name="update_qlv_login_state")
+    @process_mode
     async def update_qlv_login_state():
         from pyxxl.ctx import g
-        executor_params = g.xxl_run_data.executorParams if isinstance(
-            g.xxl_run_data.executorParams, dict
-        ) else json.loads(g.xxl_run_data.executorParams)
+        executor_params = get_job_params(UpdateQlvLoginStateParams, g.xxl_run_data)
         g.logger.info(f"[update_qlv_login_state] running with executor params: {executor_params}")
         return await executor_update_qlv_login_state_with_username_task(
             logger=g.logger,
-            qlv_domain=executor_params.get("qlv_domain") or config.qlv_domain,
-            qlv_protocol=executor_params.get("qlv_protocol") or config.qlv_protocol,
-            qlv_user_id=executor_params.get("qlv_user_id") or config.qlv_user_id,
-            qlv_user_password=executor_params.get("qlv_user_password") or config.qlv_user_login_state_expired_duration,
-            cache_expired_duration=executor_params.get(
-                "cache_expired_duration") or config.qlv_user_login_state_expired_duration,
-            api_key=executor_params.get("api_key") or config.baidu_api_key,
-            secret_key=executor_params.get("secret_key") or config.baidu_secret_key,
-            retry=executor_params.get("retry") or config.retry,
-            timeout=executor_params.get("timeout") or config.timeout,
-            attempt=executor_params.get("attempt") or config.login_attempt
+            qlv_domain=executor_params.qlv_domain,
+            qlv_protocol=executor_params.qlv_protocol,
+            qlv_user_id=executor_params.qlv_user_id,
+            qlv_user_password=executor_params.qlv_user_password,
+            cache_expired_duration=executor_params.cache_expired_duration,
+            api_key=executor_params.api_key,
+            secret_key=executor_params.secret_key,
+            retry=executor_params.retry,
+            timeout=executor_params.timeout,
+            attempt=executor_params.attempt
         )
 
 
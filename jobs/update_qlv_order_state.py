@@ -9,25 +9,29 @@
 # Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
 # ---------------------------------------------------------------------------------------------------------
 """
-import json
 import asyncio
 from logging import Logger
-from aiohttp import CookieJar
 import jobs.config as config
+from log_utils import bind_log_context
+from jobs.params import get_job_params, UpdateQlvOrderStateParams
 from typing import List, Dict, Any, Optional
 from qlv_helper.controller.order_detail import get_order_info_with_http
-from jobs.redis_utils import redis_client_0, order_state_queue, gen_qlv_login_state_key, qlv_flight_order_key_convert_dict
+from jobs.login_state import qlv_login_state_cache
+from jobs.redis_utils import order_lease_reaper, redis_client_0, order_state_queue, order_cache
+from jobs.order_key import OrderKey, OrderKeyError
+from jobs.order_schedule import next_check_delay
 
 """
 更新逻辑：
-1. 从processing队列恢复上次崩溃滞留下的任务
+1. 确保过期租约回收任务在运行，上次崩溃滞留的任务租约过期后放回队列（不再每次恢复整个processing队列）
 2. redis队列弹出key，key为空，任务跳过
 2. redis中的劲旅平台登录状态数据已过期，key扔回队列，抛异常
 3. redis中的订单详情数据已过期，key丢弃，任务跳过
 4. 调用劲旅平台API失败，key扔回队列，抛异常
 5. 调用劲旅平台API成功，获取状态数据失败，可能是解析异常，key扔回队列，抛异常
 6. 如果任务参数中，discard_state参数存在值，需要根据此参数判断redis中的数据是否被丢弃
-7. 如果订单状态显示为其他状态，则更新redis中的订单状态，key扔回队列
+7. 如果订单状态显示为其他状态，则只更新redis中订单详情的状态字段（不读出整个详情再写回），key扔回队列，
+   按出票时限和最新状态计算下一次检查时间（schedule 后端生效）
 """
 
 
@@ -35,28 +39,34 @@ async def executor_update_order_state_task(
         *, logger: Logger, qlv_domain: str, qlv_protocol: str, qlv_user_id: str, discard_state: List[str],
         enable_log: bool = True, timeout: float = 60.0, retry: int = 1
 ) -> Optional[str]:
-    # 1. 恢复processing队列中的任务
-    await order_state_queue.recover()
+    # 1. 确保本进程的过期租约回收任务在运行（不再每次恢复整个processing队列）
+    order_lease_reaper.ensure_started()
     # 2. 从队尾取出（FIFO）
     key = await order_state_queue.pop()
     if not key:
         logger.warning("Redis队列中没有需要更新状态的订单数据，任务跳过")
         return
 
-    playwright_state = await redis_client_0.get(key=gen_qlv_login_state_key(user_id=qlv_user_id))
-    if not playwright_state:
+    login_state = await qlv_login_state_cache.get(user_id=qlv_user_id)
+    if not login_state:
         await order_state_queue.requeue(task=key)
         raise RuntimeError("Redis中劲旅登录状态数据已过期")
-    order_info = qlv_flight_order_key_convert_dict(key=key)
-    order_id = order_info.get("extend")
-    order_info = await redis_client_0.get(key=key)
+    try:
+        order_key = OrderKey.decode(key)
+    except OrderKeyError as e:
+        await order_state_queue.finish(task=key)
+        logger.error(f"状态订单集合中的元素：{key} 不是合法的订单key，已移除集合：{e}")
+        return
+    order_id = order_key.extend
+    bind_log_context(order_id=order_id, flight_no=order_key.flight_no)
+    order_info = await order_cache.get_projection(key)
     if not order_info:
         await order_state_queue.finish(task=key)
         logger.warning(f"劲旅订单：{order_id}，在Redis中的详情数据已经过期，任务跳过")
         return
     response: Dict[str, Any] = await get_order_info_with_http(
         order_id=order_id, timeout=int(timeout), domain=qlv_domain, protocol=qlv_protocol, enable_log=enable_log,
-        retry=retry, cookie_jar=CookieJar(), playwright_state=playwright_state
+        retry=retry, cookie_jar=login_state.cookie_jar()
     )
     """"
     消息结构：
@@ -78,15 +88,12 @@ async def executor_update_order_state_task(
             await order_state_queue.finish(task=key)
             logger.warning(f"劲旅订单：{order_id}，当前的订单状态：{stat_order}，在Redis中的详情数据将被丢弃")
             return
-    order_info["stat_order"] = stat_order
-    order_info["stat_opration"] = stat_opration
-    ttl = await redis_client_0.ttl(key=key)
+    ttl = await order_cache.update_hot(key, {"stat_order": stat_order, "stat_opration": stat_opration})
     if ttl < 1:
         last_time_ticket = order_info.get("last_time_ticket")
-        ttl = redis_client_0.general_key_vid(last_time_ticket=last_time_ticket)
-    await redis_client_0.set(key=key, value=order_info, ex=ttl)
+        await redis_client_0.expire(key=key, expire=redis_client_0.general_key_vid(last_time_ticket=last_time_ticket))
     # 4. key还需要继续使用，重新扔回队列
-    await order_state_queue.requeue(task=key)
+    await order_state_queue.requeue(task=key, delay=next_check_delay(order_info, stat_order=stat_order))
     msg: str = f"任务执行成功，劲旅订单：{order_id}，在Redis中的订单状态已更新"
     logger.info(msg)
     return msg
@@ -116,18 +123,13 @@ def register(executor):
     @executor.register(name="update_qlv_order_state")
     async def update_qlv_order_state():
         from pyxxl.ctx import g
-        executor_params = g.xxl_run_data.executorParams if isinstance(
-            g.xxl_run_data.executorParams, dict
-        ) else json.loads(g.xxl_run_data.executorParams)
+        executor_params = get_job_params(UpdateQlvOrderStateParams, g.xxl_run_data)
         g.logger.info(
             f"[update_qlv_order_state] running with executor params: %s" % executor_params)
         return await executor_update_order_state_task(
-            logger=g.logger, qlv_domain=executor_params.get("qlv_domain") or config.qlv_domain,
-            qlv_protocol=executor_params.get("qlv_protocol") or config.qlv_protocol,
-            qlv_user_id=executor_params.get("qlv_user_id") or config.qlv_user_id,
-            timeout=executor_params.get("timeout") or config.timeout,
-            retry=executor_params.get("retry") or config.retry,
-            discard_state=executor_params.get("discard_state") or config.discard_state
+            logger=g.logger, qlv_domain=executor_params.qlv_domain, qlv_protocol=executor_params.qlv_protocol,
+            qlv_user_id=executor_params.qlv_user_id, timeout=executor_params.timeout, retry=executor_params.retry,
+            discard_state=executor_params.discard_state
         )
 
 
@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+"""
+# ---------------------------------------------------------------------------------------------------------
+# ProjectName:  cronjob-1717
+# FileName:     log_archive.py
+# Description:  任务日志压缩归档
+# Author:       ASUS
+# CreateDate:   2026/10/18
+# Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
+# ---------------------------------------------------------------------------------------------------------
+"""
+import os
+import re
+import json
+import zlib
+import threading
+from time import time, time_ns, monotonic
+from collections import OrderedDict
+from logging import Logger, getLogger
+from typing import Dict, Any, List, Optional, Tuple
+
+"""
+归档逻辑
+1. 扫描日志目录，把超过 archive_after_hours 未修改的任务日志（pyxxl-{logId}.log）和 RotatingFileHandler 的备份文件
+   （*.log.1 ~ *.log.N）打包进 archive 目录下的段文件（segment-*.seg），并写一份同名的 .idx 索引
+2. 每个日志按 block_lines 行切块、逐块 zlib 压缩，索引记录每块的偏移和长度，读取某一页只需解压 1~2 个块
+3. 段文件和索引都写完后，再删除原始日志文件
+4. 段文件超过保留天数，或归档目录总大小超过字节预算时，从最旧的段开始删除
+5. 读取时从新到旧逐个段查找索引：最近用到的索引按 LRU 保留 index_cache_size 个，日志名 -> 段文件的位置单独缓存；
+   所有段都找不到的名称在 miss_ttl 秒内直接判定不存在，admin 反复轮询未知 logId 时不会每次重读全部索引
+"""
+
+TASK_LOG_REGEX = re.compile(r"^pyxxl-\d+\.log$")
+ROTATED_LOG_REGEX = re.compile(r"^.+\.log\.\d+$")
+SEGMENT_SUFFIX = ".seg"
+INDEX_SUFFIX = ".idx"
+ARCHIVE_VERSION = 1
+
+DEFAULT_ARCHIVE_AFTER_HOURS = 6
+DEFAULT_RETENTION_DAYS = 30
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+DEFAULT_BLOCK_LINES = 1000
+DEFAULT_SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_INDEX_CACHE_SIZE = 16
+DEFAULT_LOCATION_CACHE_SIZE = 100000
+DEFAULT_MISS_TTL = 30
+
+
+class LogArchive:
+
+    def __init__(
+            self, log_dir: str, *, archive_dir: Optional[str] = None,
+            archive_after_hours: float = DEFAULT_ARCHIVE_AFTER_HOURS, retention_days: float = DEFAULT_RETENTION_DAYS,
+            max_bytes: int = DEFAULT_MAX_BYTES, block_lines: int = DEFAULT_BLOCK_LINES,
+            segment_max_bytes: int = DEFAULT_SEGMENT_MAX_BYTES, index_cache_size: int = DEFAULT_INDEX_CACHE_SIZE,
+            location_cache_size: int = DEFAULT_LOCATION_CACHE_SIZE, miss_ttl: float = DEFAULT_MISS_TTL,
+            logger: Optional[Logger] = None
+    ):
+        self.log_dir = log_dir
+        self.archive_dir = archive_dir or os.path.join(log_dir, "archive")
+        self.archive_after_seconds = archive_after_hours * 3600
+        self.retention_seconds = retention_days * 3600 * 24
+        self.max_bytes = max_bytes
+        self.block_lines = block_lines
+        self.segment_max_bytes = segment_max_bytes
+        self.index_cache_size = index_cache_size
+        self.location_cache_size = location_cache_size
+        self.miss_ttl = miss_ttl
+        self.logger = logger or getLogger(__name__)
+        self._lock = threading.Lock()
+        # 段文件路径 -> 索引条目（日志名 -> 条目），LRU
+        self._indexes: "OrderedDict[str, Dict[str, Dict[str, Any]]]" = OrderedDict()
+        # 日志名 -> 段文件路径，LRU
+        self._locations: "OrderedDict[str, str]" = OrderedDict()
+        # 所有段都找不到的日志名 -> 判定过期的时间
+        self._misses: "OrderedDict[str, float]" = OrderedDict()
+
+    # ================= 索引 =================
+
+    def _segment_paths(self) -> List[str]:
+        """按创建先后排序的段文件（只算已经写好索引的段）"""
+        if not os.path.isdir(self.archive_dir):
+            return list()
+        names = sorted(x for x in os.listdir(self.archive_dir) if x.endswith(INDEX_SUFFIX))
+        return [os.path.join(self.archive_dir, x[:-len(INDEX_SUFFIX)] + SEGMENT_SUFFIX) for x in names]
+
+    @staticmethod
+    def _load_index(segment_path: str) -> Dict[str, Any]:
+        with open(segment_path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX, mode="r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _cache_index(self, segment_path: str, entries: Dict[str, Dict[str, Any]]) -> None:
+        self._indexes[segment_path] = entries
+        self._indexes.move_to_end(segment_path)
+        while len(self._indexes) > self.index_cache_size:
+            self._indexes.popitem(last=False)
+
+    def _cache_location(self, name: str, segment_path: str) -> None:
+        self._locations[name] = segment_path
+        self._locations.move_to_end(name)
+        while len(self._locations) > self.location_cache_size:
+            self._locations.popitem(last=False)
+
+    def _get_index(self, segment_path: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        with self._lock:
+            entries = self._indexes.get(segment_path)
+            if entries is not None:
+                self._indexes.move_to_end(segment_path)
+                return entries
+        try:
+            entries = self._load_index(segment_path).get("entries", dict())
+        except (OSError, ValueError) as e:
+            if os.path.exists(segment_path):
+                self.logger.warning(f"归档索引<{segment_path}>读取失败，跳过：{e}")
+            return None
+        with self._lock:
+            self._cache_index(segment_path, entries)
+        return entries
+
+    def _find(self, name: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """查找日志所在的段和索引条目：先查位置缓存，再从新到旧逐个段查找，都没有时记入短期未命中缓存"""
+        now = monotonic()
+        with self._lock:
+            segment_path = self._locations.get(name)
+            expires = self._misses.get(name)
+            if expires is not None and expires <= now:
+                self._misses.pop(name)
+                expires = None
+        if segment_path is not None:
+            entries = self._get_index(segment_path)
+            if entries is not None and name in entries:
+                with self._lock:
+                    self._cache_location(name, segment_path)
+                return segment_path, entries[name]
+        elif expires is not None:
+            return None
+        for segment_path in reversed(self._segment_paths()):
+            entries = self._get_index(segment_path)
+            if entries is not None and name in entries:
+                with self._lock:
+                    self._cache_location(name, segment_path)
+                return segment_path, entries[name]
+        with self._lock:
+            self._locations.pop(name, None)
+            self._misses[name] = now + self.miss_ttl
+            self._misses.move_to_end(name)
+            while len(self._misses) > self.location_cache_size:
+                self._misses.popitem(last=False)
+        return None
+
+    def contains(self, name: str) -> bool:
+        return self._find(name) is not None
+
+    # ================= 读取 =================
+
+    def _read_block(self, segment_path: str, block: List[int]) -> List[bytes]:
+        offset, length = block
+        with open(segment_path, mode="rb") as f:
+            f.seek(offset)
+            data = zlib.decompress(f.read(length))
+        lines = data.split(b"\n")
+        # 以换行结尾时 split 会多出一个空串；最后一块的尾行没有换行符时保持原样
+        if lines and lines[-1] == b"":
+            lines.pop()
+            return [x + b"\n" for x in lines]
+        return [x + b"\n" for x in lines[:-1]] + lines[-1:]
+
+    def read_lines(self, name: str, from_line: int, count: int) -> Tuple[str, int, bool]:
+        """
+        读取归档日志 name 从 from_line 开始的 count 行，语义与 LineOffsetIndex.read_lines 一致
+        只解压覆盖该区间的块；日志不在归档中时抛 FileNotFoundError
+        """
+        item = self._find(name)
+        if item is None:
+            raise FileNotFoundError(f"{name} is not archived")
+        segment_path, entry = item
+        to_line = from_line - 1
+        start_line = max(from_line, 1)
+        total = entry["lines"]
+        if count <= 0:
+            return "", to_line, start_line - 1 > total
+        block_lines = entry["block_lines"]
+        end_line = min(start_line + count - 1, total)
+        chunks: List[bytes] = list()
+        for k in range((start_line - 1) // block_lines, (end_line - 1) // block_lines + 1 if end_line else 0):
+            lines = self._read_block(segment_path, entry["blocks"][k])
+            first = k * block_lines + 1
+            chunks.extend(lines[max(start_line - first, 0):end_line - first + 1])
+        if chunks:
+            to_line = start_line + len(chunks) - 1
+        return b"".join(chunks).decode("utf-8", errors="replace"), to_line, start_line + count - 1 > total
+
+    # ================= 归档 =================
+
+    def _candidates(self, now: float) -> List[Tuple[str, str, float, int]]:
+        """需要归档的文件：(归档名称, 文件路径, 修改时间, 文件大小)"""
+        candidates = list()
+        try:
+            names = os.listdir(self.log_dir)
+        except FileNotFoundError:
+            return candidates
+        for name in names:
+            is_task_log = TASK_LOG_REGEX.match(name) is not None
+            if not is_task_log and ROTATED_LOG_REGEX.match(name) is None:
+                continue
+            path = os.path.join(self.log_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if now - stat.st_mtime < self.archive_after_seconds:
+                continue
+            # 备份文件会被 RotatingFileHandler 反复复用同一个文件名，用修改时间区分
+            archive_name = name if is_task_log else f"{name}@{int(stat.st_mtime)}"
+            candidates.append((archive_name, path, stat.st_mtime, stat.st_size))
+        candidates.sort(key=lambda x: x[2])
+        return candidates
+
+    def _pack(self, f, path: str) -> Dict[str, Any]:
+        """把一个日志文件逐块压缩写入段文件 f，返回索引条目"""
+        blocks, lines, buffer = list(), 0, list()
+
+        def flush():
+            data = zlib.compress(b"".join(buffer), 6)
+            blocks.append([f.tell(), len(data)])
+            f.write(data)
+            buffer.clear()
+
+        with open(path, mode="rb") as src:
+            for line in src:
+                buffer.append(line)
+                lines += 1
+                if len(buffer) >= self.block_lines:
+                    flush()
+        if buffer:
+            flush()
+        return dict(lines=lines, block_lines=self.block_lines, blocks=blocks)
+
+    def _write_segment(self, batch: List[Tuple[str, str, float, int]]) -> List[str]:
+        """写一个段文件及其索引，返回已归档的原始文件路径"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        segment_path = os.path.join(self.archive_dir, f"segment-{time_ns()}{SEGMENT_SUFFIX}")
+        index_path = segment_path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX
+        entries, archived = dict(), list()
+        with open(segment_path + ".tmp", mode="wb") as f:
+            for archive_name, path, mtime, size in batch:
+                try:
+                    entry = self._pack(f, path)
+                except FileNotFoundError:
+                    continue
+                entry.update(mtime=mtime, size=size)
+                entries[archive_name] = entry
+                archived.append(path)
+            f.flush()
+            os.fsync(f.fileno())
+        if not entries:
+            os.remove(segment_path + ".tmp")
+            return archived
+        os.replace(segment_path + ".tmp", segment_path)
+        with open(index_path + ".tmp", mode="w", encoding="utf-8") as f:
+            json.dump(dict(version=ARCHIVE_VERSION, created=time(), entries=entries), f, ensure_ascii=False)
+        os.replace(index_path + ".tmp", index_path)
+        with self._lock:
+            self._cache_index(segment_path, entries)
+            for name in entries:
+                self._misses.pop(name, None)
+                if name in self._locations:
+                    self._cache_location(name, segment_path)
+        return archived
+
+    def archive_once(self) -> int:
+        """把过期未修改的日志打包进段文件，返回归档的文件数量（同步执行，应放在线程中调用）"""
+        candidates = self._candidates(now=time())
+        total = 0
+        while candidates:
+            batch, batch_bytes = list(), 0
+            while candidates and (not batch or batch_bytes + candidates[0][3] <= self.segment_max_bytes):
+                item = candidates.pop(0)
+                batch.append(item)
+                batch_bytes += item[3]
+            archived = self._write_segment(batch)
+            for path in archived:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total += len(archived)
+        if total:
+            self.logger.info(f"本次共归档日志文件<{total}>个")
+        return total
+
+    def enforce_retention(self) -> int:
+        """删除超过保留天数或超出字节预算的最旧段文件，返回删除的段数量"""
+        segments = list()
+        for segment_path in self._segment_paths():
+            index_path = segment_path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX
+            try:
+                size = os.path.getsize(segment_path) + os.path.getsize(index_path)
+                created = os.path.getmtime(index_path)
+            except OSError:
+                size, created = 0, 0
+            segments.append((segment_path, index_path, size, created))
+        total_bytes = sum(x[2] for x in segments)
+        expire_before = time() - self.retention_seconds
+        removed = list()
+        for segment_path, index_path, size, created in segments:
+            if created >= expire_before and total_bytes <= self.max_bytes:
+                break
+            # 先删索引，读取方就不会再引用这个段
+            for path in (index_path, segment_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total_bytes -= size
+            removed.append(segment_path)
+        if removed:
+            with self._lock:
+                removed_set = set(removed)
+                for segment_path in removed:
+                    self._indexes.pop(segment_path, None)
+                self._locations = OrderedDict((k, v) for k, v in self._locations.items() if v not in removed_set)
+            self.logger.info(f"归档目录清理段文件<{len(removed)}>个，剩余<{total_bytes}>字节")
+        return len(removed)
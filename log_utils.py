@@ -1,13 +1,27 @@
 # -*- coding: utf-8 -*-
 import os as _os
+import json as _json
 import sys as _sys
+import atexit as _atexit
+import asyncio as _asyncio
 import logging as _logging
+import threading as _threading
+from time import monotonic as _monotonic, sleep as _sleep
 from pyxxl.ctx import g as _g
+from array import array as _array
 from pathlib import Path as _Path
 import pyxxl.setting as _xxl_setting
 from datetime import datetime as _datetime
+from contextlib import contextmanager as _contextmanager
+from contextvars import ContextVar as _ContextVar, Token as _Token
+from typing import Optional as _Optional, Tuple as _Tuple, Deque as _Deque, Any as _Any, Dict as _Dict, \
+    List as _List, Generator as _Generator
+from collections import OrderedDict as _OrderedDict, deque as _deque
+from concurrent.futures import Future as _Future
 from loguru import logger as _loguru_logger
+import pyxxl.executor as _xxl_executor
 import pyxxl.logger.common as _xxl_log_common
+from pyxxl.logger.common import LogBase as _LogBase
 from pyxxl.logger.disk import DiskLog as _DiskLog
 from pyxxl.log import executor_logger as _executor_logger
 from logging.handlers import RotatingFileHandler as _RotatingFileHandler
@@ -52,24 +66,138 @@ def set_pathname(record: _logging.LogRecord):
         record.pathname = _os.sep + _os.path.basename(record.pathname)
 
 
+class TaskLogContext:
+    """
+    一个任务的日志上下文，任务开始时绑定一次（contextvars），各种输出格式要用的字段预先生成好，
+    不再每条日志都读取 g.xxl_run_data 并拼接 jobId / logId / source 字符串
+    """
+    __slots__ = ("job_id", "log_id", "handler", "order_id", "flight_no", "fields", "console_extra", "file_tags")
+
+    def __init__(
+            self, job_id: _Optional[int] = None, log_id: _Optional[int] = None, handler: _Optional[str] = None,
+            order_id: _Any = None, flight_no: _Optional[str] = None
+    ):
+        self.job_id = job_id
+        self.log_id = log_id
+        self.handler = handler
+        self.order_id = order_id
+        self.flight_no = flight_no
+        source = "TASK" if job_id or log_id else "EXECUTOR"
+        # JSON 行模式的字段
+        self.fields = {
+            "source": source, "jobId": job_id, "logId": log_id, "handler": handler,
+            "order_id": order_id, "flight_no": flight_no,
+        }
+        # Loguru 控制台格式的 extra
+        self.console_extra = {
+            "source": source,
+            "jobId": f"jobId={job_id} | " if job_id else "",
+            "logId": f"logId={log_id} | " if log_id else "",
+        }
+        # 文件格式的 (source, jobId, logId)
+        self.file_tags = (
+            f"- [{source}] ",
+            f"- [jobId={job_id}] " if job_id else "",
+            f"- [logId={log_id}] " if log_id else "",
+        )
+
+    @property
+    def is_task(self) -> bool:
+        return bool(self.job_id or self.log_id)
+
+    def bind(self, *, order_id: _Any = None, flight_no: _Optional[str] = None) -> "TaskLogContext":
+        return TaskLogContext(
+            self.job_id, self.log_id, self.handler,
+            order_id=self.order_id if order_id is None else order_id,
+            flight_no=self.flight_no if flight_no is None else flight_no,
+        )
+
+
+EXECUTOR_LOG_CONTEXT = TaskLogContext()
+
+_task_log_context: _ContextVar[_Optional[TaskLogContext]] = _ContextVar("task_log_context", default=None)
+
+
+def bind_task_log_context(data: _Any) -> _Token:
+    """任务开始时调用一次，data 为 RunData"""
+    return _task_log_context.set(TaskLogContext(data.jobId, data.logId, data.executorHandler))
+
+
+def reset_task_log_context(token: _Token) -> None:
+    _task_log_context.reset(token)
+
+
+def bind_log_context(*, order_id: _Any = None, flight_no: _Optional[str] = None) -> None:
+    """
+    任务里拿到订单后调用，之后该任务（当前协程及其派生的协程）的日志都带上 order_id / flight_no：
+        bind_log_context(order_id=order_id, flight_no=flight_no)
+    """
+    _task_log_context.set(current_log_context().bind(order_id=order_id, flight_no=flight_no))
+
+
+def current_log_context() -> TaskLogContext:
+    context = _task_log_context.get()
+    if context is None:
+        # 没有经过 new_logger 绑定（如直接设置 g.xxl_run_data 的场景），退回按运行数据生成
+        xxl_kwargs = _g.try_get_run_data()
+        if not xxl_kwargs:
+            return EXECUTOR_LOG_CONTEXT
+        context = TaskLogContext(xxl_kwargs.jobId, xxl_kwargs.logId, xxl_kwargs.executorHandler)
+    return context
+
+
 class SafeFormatter(_logging.Formatter):
+    """no_source_fmt：没有源码位置的记录（低于 LOG_SOURCE_LEVEL 的任务日志，lineno 为 0）使用的格式"""
+
+    def __init__(self, fmt: _Optional[str] = None, datefmt: _Optional[str] = None, *,
+                 no_source_fmt: _Optional[str] = None):
+        super().__init__(fmt, datefmt)
+        self._no_source = _logging.Formatter(no_source_fmt, datefmt) if no_source_fmt else None
+
     def format(self, record):
-        log_id = getattr(record, "logId", None)
-        job_id = getattr(record, "jobId", None)
-        if log_id:
-            record.logId = f"- [logId={record.logId}] "
-        else:
-            record.logId = ""
-        if job_id:
-            record.jobId = f"- [jobId={record.jobId}] "
-        else:
-            record.jobId = ""
-        source = "TASK" if log_id or job_id else "EXECUTOR"
+        context = getattr(record, "log_context", None)
+        if context is None:
+            # 未经过 FileHandler 的记录：兼容直接在 record 上设置 jobId / logId 的用法
+            log_id = getattr(record, "logId", None)
+            job_id = getattr(record, "jobId", None)
+            context = TaskLogContext(job_id, log_id) if log_id or job_id else EXECUTOR_LOG_CONTEXT
         # set_pathname(record=record)
-        record.source = f"- [{source}] "
+        record.source, record.jobId, record.logId = context.file_tags
+        if not record.lineno and self._no_source is not None:
+            # 不输出 "(unknown file):((unknown function):0)"
+            return self._no_source.format(record)
         return super().format(record)
 
 
+class JsonLinesFormatter(_logging.Formatter):
+    """
+    JSON 行格式：一条日志一个 JSON 对象，任务上下文字段直接取绑定好的 TaskLogContext，
+    源码位置只在记录带有时输出（低于 LOG_SOURCE_LEVEL 的任务日志不做栈帧查找）
+    """
+
+    def format(self, record: _logging.LogRecord) -> str:
+        data = {
+            "time": "%s.%03d" % (self.formatTime(record, _xxl_log_common.TASKDATE_FORMAT), record.msecs),
+            "level": record.levelname,
+            **_record_context(record).fields,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        if record.lineno:
+            data["file"] = record.pathname
+            data["func"] = record.funcName
+            data["line"] = record.lineno
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        if record.stack_info:
+            data["stack"] = record.stack_info
+        return _json.dumps(data, ensure_ascii=False, default=str)
+
+
 CUSTOM_CONSOLE_FORMAT = (
     "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | "
     "<level>{level:<8}</level> | "
@@ -94,23 +222,82 @@ CUSTOM_FILE_FORMAT_STR = (
     "%(source)s%(jobId)s%(logId)s- %(message)s - %(pathname)s:(%(funcName)s:%(lineno)d)"
 )
 
+CUSTOM_FILE_FORMAT_NO_SOURCE_STR = (
+    "%(asctime)s.%(msecs)03d - [PID-%(process)d] - [%(threadName)s-%(thread)d] - [%(levelname)s] "
+    "%(source)s%(jobId)s%(logId)s- %(message)s"
+)
+
 UNIFIED_FORMATTER = SafeFormatter(
     CUSTOM_FILE_FORMAT_STR,
     datefmt=_xxl_log_common.TASKDATE_FORMAT,
+    no_source_fmt=CUSTOM_FILE_FORMAT_NO_SOURCE_STR,
 )
 
 DEFAULT_FILE_SIZE = 50 * 1024 * 1024
 DEFAULT_BACKUP_FILE_COUNT = 5
 
+# 日志队列：handler 的磁盘/控制台写入交给后台写线程，按间隔或条数批量刷盘
+LOG_QUEUE_ENABLED = _os.getenv("LOG_QUEUE_ENABLED", "true").lower() in ("1", "true", "yes")
+DEFAULT_LOG_FLUSH_INTERVAL = float(_os.getenv("LOG_QUEUE_FLUSH_INTERVAL", 0.5))
+DEFAULT_LOG_BATCH_SIZE = int(_os.getenv("LOG_QUEUE_BATCH_SIZE", 512))
+LOG_WRITER_NICE = 10
+# 任务结束时等待写线程刷盘的最长秒数
+LOG_FINISH_FLUSH_TIMEOUT = 5.0
+# 日志格式：text（默认，Loguru 彩色控制台）或 json（控制台输出 JSON 行，便于日志采集直接解析）
+LOG_FORMAT_JSON = _os.getenv("LOG_FORMAT", "text").lower() == "json"
+# 低于该级别的任务日志不查找调用方源码位置；text 格式默认全部查找，与原输出一致
+_source_level = _os.getenv("LOG_SOURCE_LEVEL", "WARNING" if LOG_FORMAT_JSON else "NOTSET").upper()
+LOG_SOURCE_LEVEL = int(_source_level) if _source_level.isdigit() else _logging.getLevelName(_source_level)
+# 控制台与执行器日志的重复折叠窗口（秒），0 表示关闭
+LOG_DEDUP_WINDOW = float(_os.getenv("LOG_DEDUP_WINDOW", 300))
+# 按 logger 名前缀的令牌桶限流，格式：aiohttp.access=2/20,watchdog=1/5（每秒条数/桶容量）
+LOG_RATE_LIMITS = _os.getenv("LOG_RATE_LIMITS", "")
+DEFAULT_LOG_DEDUP_KEYS = 1024
+
+
+def parse_rate_limits(value: str) -> _Dict[str, _Tuple[float, float]]:
+    limits = dict()
+    for item in (value or "").split(","):
+        name, _, spec = item.strip().partition("=")
+        if not name or not spec:
+            continue
+        rate, _, burst = spec.partition("/")
+        limits[name.strip()] = (float(rate), float(burst or rate))
+    return limits
+
+_NO_CONTEXT = object()
+
+
+def _record_context(record: _logging.LogRecord) -> "TaskLogContext":
+    """入队时已捕获的优先，否则取当前上下文"""
+    context = getattr(record, "xxl_context", _NO_CONTEXT)
+    if context is _NO_CONTEXT:
+        context = current_log_context()
+    return context
+
+
+class _DeferredFlushMixin:
+    """由日志写线程驱动时，每条记录只写入文件缓冲，批次结束后再统一 flush"""
+    deferred_flush = False
+
+    def flush(self) -> None:
+        if not self.deferred_flush:
+            super().flush()
+
+    def flush_buffer(self) -> None:
+        super().flush()
 
-class FileHandler(_logging.FileHandler):
+
+class FileHandler(_DeferredFlushMixin, _logging.FileHandler):
     def emit(self, record: _logging.LogRecord) -> None:
-        xxl_kwargs = _g.try_get_run_data()
-        record.logId = xxl_kwargs.logId if xxl_kwargs else None
-        record.jobId = xxl_kwargs.jobId if xxl_kwargs else None
+        record.log_context = _record_context(record)
         return super().emit(record)
 
 
+class RotatingFileHandler(_DeferredFlushMixin, _RotatingFileHandler):
+    pass
+
+
 class LoguruHandler(_logging.Handler):
     def emit(self, record: _logging.LogRecord):
         try:
@@ -122,40 +309,351 @@ class LoguruHandler(_logging.Handler):
         # 1️⃣ 提取上下文
         # ----------------------------
         # jobId / logId 动态显示
-        xxl_kwargs = _g.try_get_run_data()
-        job_id = xxl_kwargs.jobId if xxl_kwargs else ""
-        log_id = xxl_kwargs.logId if xxl_kwargs else ""
-        source = "TASK" if job_id or log_id else "EXECUTOR"
+        context = _record_context(record)
 
         # ----------------------------
         # 2️⃣ 绑定 context（核心）
         # ----------------------------
         # set_pathname(record=record)
         extra = {
-            "source": source,
-            "jobId": f"jobId={job_id} | " if job_id else "",
-            "logId": f"logId={log_id} | " if log_id else "",
-            "logger_name": f" | {record.name} | " if source == "EXECUTOR" else "",
+            **context.console_extra,
+            "logger_name": "" if context.is_task else f" | {record.name} | ",
             "pathname": record.pathname,
             "funcName": record.funcName,
             "lineno": record.lineno,
         }
 
-        frame, depth = _logging.currentframe(), 2
-        while frame and frame.f_code.co_filename == _logging.__file__:
-            frame = frame.f_back
-            depth += 1
+        depth = 0
+        if record.levelno >= LOG_SOURCE_LEVEL:
+            frame, depth = _logging.currentframe(), 2
+            while frame and frame.f_code.co_filename == _logging.__file__:
+                frame = frame.f_back
+                depth += 1
 
+        message = record.getMessage()
+        if record.exc_text and not record.exc_info:
+            # 经过日志队列的记录，异常堆栈已在入队时格式化
+            message = f"{message}\n{record.exc_text}"
         _loguru_logger.bind(**extra).opt(
             depth=depth,
             exception=record.exc_info,
-        ).log(level, record.getMessage())
+        ).log(level, message)
 
         # xxl_kwargs = _g.try_get_run_data()
         # record.logId = xxl_kwargs.logId if xxl_kwargs else "NotInTask"
         # return super().emit(record)
 
 
+class LogRateLimitFilter(_logging.Filter):
+    """
+    日志限流与重复折叠，挂在控制台和执行器日志文件的 handler 上（任务日志文件不受影响，/log 仍能看到完整日志）
+    1. ERROR 及以上总是放行
+    2. 重复折叠：同一来源（任务日志按 handler 名，其余按 logger 名）、同一级别、同一内容的日志，
+       window 秒内只输出第一条，其余只计数；窗口过后再次出现时，先输出一行“重复 N 次”的汇总再输出本条
+    3. 限流：按 logger 名前缀（最长匹配，* 匹配全部）配置令牌桶，令牌不足的记录丢弃并计数，
+       恢复输出时先输出一行“限流丢弃 N 条”的汇总
+    4. 汇总行是单独的一条记录，直接交给所属 handler，不修改原记录（同一条记录还会交给任务日志文件）
+    """
+
+    SUMMARY_ATTR = "rate_limit_summary"
+
+    def __init__(
+            self, handler: _logging.Handler, *, window: float = LOG_DEDUP_WINDOW,
+            limits: _Optional[_Dict[str, _Tuple[float, float]]] = None, maxsize: int = DEFAULT_LOG_DEDUP_KEYS
+    ):
+        super().__init__()
+        self.handler = handler
+        self.window = window
+        self.maxsize = maxsize
+        # 前缀越长越优先
+        self.limits = sorted((limits or dict()).items(), key=lambda x: -len(x[0]))
+        self._repeats: "_OrderedDict[_Tuple[str, int, str], _List[float]]" = _OrderedDict()
+        # 限流键 -> [令牌数, 上次补充时间, 丢弃条数]
+        self._buckets: _Dict[str, _List[float]] = dict()
+        self._lock = _threading.Lock()
+
+    def _summary(self, record: _logging.LogRecord, message: str) -> _logging.LogRecord:
+        summary = _logging.makeLogRecord(record.__dict__)
+        summary.msg, summary.args = message, None
+        summary.exc_info = summary.exc_text = summary.stack_info = None
+        setattr(summary, self.SUMMARY_ATTR, True)
+        return summary
+
+    def _match_limit(self, name: str) -> _Optional[_Tuple[str, float, float]]:
+        for prefix, (rate, burst) in self.limits:
+            if prefix == "*" or name == prefix or name.startswith(prefix + "."):
+                return prefix, rate, burst
+        return None
+
+    def _check_repeat(self, record: _logging.LogRecord, now: float, summaries: list) -> bool:
+        if self.window <= 0:
+            return True
+        context = _record_context(record)
+        message = record.getMessage()
+        key = (context.handler if context.is_task else record.name, record.levelno, message)
+        state = self._repeats.get(key)
+        if state is not None and now - state[0] < self.window:
+            state[1] += 1
+            return False
+        if state is not None and state[1]:
+            summaries.append(self._summary(
+                record, f"以下日志在 {now - state[0]:.0f} 秒内重复 {int(state[1])} 次，已省略：{message}"
+            ))
+        self._repeats[key] = [now, 0]
+        self._repeats.move_to_end(key)
+        while len(self._repeats) > self.maxsize:
+            self._repeats.popitem(last=False)
+        return True
+
+    def _check_bucket(self, record: _logging.LogRecord, now: float, summaries: list) -> bool:
+        limit = self._match_limit(record.name)
+        if limit is None:
+            return True
+        prefix, rate, burst = limit
+        bucket = self._buckets.get(prefix)
+        if bucket is None:
+            bucket = self._buckets[prefix] = [burst, now, 0]
+        bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if bucket[0] < 1:
+            bucket[2] += 1
+            return False
+        bucket[0] -= 1
+        if bucket[2]:
+            summaries.append(self._summary(record, f"{prefix} 日志超过限流（{rate:g} 条/秒），已丢弃 {int(bucket[2])} 条"))
+            bucket[2] = 0
+        return True
+
+    def filter(self, record: _logging.LogRecord) -> bool:
+        if record.levelno >= _logging.ERROR or getattr(record, self.SUMMARY_ATTR, False):
+            return True
+        summaries = list()
+        now = _monotonic()
+        with self._lock:
+            passed = self._check_repeat(record, now, summaries) and self._check_bucket(record, now, summaries)
+        for summary in summaries:
+            self.handler.handle(summary)
+        return passed
+
+
+def add_rate_limit_filter(handler: _logging.Handler) -> _logging.Handler:
+    limits = parse_rate_limits(LOG_RATE_LIMITS)
+    if LOG_DEDUP_WINDOW > 0 or limits:
+        handler.addFilter(LogRateLimitFilter(handler, window=LOG_DEDUP_WINDOW, limits=limits))
+    return handler
+
+
+class _StdoutHandler(_logging.Handler):
+    def flush(self) -> None:
+        _sys.stdout.flush()
+
+
+class JsonLinesHandler(_DeferredFlushMixin, _StdoutHandler):
+    """LOG_FORMAT=json 时的控制台 handler，直接写标准输出，不经过 Loguru"""
+
+    def __init__(self, level: int = _logging.NOTSET):
+        super().__init__(level)
+        self.setFormatter(JsonLinesFormatter())
+
+    def emit(self, record: _logging.LogRecord) -> None:
+        try:
+            _sys.stdout.write(self.format(record) + "\n")
+            self.flush()
+        except Exception:
+            self.handleError(record)
+
+
+def make_console_handler() -> _logging.Handler:
+    return add_rate_limit_filter(JsonLinesHandler() if LOG_FORMAT_JSON else LoguruHandler())
+
+
+class LogWriter:
+    """
+    日志写线程
+    1. QueuedHandler 在调用方线程只做入队（同时捕获 jobId/logId 上下文、格式化消息和异常堆栈），不做任何 I/O
+    2. 写线程每隔 flush_interval 秒，或缓冲累计 batch_size 条时被唤醒，把积压的记录一次性交给真正的 handler 写入，
+       文件 handler 只写缓冲，整批写完后统一 flush；不逐条唤醒写线程，避免和事件循环线程频繁争抢 GIL
+    3. 任务结束时 close_handlers 立即唤醒写线程，写完该任务此前的日志后刷盘并关闭文件 handler；
+       回调 admin 之前只为该任务自己的文件 handler 排入刷盘标记并等待它完成（flush_task_log），
+       不经线程池、不等其它任务的文件刷盘，也不在 executor 锁内等待，admin 拉取 /log 读取到的是完整文件
+    4. 进程退出时写完缓冲中剩余的日志
+    """
+
+    _STOP = object()
+    _CLOSE = object()
+
+    def __init__(self, flush_interval: float = DEFAULT_LOG_FLUSH_INTERVAL, batch_size: int = DEFAULT_LOG_BATCH_SIZE):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        # deque 的 append / popleft 线程安全
+        self._buffer: _Deque[_Tuple[_Tuple[_logging.Handler, ...], _Any]] = _deque()
+        self._wakeup = _threading.Event()
+        self._lock = _threading.Lock()
+        self._thread: _Optional[_threading.Thread] = None
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = _threading.Thread(target=self._run, name="log-writer", daemon=True)
+                    self._thread.start()
+                    _atexit.register(self.stop)
+
+    def put(self, handlers: _Tuple[_logging.Handler, ...], record: _logging.LogRecord) -> None:
+        self._ensure_started()
+        self._buffer.append((handlers, record))
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def _put_control(self, handlers: _Tuple[_logging.Handler, ...], item: _Any) -> None:
+        self._ensure_started()
+        self._buffer.append((handlers, item))
+        self._wakeup.set()
+
+    def close_handlers(self, handlers: _Tuple[_logging.Handler, ...]) -> None:
+        """写完这些 handler 之前入队的日志后刷盘并关闭"""
+        self._put_control(handlers, self._CLOSE)
+
+    def flush(self, timeout: _Optional[float] = None) -> bool:
+        """等待此前入队的日志全部写入并刷盘"""
+        event = _threading.Event()
+        self._put_control((), event)
+        return event.wait(timeout)
+
+    def mark(self, handlers: _Tuple[_logging.Handler, ...]) -> _Future:
+        """排入刷盘标记，写线程写到这里时刷盘这些 handler 并完成返回的 future"""
+        future = _Future()
+        self._put_control(handlers, future)
+        return future
+
+    def stop(self, timeout: float = 5) -> None:
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._put_control((), self._STOP)
+            thread.join(timeout)
+
+    def _write_batch(self) -> bool:
+        """写完当前积压的记录并刷盘，遇到停止标记返回 False"""
+        dirty, running = set(), True
+        buffer = self._buffer
+        # 只处理唤醒时已积压的记录，之后入队的留给下一批
+        for _ in range(len(buffer)):
+            handlers, record = buffer.popleft()
+            if record is self._STOP:
+                running = False
+                break
+            if record is self._CLOSE:
+                for handler in handlers:
+                    dirty.discard(handler)
+                    handler.close()
+                continue
+            if isinstance(record, _threading.Event):
+                self._flush(dirty)
+                record.set()
+                continue
+            if isinstance(record, _Future):
+                self._flush(dirty.intersection(handlers))
+                dirty.difference_update(handlers)
+                # 等待方已超时取消时不再设置结果
+                if record.set_running_or_notify_cancel():
+                    record.set_result(True)
+                continue
+            for handler in handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+                    if handler.deferred_flush:
+                        dirty.add(handler)
+            # 文件只写缓冲，写线程几乎不会主动释放 GIL；每条记录后让出一次，事件循环线程不必等满切换间隔
+            _sleep(0)
+        self._flush(dirty)
+        return running
+
+    @staticmethod
+    def _flush(dirty: set) -> None:
+        for handler in dirty:
+            try:
+                handler.flush_buffer()
+            except Exception:
+                pass
+        dirty.clear()
+
+    def _run(self) -> None:
+        try:
+            # 降低写线程的调度优先级（Linux 下 nice 值按线程生效），CPU 紧张时优先保证事件循环线程
+            _os.setpriority(_os.PRIO_PROCESS, _threading.get_native_id(), LOG_WRITER_NICE)
+        except (AttributeError, OSError):
+            pass
+        running = True
+        while running:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            running = self._write_batch()
+
+
+task_log_writer = LogWriter()
+
+
+class QueuedHandler(_logging.Handler):
+    """把记录交给 LogWriter，由写线程转给 targets 中的 handler"""
+
+    def __init__(self, *targets: _logging.Handler, writer: LogWriter = task_log_writer):
+        super().__init__()
+        self.targets = targets
+        self.writer = writer
+        for target in targets:
+            target.deferred_flush = isinstance(target, _DeferredFlushMixin)
+
+    def prepare(self, record: _logging.LogRecord) -> _logging.LogRecord:
+        # 上下文变量、异常对象只在调用方线程有效，入队前处理好
+        record.xxl_context = current_log_context()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = UNIFIED_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record: _logging.LogRecord) -> None:
+        try:
+            self.writer.put(self.targets, self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+
+_loguru_sink_lock = _threading.Lock()
+_loguru_sink: _Optional[_Tuple[int, str]] = None
+
+
+def configure_loguru_sink(level: int, format: str = CUSTOM_CONSOLE_FORMAT_NOT_DISPLAY) -> None:
+    """
+    全局只保留一个 stdout sink：格式相同且已配置的级别不高于 level 时直接返回，
+    不再每创建一个 logger 就 remove()/add() 重建一次
+    """
+    global _loguru_sink
+    with _loguru_sink_lock:
+        if _loguru_sink is not None and _loguru_sink[1] == format and _loguru_sink[0] <= level:
+            return
+        _loguru_logger.remove()  # 移除默认 handler
+        _loguru_logger.add(
+            _sys.stdout,
+            level=level,
+            colorize=True,
+            backtrace=False,
+            diagnose=False,
+            format=format,  # 🔥 就是这一行
+        )
+        _loguru_sink = (level, format)
+
+
+def _attach_handlers(logger: _logging.Logger, *handlers: _logging.Handler) -> None:
+    if LOG_QUEUE_ENABLED:
+        logger.addHandler(QueuedHandler(*handlers))
+    else:
+        for handler in handlers:
+            logger.addHandler(handler)
+
+
 def hacked_setup_logging(path: str, name: str, level: int = _logging.INFO) -> _logging.Logger:
     logger = _logging.getLogger(name)
     if logger.handlers:
@@ -167,26 +665,17 @@ def hacked_setup_logging(path: str, name: str, level: int = _logging.INFO) -> _l
     # -------------------------
     # 1️⃣ Console → Loguru
     # -------------------------
-    console_handler = LoguruHandler()
-    logger.addHandler(console_handler)
-
-    _loguru_logger.remove()  # 移除默认 handler
-    _loguru_logger.add(
-        _sys.stdout,
-        level=level,
-        colorize=True,
-        backtrace=False,
-        diagnose=False,
-        format=CUSTOM_CONSOLE_FORMAT_NOT_DISPLAY,  # 🔥 就是这一行
-    )
+    console_handler = make_console_handler()
+    configure_loguru_sink(level)
 
     # ② file → logging（给系统 / 运维 / admin）
-    file_handler = _RotatingFileHandler(
+    file_handler = RotatingFileHandler(
         path, maxBytes=DEFAULT_FILE_SIZE, backupCount=DEFAULT_BACKUP_FILE_COUNT, delay=True, encoding="utf-8"
     )
     file_handler.setLevel(level)
     file_handler.setFormatter(UNIFIED_FORMATTER)
-    logger.addHandler(file_handler)
+    add_rate_limit_filter(file_handler)
+    _attach_handlers(logger, console_handler, file_handler)
 
     # =========================
     # 5️⃣ 三方库日志
@@ -194,11 +683,15 @@ def hacked_setup_logging(path: str, name: str, level: int = _logging.INFO) -> _l
     for name in ["urllib3", "requests", "charset_normalizer", "playwright", "asyncio", "aiohttp.access", "watchdog"]:
         log = _logging.getLogger(name)
         log.setLevel(level)  # 降低这些库的日志级别
-        if not any(isinstance(h, LoguruHandler) for h in log.handlers):
-            log.addHandler(console_handler)
+        if LOG_QUEUE_ENABLED:
+            if not any(isinstance(h, QueuedHandler) for h in log.handlers):
+                log.addHandler(QueuedHandler(console_handler, file_handler))
+        else:
+            if not any(isinstance(h, (LoguruHandler, JsonLinesHandler)) for h in log.handlers):
+                log.addHandler(console_handler)
 
-        if file_handler and not any(isinstance(h, _RotatingFileHandler) for h in log.handlers):
-            log.addHandler(file_handler)
+            if file_handler and not any(isinstance(h, _RotatingFileHandler) for h in log.handlers):
+                log.addHandler(file_handler)
         log.propagate = False
     # access_logger = _logging.getLogger("aiohttp.access")
     # access_logger.setLevel(level)
@@ -209,35 +702,292 @@ def hacked_setup_logging(path: str, name: str, level: int = _logging.INFO) -> _l
     return logger
 
 
+class TaskLogger(_logging.Logger):
+    """低于 LOG_SOURCE_LEVEL 的记录跳过 findCaller 的栈帧遍历，不带源码位置"""
+
+    def _log(self, level, msg, args, exc_info=None, extra=None, stack_info=False, stacklevel=1):
+        if level >= LOG_SOURCE_LEVEL or stack_info:
+            # 多了本函数这一层栈帧
+            return super()._log(level, msg, args, exc_info, extra, stack_info, stacklevel + 1)
+        if exc_info:
+            if isinstance(exc_info, BaseException):
+                exc_info = (type(exc_info), exc_info, exc_info.__traceback__)
+            elif not isinstance(exc_info, tuple):
+                exc_info = _sys.exc_info()
+        record = self.makeRecord(
+            self.name, level, "(unknown file)", 0, msg, args, exc_info, "(unknown function)", extra, None
+        )
+        self.handle(record)
+
+
+class TaskLoggerPool:
+    """
+    任务 logger 池
+    1. 任务 logger 不经过 logging.getLogger 创建，不登记到 logging.Logger.manager.loggerDict，
+       否则每次调度都会留下一个 pyxxl.task_log.disk.task-{logId}，长期按分钟调度时无限增长；
+       池里只保存执行中任务的 logger，任务结束即移出，数量以同时运行的任务数为上限
+    2. 任务结束时移除并关闭任务自己的 handler（任务日志文件随之关闭）
+    3. 控制台 LoguruHandler 无状态，所有任务共用一个，不随任务关闭；任务结束后 logger 上只保留它，
+       handler 里起的后台协程拿着旧 logger 继续打日志时仍输出到控制台。
+       logger 对象不复用：复制了上下文的后台协程可能还持有它，复用会把日志写进别的任务的文件
+    """
+
+    def __init__(self):
+        self.console_handler = make_console_handler()
+        self._active: _Dict[int, _logging.Logger] = dict()
+        self._lock = _threading.Lock()
+        self.created = 0
+
+    def acquire(self, name: str, level: int) -> _logging.Logger:
+        logger = TaskLogger(name, level)
+        logger.propagate = False
+        with self._lock:
+            self._active[id(logger)] = logger
+            self.created += 1
+        return logger
+
+    def release(self, logger: _logging.Logger) -> None:
+        with self._lock:
+            self._active.pop(id(logger), None)
+        console = False
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            if isinstance(handler, QueuedHandler):
+                # 经过日志队列的 handler 由写线程写完剩余日志后刷盘关闭
+                targets = tuple(h for h in handler.targets if h is not self.console_handler)
+                console = console or len(targets) < len(handler.targets)
+                handler.writer.close_handlers(targets)
+                handler.close()
+            elif handler is self.console_handler:
+                console = True
+            else:
+                handler.close()
+        if console:
+            logger.addHandler(self.console_handler)
+        # 兼容由 logging.getLogger 创建的同名 logger
+        if _logging.Logger.manager.loggerDict.get(logger.name) is logger:
+            _logging.Logger.manager.loggerDict.pop(logger.name, None)
+
+    def stats(self) -> _Dict[str, int]:
+        with self._lock:
+            return {"created": self.created, "active": len(self._active)}
+
+
+task_logger_pool = TaskLoggerPool()
+
+
 def hacked_get_disk_logger(self, log_id: int, *, stdout: bool = True, level: int = _logging.INFO) -> _logging.Logger:
-    logger = _logging.getLogger("pyxxl.task_log.disk.task-{%s}" % log_id)
-    logger.propagate = False
-    logger.setLevel(level)
+    logger = task_logger_pool.acquire("pyxxl.task_log.disk.task-{%s}" % log_id, level)
 
+    handlers = list()
     if stdout:
-        console_handler = LoguruHandler()
-        logger.addHandler(console_handler)
-
-        _loguru_logger.remove()  # 移除默认 handler
-        _loguru_logger.add(
-            _sys.stdout,
-            level=level,
-            colorize=True,
-            backtrace=False,
-            diagnose=False,
-            format=CUSTOM_CONSOLE_FORMAT_NOT_DISPLAY,  # 🔥 就是这一行
-        )
+        handlers.append(task_logger_pool.console_handler)
+        configure_loguru_sink(level)
 
     file_handler = FileHandler(self.key(log_id), delay=True, encoding="utf-8")
     file_handler.setLevel(level)
     file_handler.setFormatter(UNIFIED_FORMATTER)
-    logger.addHandler(file_handler)
+    handlers.append(file_handler)
+    _attach_handlers(logger, *handlers)
     return logger
 
 
+def hacked_after_running(self, logger: _logging.Logger) -> None:
+    task_logger_pool.release(logger)
+
+
+async def flush_task_log(logger: _Optional[_logging.Logger], timeout: float = LOG_FINISH_FLUSH_TIMEOUT) -> bool:
+    """
+    等写线程写完该任务此前入队的日志并刷盘
+    1. pyxxl 先回调 admin 再执行 after_running，close_handlers 排入时回调已经发出，所以在回调前单独排入刷盘标记
+    2. 只刷该任务自己的文件 handler（共享的控制台 handler 除外），在事件循环上等待 future，不占用线程池
+    3. 未开启日志队列（没有 QueuedHandler）时直接返回
+    """
+    if logger is None:
+        return True
+    waits = list()
+    for handler in logger.handlers:
+        if isinstance(handler, QueuedHandler):
+            targets = tuple(h for h in handler.targets if h is not task_logger_pool.console_handler)
+            if targets:
+                waits.append(_asyncio.wrap_future(handler.writer.mark(targets)))
+    if not waits:
+        return True
+    try:
+        await _asyncio.wait_for(_asyncio.gather(*waits), timeout)
+        return True
+    except _asyncio.TimeoutError:
+        return False
+
+
+@_contextmanager
+def hacked_new_logger(factory: _LogBase, log_id: int) -> _Generator[_logging.Logger, None, None]:
+    # 原实现没有 try/finally，回调抛异常或任务被取消时 after_running 不会执行，logger 和文件句柄随之泄漏
+    xxl_kwargs = _g.try_get_run_data()
+    context_token = bind_task_log_context(xxl_kwargs) if xxl_kwargs else None
+    logger = factory.get_logger(log_id)
+    token = _g.set_task_logger(logger)
+    try:
+        yield logger
+    finally:
+        factory.after_running(logger)
+        _g._LOGGER.reset(token)
+        if context_token is not None:
+            reset_task_log_context(context_token)
+
+
+DEFAULT_LINE_INDEX_STEP = 64
+DEFAULT_LINE_INDEX_CACHE_SIZE = 256
+_LINE_INDEX_SCAN_CHUNK = 1024 * 1024
+
+
+class LineOffsetIndex:
+    """
+    任务日志的行偏移索引
+    每隔 step 行记录一次该行的起始字节偏移，读取第 N 行时直接 seek 到最近的检查点，
+    最多再向后跳过 step - 1 行，与日志文件的总行数无关。
+    文件增长后只扫描新追加的字节；文件被截断或替换（inode 变化）时重建索引。
+    """
+
+    def __init__(self, path: str, step: int = DEFAULT_LINE_INDEX_STEP):
+        self.path = path
+        self.step = step
+        self.lock = _threading.Lock()
+        self._reset(identity=None)
+
+    def _reset(self, identity: _Optional[_Tuple[int, int]]) -> None:
+        # checkpoints[k] 为第 k * step + 1 行的起始偏移
+        self.checkpoints = _array("q", [0])
+        # 已索引的完整行数，以及最后一个完整行结束处的偏移
+        self.lines = 0
+        self.indexed_bytes = 0
+        self.identity = identity
+
+    def _extend(self, f, size: int) -> None:
+        """从已索引位置开始扫描新追加的字节，未以换行结束的尾行留待下次扫描"""
+        pos = self.indexed_bytes
+        f.seek(pos)
+        while pos < size:
+            chunk = f.read(min(_LINE_INDEX_SCAN_CHUNK, size - pos))
+            if not chunk:
+                break
+            start = 0
+            while True:
+                nl = chunk.find(b"\n", start)
+                if nl == -1:
+                    break
+                start = nl + 1
+                self.lines += 1
+                if self.lines % self.step == 0:
+                    self.checkpoints.append(pos + start)
+            self.indexed_bytes = pos + start if start else self.indexed_bytes
+            pos += len(chunk)
+
+    def refresh(self, f) -> None:
+        stat = _os.fstat(f.fileno())
+        identity = (stat.st_dev, stat.st_ino)
+        if identity != self.identity or stat.st_size < self.indexed_bytes:
+            self._reset(identity=identity)
+        if stat.st_size > self.indexed_bytes:
+            self._extend(f, stat.st_size)
+
+    def locate(self, line_no: int) -> _Tuple[int, int]:
+        """返回不超过 line_no 的最近检查点：(字节偏移, 该偏移处的行号)"""
+        k = min((max(line_no, 1) - 1) // self.step, len(self.checkpoints) - 1)
+        return self.checkpoints[k], k * self.step + 1
+
+    def seek(self, f, line_no: int) -> int:
+        """
+        把已打开的日志文件 f 定位到第 line_no 行的行首，返回实际定位到的行号
+        文件行数不足或尾行尚未写完时，停在最后一个完整行之后
+        """
+        with self.lock:
+            self.refresh(f)
+            offset, current = self.locate(line_no)
+        f.seek(offset)
+        while current < line_no:
+            pos = f.tell()
+            if not f.readline().endswith(b"\n"):
+                f.seek(pos)
+                break
+            current += 1
+        return current
+
+    def read_lines(self, from_line: int, count: int) -> _Tuple[str, int, bool]:
+        """
+        读取从 from_line 开始的 count 行
+        返回 (日志内容, 最后读取到的行号, 是否已读到文件末尾)，语义与逐行读取保持一致
+        """
+        to_line = from_line - 1
+        start_line = max(from_line, 1)
+        with open(self.path, mode="rb") as f:
+            with self.lock:
+                self.refresh(f)
+                offset, line_no = self.locate(start_line)
+            f.seek(offset)
+            while line_no < start_line:
+                if not f.readline():
+                    return "", to_line, True
+                line_no += 1
+            chunks = []
+            for _ in range(count):
+                line = f.readline()
+                if not line:
+                    return b"".join(chunks).decode("utf-8", errors="replace"), to_line, True
+                chunks.append(line)
+                to_line = line_no
+                line_no += 1
+        return b"".join(chunks).decode("utf-8", errors="replace"), to_line, False
+
+
+class LineOffsetIndexCache:
+    """按日志文件路径（即 logId）缓存行偏移索引的有界 LRU"""
+
+    def __init__(self, maxsize: int = DEFAULT_LINE_INDEX_CACHE_SIZE, step: int = DEFAULT_LINE_INDEX_STEP):
+        self.maxsize = maxsize
+        self.step = step
+        self._lock = _threading.Lock()
+        self._indexes: "_OrderedDict[str, LineOffsetIndex]" = _OrderedDict()
+
+    def get(self, path: str) -> LineOffsetIndex:
+        with self._lock:
+            index = self._indexes.get(path)
+            if index is None:
+                index = self._indexes[path] = LineOffsetIndex(path=path, step=self.step)
+                while len(self._indexes) > self.maxsize:
+                    self._indexes.popitem(last=False)
+            else:
+                self._indexes.move_to_end(path)
+            return index
+
+    def discard(self, path: str) -> None:
+        with self._lock:
+            self._indexes.pop(path, None)
+
+    def open_at(self, path: str, line_no: int):
+        """以二进制只读方式打开日志并定位到第 line_no 行，返回 (文件对象, 实际定位到的行号)"""
+        f = open(path, mode="rb")
+        try:
+            return f, self.get(path).seek(f, max(line_no, 1))
+        except BaseException:
+            f.close()
+            raise
+
+    def read_lines(self, path: str, from_line: int, count: int) -> _Tuple[str, int, bool]:
+        try:
+            return self.get(path).read_lines(from_line=from_line, count=count)
+        except FileNotFoundError:
+            self.discard(path)
+            raise
+
+
+task_log_line_index = LineOffsetIndexCache()
+
 # 🔥 正式接管 pyxxl
 _xxl_setting.setup_logging = hacked_setup_logging
 _DiskLog.get_logger = hacked_get_disk_logger
+_DiskLog.after_running = hacked_after_running
+_xxl_executor.new_logger = hacked_new_logger
 
 
 def setup_logger(
@@ -251,17 +1001,10 @@ def setup_logger(
     # -------------------------
     # 1️⃣ Console → Loguru
     # -------------------------
-    console_handler = LoguruHandler()
+    console_handler = add_rate_limit_filter(LoguruHandler())
     logger.addHandler(console_handler)
-
-    _loguru_logger.remove()  # 移除默认 handler
-    _loguru_logger.add(
-        _sys.stdout,
-        level=log_level,
-        colorize=True,
-        backtrace=False,
-        diagnose=False,
-        format=CUSTOM_CONSOLE_FORMAT if display_path is True else CUSTOM_CONSOLE_FORMAT_NOT_DISPLAY,  # 🔥 就是这一行
+    configure_loguru_sink(
+        log_level, format=CUSTOM_CONSOLE_FORMAT if display_path is True else CUSTOM_CONSOLE_FORMAT_NOT_DISPLAY
     )
 
     # === 日志文件名称 ===
@@ -273,6 +1016,7 @@ def setup_logger(
     )
     file_handler.setLevel(log_level)
     file_handler.setFormatter(UNIFIED_FORMATTER)
+    add_rate_limit_filter(file_handler)
     logger.addHandler(file_handler)
 
     # =========================
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+# ---------------------------------------------------------------------------------------------------------
+# ProjectName:  cronjob-1717
+# FileName:     metrics.py
+# Description:  Prometheus 文本格式的执行器指标
+# Author:       ASUS
+# CreateDate:   2026/10/18
+# Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
+# ---------------------------------------------------------------------------------------------------------
+"""
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+"""
+指标逻辑
+1. 不引入 prometheus_client，只实现 Counter / Gauge / Histogram 三种类型，输出 Prometheus text exposition 0.0.4
+2. 标签按位置传入，内部以标签值元组为键，记录一次只有字典查找、加法和一次二分查找，
+   相比一次调度（创建 task、写任务日志、回调）的开销可以忽略
+3. 所有记录都在事件循环线程中进行，不加锁
+4. 队列长度、运行中任务数这类瞬时值不在业务路径上维护，抓取时由 collector 现算
+"""
+
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.type_name}"]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return self.header() + self.samples()
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = dict()
+
+    def inc(self, *labels: str, value: float = 1) -> None:
+        try:
+            self._values[labels] += value
+        except KeyError:
+            self._values[labels] = value
+
+    def get(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def set(self, *labels: str, value: float) -> None:
+        self._values[labels] = value
+
+    def clear(self) -> None:
+        self._values.clear()
+
+
+class _HistogramState:
+    __slots__ = ("buckets", "sum", "count")
+
+    def __init__(self, size: int):
+        self.buckets = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+            self, name: str, documentation: str, labelnames: Iterable[str] = (),
+            buckets: Tuple[float, ...] = DURATION_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._states: Dict[Tuple[str, ...], _HistogramState] = dict()
+
+    def observe(self, *labels: str, value: float) -> None:
+        try:
+            state = self._states[labels]
+        except KeyError:
+            state = self._states[labels] = _HistogramState(len(self.buckets) + 1)
+        # 只记录落入的桶，输出时再累加成 le 累计值
+        state.buckets[bisect_left(self.buckets, value)] += 1
+        state.sum += value
+        state.count += 1
+
+    def samples(self) -> List[str]:
+        lines = list()
+        for labels, state in sorted(self._states.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state.buckets):
+                cumulative += count
+                le = 'le="%s"' % _format_value(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(round(state.sum, 6))}")
+            lines.append(f"{self.name}_count{label_str} {state.count}")
+        return lines
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._metrics: List[_Metric] = list()
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+            self, name: str, documentation: str, labelnames: Iterable[str] = (),
+            buckets: Optional[Tuple[float, ...]] = None
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets or DURATION_BUCKETS))
+
+    def render(self, extra: Iterable[_Metric] = ()) -> str:
+        lines = list()
+        for metric in list(self._metrics) + list(extra):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
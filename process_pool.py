@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""
+# ---------------------------------------------------------------------------------------------------------
+# ProjectName:  cronjob-1717
+# FileName:     process_pool.py
+# Description:  CPU 密集型任务的进程池执行模式
+# Author:       ASUS
+# CreateDate:   2026/10/18
+# Copyright ©2011-2025. Hunan xxxxxxx Company limited. All rights reserved.
+# ---------------------------------------------------------------------------------------------------------
+"""
+import os
+import signal
+import pickle
+import asyncio
+import logging
+import threading
+import importlib
+import multiprocessing
+from pyxxl.ctx import g
+from pyxxl.schema import RunData
+from logging import Logger, getLogger
+from log_utils import FileHandler, UNIFIED_FORMATTER, bind_task_log_context, reset_task_log_context
+from pyxxl.logger.disk import LOG_NAME_PREFIX
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Callable, Iterable, List, Optional, Tuple
+
+"""
+进程池执行逻辑
+1. handler 在 register() 时用 @process_mode 声明，或调度参数里带 execution_mode=process，
+   整个 handler 就交给常驻的进程池执行，验证码识别等 CPU 密集的步骤不再卡住 /run、/beat、/log 所在的事件循环
+2. 子进程以 spawn 方式启动（主进程里已有 watchdog、定时器等线程，fork 不安全），启动时预先导入
+   preload 中的模块（ddddocr 的 onnx 模型、任务模块本身），之后一直复用，每个子进程有一个常驻事件循环，
+   模块级的 Redis 客户端等异步资源不会跨事件循环
+3. 子进程按模块名导入任务模块，用收集器调用 register() 拿到 handler 函数，并按 (模块, handler) 缓存；
+   jobs 热重载后重启进程池，新进程导入的就是新代码
+4. 子进程里设置与主进程相同的 g.xxl_run_data / g.logger，任务日志直接追加写入该任务的 DiskLog 文件
+   （pyxxl-{logId}.log），/log 和 /log/tail 照常能读到
+5. 取消：每个提交占用共享内存中的一个取消标记位，主进程里任务超时或被 kill 时置位，
+   子进程轮询到后取消 handler 协程（同步 handler 则置位 g.cancel_event）
+"""
+
+PROCESS_MODE = "process"
+EXECUTION_MODE_ATTR = "__execution_mode__"
+DEFAULT_MAX_WORKERS = 1
+DEFAULT_CANCEL_SLOTS = 256
+DEFAULT_CANCEL_POLL_INTERVAL = 0.2
+
+
+def process_mode(func: Callable) -> Callable:
+    """
+    声明 handler 在进程池中执行，写在 executor.register 下面：
+        @executor.register(name="update_qlv_login_state")
+        @process_mode
+        async def update_qlv_login_state(): ...
+    """
+    setattr(func, EXECUTION_MODE_ATTR, PROCESS_MODE)
+    return func
+
+
+def get_handler_execution_mode(func: Callable) -> Optional[str]:
+    return getattr(func, EXECUTION_MODE_ATTR, None)
+
+
+# ================= 子进程 =================
+
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+_worker_cancel_flags: Any = None
+_worker_poll_interval: float = DEFAULT_CANCEL_POLL_INTERVAL
+_worker_handlers: Dict[Tuple[str, str], Callable] = dict()
+
+
+class _HandlerCollector:
+    """代替 JobHandler 传给模块的 register()，只收集 handler 函数"""
+
+    def __init__(self):
+        self.handlers: Dict[str, Callable] = dict()
+
+    def register(self, *args: Any, name: Optional[str] = None, replace: bool = False) -> Callable:
+        def func_wrapper(func: Callable) -> Callable:
+            self.handlers[name or func.__name__] = func
+            return func
+
+        if len(args) == 1:
+            return func_wrapper(args[0])
+        return func_wrapper
+
+
+def _init_worker(preload: Tuple[str, ...], cancel_flags: Any, poll_interval: float) -> None:
+    global _worker_loop, _worker_cancel_flags, _worker_poll_interval
+    # Ctrl+C 由主进程处理，子进程随进程池关闭退出
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker_cancel_flags = cancel_flags
+    _worker_poll_interval = poll_interval
+    _worker_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_worker_loop)
+    for name in preload:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            getLogger(__name__).warning(f"进程池子进程<{os.getpid()}>预加载模块<{name}>失败：{e}")
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _get_worker_handler(module_name: str, handler_name: str) -> Callable:
+    key = (module_name, handler_name)
+    handler = _worker_handlers.get(key)
+    if handler is None:
+        module = importlib.import_module(module_name)
+        collector = _HandlerCollector()
+        module.register(collector)
+        for name, func in collector.handlers.items():
+            _worker_handlers[(module_name, name)] = func
+        handler = _worker_handlers.get(key)
+        if handler is None:
+            raise LookupError(f"handler {handler_name} not registered by {module_name}")
+    return handler
+
+
+async def _run_worker_handler(handler: Callable, slot: int) -> Any:
+    cancel_event = None
+    if asyncio.iscoroutinefunction(handler):
+        task = asyncio.ensure_future(handler())
+    else:
+        cancel_event = threading.Event()
+        g.set_cancel_event(cancel_event)
+        task = asyncio.ensure_future(asyncio.to_thread(handler))
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=_worker_poll_interval)
+        if done:
+            return task.result()
+        if _worker_cancel_flags[slot]:
+            g.logger.warning("Job cancelled by executor, pid=%s" % os.getpid())
+            if cancel_event is not None:
+                cancel_event.set()
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            # 主进程已经不再等待结果
+            return None
+
+
+def _run_in_worker(module_name: str, handler_name: str, data: RunData, log_file: str, slot: int) -> Any:
+    if _worker_cancel_flags[slot]:
+        # 已经预取进子进程、还没开始执行就被取消
+        return None
+    handler = _get_worker_handler(module_name, handler_name)
+    # 不经过 logging.getLogger，避免每个任务在子进程里留下一个 logger
+    task_logger = Logger(f"pyxxl.task_log.process.task-{data.logId}", level=logging.DEBUG)
+    file_handler = FileHandler(log_file, delay=True)
+    file_handler.setFormatter(UNIFIED_FORMATTER)
+    task_logger.addHandler(file_handler)
+    g.set_xxl_run_data(data)
+    g.set_task_logger(task_logger)
+    context_token = bind_task_log_context(data)
+    try:
+        task_logger.info("Run in process pool, pid=%s" % os.getpid())
+        result = _worker_loop.run_until_complete(_run_worker_handler(handler, slot))
+        pickle.dumps(result)
+        return result
+    except Exception as e:
+        try:
+            pickle.dumps(e)
+        except Exception:
+            # 异常对象无法传回主进程时，只传回类型和信息
+            raise RuntimeError(f"{type(e).__name__}: {e}") from None
+        raise
+    finally:
+        reset_task_log_context(context_token)
+        file_handler.close()
+
+
+# ================= 主进程 =================
+
+class JobProcessPool:
+
+    def __init__(
+            self, log_dir: str, *, max_workers: int = DEFAULT_MAX_WORKERS, preload: Iterable[str] = (),
+            cancel_slots: int = DEFAULT_CANCEL_SLOTS, cancel_poll_interval: float = DEFAULT_CANCEL_POLL_INTERVAL,
+            logger: Optional[Logger] = None
+    ):
+        self.log_dir = log_dir
+        self.max_workers = max_workers
+        self.preload = tuple(x for x in preload if x)
+        self.cancel_poll_interval = cancel_poll_interval
+        self.logger = logger or getLogger(__name__)
+        self._context = multiprocessing.get_context("spawn")
+        self._cancel_slots = cancel_slots
+        self._cancel_flags: Any = None
+        self._free_slots: List[int] = list()
+        self._slot_lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_workers > 0
+
+    def log_file(self, log_id: int) -> str:
+        """与 DiskLog.key 一致的任务日志路径"""
+        return os.path.abspath(os.path.join(self.log_dir, LOG_NAME_PREFIX.format(log_id=log_id)))
+
+    def _ensure_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            if self._cancel_flags is None:
+                # 共享内存只能在创建子进程时传入，所有代次的进程池共用一份
+                self._cancel_flags = self._context.Array("b", self._cancel_slots, lock=False)
+                self._free_slots = list(range(self._cancel_slots))
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=self._context, initializer=_init_worker,
+                initargs=(self.preload, self._cancel_flags, self.cancel_poll_interval),
+            )
+        return self._pool
+
+    def _acquire_slot(self) -> int:
+        with self._slot_lock:
+            if not self._free_slots:
+                raise RuntimeError(f"进程池待执行任务超过上限<{self._cancel_slots}>")
+            slot = self._free_slots.pop()
+        self._cancel_flags[slot] = 0
+        return slot
+
+    def _release_slot(self, slot: int) -> None:
+        with self._slot_lock:
+            self._free_slots.append(slot)
+
+    async def start(self) -> None:
+        """预热：拉起全部子进程并完成预加载，首次调度不用等待进程启动"""
+        if not self.enabled:
+            return
+        pool = self._ensure_pool()
+        loop = asyncio.get_running_loop()
+        pids = await asyncio.gather(*(loop.run_in_executor(pool, _ping) for _ in range(self.max_workers)))
+        self.logger.info(f"任务进程池已就绪，子进程: {sorted(set(pids))}，预加载: {list(self.preload)}")
+
+    def _discard_broken(self, pool: ProcessPoolExecutor, error: BaseException) -> None:
+        """子进程异常退出（OOM、浏览器崩溃等）后进程池不可再用，丢弃它，下一次提交由 _ensure_pool 重新创建"""
+        if self._pool is pool:
+            self._pool = None
+            self.logger.error(f"任务进程池的子进程异常退出，已丢弃该进程池，下次提交时重新创建: {error}")
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, module_name: str, handler_name: str, data: RunData) -> Any:
+        """在子进程中执行 handler；调用方被取消（超时、kill）时通知子进程取消"""
+        pool = self._ensure_pool()
+        slot = self._acquire_slot()
+        try:
+            # 提交时发现进程池已损坏，任务还没有执行，换一个新进程池重试一次
+            for attempt in range(2):
+                try:
+                    future = pool.submit(
+                        _run_in_worker, module_name, handler_name, data, self.log_file(data.logId), slot
+                    )
+                    break
+                except BrokenProcessPool as e:
+                    self._discard_broken(pool, e)
+                    if attempt:
+                        raise
+                    pool = self._ensure_pool()
+        except BaseException:
+            self._release_slot(slot)
+            raise
+        # 子进程真正结束后才归还标记位
+        future.add_done_callback(lambda _: self._release_slot(slot))
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            if not future.done():
+                self._cancel_flags[slot] = 1
+            raise
+        except BrokenProcessPool as e:
+            # 执行中子进程退出：任务可能已有副作用，不重试，交给调用方按失败回调
+            self._discard_broken(pool, e)
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        pool = self._pool
+        processes = list((pool._processes or dict()).values()) if pool is not None else list()
+        with self._slot_lock:
+            submitted = self._cancel_slots - len(self._free_slots) if self._cancel_flags is not None else 0
+        return {
+            "enabled": self.enabled,
+            "started": pool is not None,
+            "maxWorkers": self.max_workers,
+            "aliveWorkers": sum(1 for p in processes if p.is_alive()),
+            "submitted": submitted,
+        }
+
+    def restart(self) -> None:
+        """jobs 热重载后调用：旧进程池执行完手上的任务后退出，新任务由新进程执行"""
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+            self.logger.info("任务进程池已重启，旧子进程执行完当前任务后退出")
+
+    def shutdown(self) -> None:
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            if self._cancel_flags is not None:
+                for slot in set(range(self._cancel_slots)) - set(self._free_slots):
+                    self._cancel_flags[slot] = 1
+            pool.shutdown(wait=False, cancel_futures=True)